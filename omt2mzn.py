@@ -14,8 +14,14 @@
 #   limitations under the License.
 
 from pyomt.smtlib.parser import SmtLib20Parser
-from pyomt.printers_mzn import MZNPrinter
+from pyomt.printers_mzn import MZNPrinter, NotImplementedErr, bits_name, sets_name, limbs_name, limb_sizes, signed_view, offset_view, pow2_table, limbs_value
+from pyomt.printers_fzn import FZNPrinter
+from pyomt.domains import DomainAnalyzer
 from pyomt.environment import get_env
+from pyomt.utils import quote
+from pyomt.exceptions import UnsupportedOperatorError
+from six.moves import cStringIO
+from fractions import Fraction
 import argparse
 import pyomt.typing as tp
 import sys
@@ -26,15 +32,52 @@ import os
 class MultiTypeLexErr(StandardError):
     pass
 
+##Minisearch Paper Implementation
+MINIMIZE_LEX_PERS = """\n
+    function ann : minimize_lex_pers(array[int] of var %s : objs) =
+        next() /\ commit() /\ print() /\\
+        repeat( scope(
+            post(lex_less(objs, [sol(objs[i]) | i in index_set(objs)])) /\\
+            if next() then commit() /\ print() else break endif ) );
+    """
+
+MINIMIZE_BOX = """\n
+    function ann : minimize_box(var %s : obj, var %s : shown, string : name) =
+        if next() then commit() /\\
+            repeat( scope(
+                post(obj < sol(obj)) /\\
+                if next() then commit() else break endif ) ) /\\
+            print(name ++ " = " ++ show(sol(shown)) ++ "\\n")
+        else print(name ++ " = unsat\\n") endif;
+    """
+
+MINIMIZE_BOX_LEX = """\n
+    function ann : minimize_box(array[int] of var int : objs, array[int] of var int : shown, string : name) =
+        if next() then commit() /\\
+            repeat( scope(
+                post(lex_less(objs, [sol(objs[i]) | i in index_set(objs)])) /\\
+                if next() then commit() else break endif ) ) /\\
+            print(name ++ " = " ++ show([sol(shown[i]) | i in index_set(shown)]) ++ "\\n")
+        else print(name ++ " = unsat\\n") endif;
+    """
+
 class Omt2Mzn():
     #if flag bv = true bv array rap
-    def __init__(self,file_in,file_out,flag_bigand,max_int_bit_size,printer_opt,asoft_var_type,float_domains):
-        self.serializer=MZNPrinter(printer_opt,max_int_bit_size)
+    def __init__(self,file_in,file_out,flag_bigand,max_int_bit_size,printer_opt,asoft_var_type,float_domains,label_threshold=None,half_reif=False,fzn=False,compact=False,bv_encoding="int",box_minisearch=False,activation=False):
+        self.serializer=MZNPrinter(printer_opt,max_int_bit_size,label_threshold=label_threshold,half_reif=half_reif,compact=compact,bv_encoding=bv_encoding)
         self.input_file=file_in
         self.output_file=file_out
         self.flag_bigand=flag_bigand
         self.asoft_var_type=asoft_var_type
         self.float_domains=float_domains
+        self.half_reif=half_reif
+        self.soft_directions={}
+        self.fzn=fzn
+        self.bv_encoding=bv_encoding
+        self.box_minisearch=box_minisearch
+        self.activation=activation
+        self.domain_analyzer=DomainAnalyzer()
+        self.assertion_caches={}        #asserted formula -> cache of its frame, see write_stack
 
 
     def startParsing(self):
@@ -94,7 +137,14 @@ class Omt2Mzn():
             keep indexes for the objective
         '''
 
+        if self.activation:
+            try:
+                self.write_activation_model(commands,out_file)
+                return
+            except NotImplementedErr as e:
+                print("Activation model not supported for this script, writing a model for each section: %s"%e)
         current_stack=[[]]              #list of list for the stack, the first one is the default one
+        frame_caches=[{}]               #serialized assertions of each frame, dropped by its pop
         file_index=1
         for cmd in commands:
             if cmd.name=='push':
@@ -103,23 +153,96 @@ class Omt2Mzn():
                     npush=cmd.args[0]
                 for _ in range(npush):
                     current_stack.append([])
+                    frame_caches.append({})
             elif cmd.name=='pop':
                 npop=1
                 if cmd.args!=[]:
                     npop=cmd.args[0]
                 for _ in range(npop):
                     current_stack.pop()
+                    frame_caches.pop()
             elif cmd.name=='check-sat':  #condition to print out
-                self.write_stack(current_stack,out_file.replace(".mzn","_"+str(file_index)+".mzn")) #the index variate considering the number of section
+                self.write_stack(current_stack,out_file.replace(".mzn","_"+str(file_index)+".mzn"),frame_caches) #the index variate considering the number of section
                 file_index+=1
             else:
                 current_stack[-1].append(cmd)
 
-    def write_stack(self,stack,out_file):
+    def write_activation_model(self,commands,out_file):
+        '''
+            Write a single model with the assertions of all the frames, the pushed ones guarded by
+            the par bool frame_K, and for each check-sat a .dzn that activates the frames on the stack.
+            The assertions that follow a check-sat in the same stack level go in a new frame, so that
+            they are not active in the previous sections
+        '''
+        var_dict={}
+        frames=[[]]                     #assertions of each frame, the frame 0 holds in every section
+        current_stack=[[0]]             #indexes of the frames of each level of the stack
+        sections=[]                     #frames on the stack at each check-sat
+        checked=set()                   #frames already active in a check-sat
+        for cmd in commands:
+            if cmd.name=='push':
+                for _ in range(cmd.args[0] if cmd.args!=[] else 1):
+                    frames.append([])
+                    current_stack.append([len(frames)-1])
+            elif cmd.name=='pop':
+                for _ in range(cmd.args[0] if cmd.args!=[] else 1):
+                    current_stack.pop()
+            elif cmd.name=='check-sat':
+                sections.append(set(k for level in current_stack for k in level))
+                checked.update(sections[-1])
+            elif cmd.name=='declare-fun' and len(cmd.args)==1:
+                name=str(cmd.args[0])
+                if name in var_dict and var_dict[name][0]!=cmd.args[0].get_type():
+                    raise NotImplementedErr("the variable %s is declared with different types"%name)
+                var_dict[name]=[cmd.args[0].get_type()]
+            elif cmd.name=='assert':
+                if current_stack[-1][-1] in checked:
+                    frames.append([])
+                    current_stack[-1].append(len(frames)-1)
+                frames[current_stack[-1][-1]].append(cmd.args[0])
+            elif cmd.name in ('assert-soft','maximize','minimize'):
+                raise NotImplementedErr("%s cannot be guarded by an activation parameter"%cmd.name)
+        self.serializer.select_limbs([f for frame in frames for f in frame])
+        self.serializer.bit_symbols=self.get_bit_symbols([f for frame in frames for f in frame],[],[])
+        self.serializer.pow2_widths.clear()
+        self.assertion_caches={}
+        #the model is written only once it is fully serialized, the fallback leaves no file behind
+        buf=cStringIO()
+        print("writing variables")
+        #only the frame 0 holds in every section
+        self.write_list_variables(var_dict,buf,self.get_domains(frames[0],[]))
+        for k in range(1,len(frames)):
+            buf.write("bool : frame_%d;\n"%k)
+        print("writing assertions")
+        self.write_assertions([[f] for f in frames[0]],buf,var_dict)
+        for k in range(1,len(frames)):
+            for el in frames[k]:
+                for conjunct in self.split_conjuncts(el):
+                    buf.write("constraint frame_%d -> (%s);\n"%(k,self.serializer.serialize(conjunct)))
+        self.write_tables(buf)
+        buf.write("solve satisfy;\n")
+        file_out=open(out_file,"w")
+        file_out.write(buf.getvalue())
+        file_out.close()
+        buf.close()
+        for (i,active) in enumerate(sections):
+            data_out=open(out_file.replace(".mzn","_"+str(i+1)+".dzn"),"w")
+            for k in range(1,len(frames)):
+                data_out.write("frame_%d = %s;\n"%(k,"true" if k in active else "false"))
+            data_out.close()
+
+    def write_stack(self,stack,out_file,frame_caches=None):
         '''
-            Write the minizinc file related to each stack
+            Write the minizinc file related to each stack, the assertions already serialized
+            in a frame are taken from its cache
         '''
         flat_stack=[item for l in stack for item in l]
+        self.assertion_caches={}
+        if frame_caches is not None:
+            for (frame,cache) in zip(stack,frame_caches):
+                for el in frame:
+                    if el.name=='assert':
+                        self.assertion_caches[el.args[0]]=cache
         var_dict={}
         asserts_list=[]
         asserts_soft_list=[]
@@ -138,12 +261,25 @@ class Omt2Mzn():
                 commands_list.append((el.name,el.args))
         var_dict=self.modify_type_assert_soft_var(asserts_soft_list,var_dict)
         var_dict=self.add_id_variables_opt(commands_list,var_dict)
+        if self.half_reif:
+            self.soft_directions=self.get_soft_directions(asserts_list,asserts_soft_list,commands_list)
+        self.serializer.select_limbs(self.get_formulas(asserts_list,asserts_soft_list,commands_list))
+        self.serializer.bit_symbols=self.get_bit_symbols(asserts_list,asserts_soft_list,commands_list)
+        self.serializer.pow2_widths.clear()
         print("Finished to write the stack")
+        if self.fzn:
+            try:
+                self.write_stack_fzn(var_dict,asserts_list,asserts_soft_list,commands_list,set_priority_option,out_file)
+                return
+            except (NotImplementedErr,UnsupportedOperatorError) as e:
+                print("FlatZinc not supported for this section, writing mzn: %s"%e)
         if len(commands_list)==0:
             self.write_stack_simple(var_dict,asserts_list,asserts_soft_list,out_file)
         else:
             if set_priority_option == 'lex':    #lexicographic order
                 self.write_stack_lex(var_dict,asserts_list,asserts_soft_list,commands_list,out_file)
+            elif self.box_minisearch:           #box in a single MiniSearch model
+                self.write_stack_box_minisearch(var_dict,asserts_list,asserts_soft_list,commands_list,out_file)
             else:                               #box-  also the default one
                 self.write_stack_box(var_dict,asserts_list,asserts_soft_list,commands_list,out_file)
 
@@ -174,6 +310,45 @@ class Omt2Mzn():
         return var_dict
 
 
+    def get_soft_directions(self,asserts_list,asserts_soft_list,commands_list):
+        '''
+            For each id of the assert-soft returns the direction of the optimization ("minimize"/"maximize")
+            when its cost variable occurs only as the whole objective of commands of that kind without bounds,
+            in this case the indicator variables can be half reified.
+        '''
+        directions={}
+        excluded=set()
+        for el in asserts_list+asserts_soft_list:
+            for f in el:
+                if hasattr(f,"get_free_variables"):
+                    excluded.update(str(v) for v in f.get_free_variables())
+        for (name,args) in commands_list:
+            args_inner=args[1]
+            str_args0=str(args[0])
+            if args[0].size()==1 and ")" not in str_args0 and "(" not in str_args0:
+                if ":upper" in args_inner or ":lower" in args_inner or directions.get(str_args0,name)!=name:
+                    excluded.add(str_args0)
+                directions[str_args0]=name
+            else:
+                excluded.update(str(v) for v in args[0].get_free_variables())
+        return {k:directions[k] for k in set(el[-1] for el in asserts_soft_list) if k in directions and k not in excluded}
+
+    def get_formulas(self,asserts_list,asserts_soft_list,commands_list):
+        '''
+            Formulas of the assertions, of the soft assertions and of the objectives
+        '''
+        formulas=[el[0] if type(el) is list else el for el in asserts_list]
+        formulas+=[el[0] for el in asserts_soft_list]
+        formulas+=[args[0] for (_,args) in commands_list]
+        return formulas
+
+    def get_bit_symbols(self,asserts_list,asserts_soft_list,commands_list):
+        '''
+            BV variables that get a shared decomposition in bits: the ones read bit by bit
+            in the formulas and in the objectives
+        '''
+        return self.serializer.get_bit_symbols(self.get_formulas(asserts_list,asserts_soft_list,commands_list))
+
     def add_id_variables_opt(self,commands_list,var_dict):
         '''
             Adding the variable related to the id of the maximization and minimization
@@ -206,13 +381,17 @@ class Omt2Mzn():
         file_out=open(out_file,"w")
         file_out.write("include \"minisearch.mzn\";\n")
         print("writing variables")
-        self.write_list_variables(var_dict,file_out)
+        relations=[]
+        for (assignment,bounds) in self.get_objective_relations(commands_list,var_dict):
+            relations+=[assignment]+bounds
+        self.write_list_variables(var_dict,file_out,self.get_domains(asserts_list,relations))
         print("writing assertions")
         self.write_assertions(asserts_list,file_out,var_dict)
         print("writing soft")
         self.write_assertions_soft(asserts_soft_list,file_out)
         print("writing maximize/minimize")
         self.write_commands_lex(commands_list,var_dict,file_out)
+        self.write_tables(file_out)
         file_out.close()
 
     def write_commands_lex(self,commands_list,var_dict,file_out):
@@ -262,27 +441,30 @@ class Omt2Mzn():
             assignment = mgr.Equals(opt_symbol,objective_arg)
             file_out.write("constraint ("+self.serializer.serialize(assignment,daggify=False)+");\n")
 
+            wide=self.serializer.wide_bv(var_dict[opt_var][0])
             opt_symbol_lex = mgr._create_symbol(opt_var+"_lex",var_dict[opt_var][0])
             lex_type = "int" if "BV" in str(var_dict[opt_var][0]) else str(var_dict[opt_var][0]).lower()
-            file_out.write("var %s:%s;\n "%(lex_type,opt_symbol_lex))
-            if name=="maximize" and "BV" not in str(var_dict[opt_var][0]):
+            if not wide:
+                file_out.write("var %s:%s;\n "%(lex_type,opt_symbol_lex))
+            if wide:
+                pass    #the limbs are minimized directly, see wide_objective
+            elif name=="maximize" and "BV" not in str(var_dict[opt_var][0]):
                 opt_symbol_tmp = mgr.Minus(mgr.Int(0),opt_symbol)
                 assignment = mgr.Equals(opt_symbol_lex,opt_symbol_tmp)
                 file_out.write("constraint ("+self.serializer.serialize(assignment,daggify=False)+");\n")
             elif name=="maximize" and "BV" in str(var_dict[opt_var][0]) and signed==-1: #maximization BV8 unisgned -> max value is 255 -> minimize 255-opt_symbol
                 file_out.write("constraint( %s = %s - %s );\n"%(opt_symbol_lex,pow(2,opt_symbol.bv_width())-1,opt_symbol))
             elif name=="maximize" and "BV" in str(var_dict[opt_var][0]) and signed>-1: #maximization BV8 signed -> maxvalue is 127 -> minimize 127-opt_symbol
-                file_out.write("constraint( %s = %s - (-%s*((%s div %s) mod 2))+sum([pow(2,i)*((%s div pow(2,i)) mod 2)| i in 0..%s-1] ));\n"
-                               %(opt_symbol_lex,pow(2,opt_symbol.bv_width()-1)-1,pow(2,opt_symbol.bv_width()-1),opt_symbol,pow(2,opt_symbol.bv_width()-1),opt_symbol,opt_symbol.bv_width()-1))
+                file_out.write("constraint( %s = %s - %s );\n"%(opt_symbol_lex,pow(2,opt_symbol.bv_width()-1)-1,signed_view(opt_symbol,opt_symbol.bv_width())))
             elif name=="minimize" and "BV" in str(var_dict[opt_var][0]) and signed>-1: #maximization BV8 signed -> maxvalue is 127 -> minimize 127-opt_symbol
-                file_out.write("constraint( %s = (-%s*((%s div %s) mod 2))+sum([pow(2,i)*((%s div pow(2,i)) mod 2)| i in 0..%s-1] ));\n"
-                               %(opt_symbol_lex,pow(2,opt_symbol.bv_width()-1),opt_symbol,pow(2,opt_symbol.bv_width()-1),opt_symbol,opt_symbol.bv_width()-1))
+                file_out.write("constraint( %s = %s );\n"%(opt_symbol_lex,signed_view(opt_symbol,opt_symbol.bv_width())))
             else:
                 assignment = mgr.Equals(opt_symbol,opt_symbol_lex)
                 file_out.write("constraint ("+self.serializer.serialize(assignment,daggify=False)+");\n")
             if upper is not None:
                 if "BV" in str(upper.get_type()):
-                    file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
+                    if not wide:
+                        file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
                     if signed>=0:
                         less_than = mgr.BVSLE(opt_symbol,upper)
                     else:
@@ -293,7 +475,8 @@ class Omt2Mzn():
                     file_out.write("constraint ("+self.serializer.serialize(less_than,daggify=False)+");\n")
             if lower is not None:
                 if "BV" in str(lower.get_type()):
-                    file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
+                    if not wide:
+                        file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
                     if signed>=0:
                         less_than = mgr.BVSLE(lower,opt_symbol)
                     else:
@@ -302,7 +485,10 @@ class Omt2Mzn():
                 else:
                     less_than = mgr.LE(lower,opt_symbol)
                     file_out.write("constraint ("+self.serializer.serialize(less_than,daggify=False)+");\n")
-            var_list.append(opt_symbol_lex)
+            if wide:
+                var_list+=self.wide_objective(opt_symbol,name,signed>-1)
+            else:
+                var_list.append(opt_symbol_lex)
         file_out.write("array[int] of var "+str(final_type)+": obj_array;\n")
         file_out.write("obj_array=[")
         file_out.write(str(var_list[0]))
@@ -311,17 +497,7 @@ class Omt2Mzn():
         file_out.write("];\n")
         file_out.write("%using minisearch\n")
         file_out.write("solve search minimize_lex_pers(obj_array);\n")
-
-
-
-        ##Minisearch Paper Implementation
-        file_out.write("""\n
-    function ann : minimize_lex_pers(array[int] of var """+str(final_type)+""" : objs) =
-        next() /\ commit() /\ print() /\\
-        repeat( scope(
-            post(lex_less(objs, [sol(objs[i]) | i in index_set(objs)])) /\\
-            if next() then commit() /\ print() else break endif ) );
-    """)
+        file_out.write(MINIMIZE_LEX_PERS % final_type)
 
     ## ------  END   LEX ------##
     ## ------  BOX STACK ------##
@@ -329,78 +505,39 @@ class Omt2Mzn():
 
     def write_stack_box(self,var_dict,asserts_list,asserts_soft_list,commands_list,out_file):
         '''
-            For each function to maximize or to minize create a new file,
-            keep the assignement to the optimization variables on all the files but not the upper
-            and lower constraints
+            For each function to maximize or to minize create a new file that includes the
+            shared base file, with the declarations, the assertions and the assignments to the
+            optimization variables, and adds its upper and lower constraints and its solve item
         '''
         i=0
         common_lines=[]
-        unique_lower=[]
-        unique_upper=[]
+        unique_bounds=[]
         mgr = get_env()._formula_manager
-        signed = -1
         for (name,args) in commands_list: #argslist [cost_function,[parameter]]
-            upper=None
-            lower=None
-            args_inner=args[1]
-            index=args_inner.index(":id")
-            opt_var=args_inner[index+1] #temp variable (d'appoggio) to maximize or minimize
-            objective_arg = args[0] #FNODE type -> parsed with get_expression
-            try:
-                signed=args_inner.index(":signed")
-            except ValueError:
-                signed=-1
-            #writing the maximize and the minimize
-            if ":upper" in args_inner:
-                index=args_inner.index(":upper")
-                upper=args_inner[index+1]
-            if ":lower" in args_inner:
-                index=args_inner.index(":lower")
-                lower=args_inner[index+1]
-            if objective_arg.size() == 1: #name of a variable
-                objective_arg=mgr._create_symbol(str(args[0]),typename=var_dict[str(args[0])][0])
-            opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
-            assignment = mgr.Equals(opt_symbol,objective_arg)
-            common_lines.append("constraint ("+self.serializer.serialize(assignment,daggify=False)+");\n")
-            #opt_Var and opt_symbol are the same
-            if upper is not None:
-                if "BV" in str(upper.get_type()):
-                    if signed>=0:
-                        less_than = mgr.BVSLE(opt_symbol,upper)
-                    else:
-                        less_than = mgr.BVULE(opt_symbol,upper)
-                    unique_upper.append("constraint ("+self.serializer.serialize(less_than)+");\n")
-                else:
-                    less_than = mgr.LE(opt_symbol,upper)
-                    unique_upper.append("constraint ("+self.serializer.serialize(less_than,daggify=False)+");\n")
-            else:
-                unique_upper.append(" ")
-            if lower is not None:
-                if "BV" in str(lower.get_type()):
-                    if signed>=0:
-                        less_than = mgr.BVSLE(lower,opt_symbol)
-                    else:
-                        less_than = mgr.BVULE(lower,opt_symbol)
-                    unique_lower.append("constraint ("+self.serializer.serialize(less_than)+");\n")
-                else:
-                    less_than = mgr.LE(lower,opt_symbol)
-                    unique_lower.append("constraint ("+self.serializer.serialize(less_than,daggify=False)+");\n")
-            else:
-                unique_lower.append(" ")
+            (assignment,bounds)=self.serialize_box_objective(args,var_dict)
+            common_lines.append("constraint ("+assignment+");\n")
+            unique_bounds.append("".join("constraint ("+bound+");\n" for bound in bounds))
+        relations=self.get_objective_relations(commands_list,var_dict)
+        base_domains=self.get_domains(asserts_list,[assignment for (assignment,_) in relations])
+        #the text shared by all the files is written once in the base file
+        base_file=out_file.replace(".mzn","_base.mzn")
+        file_out=open(base_file,"w")
+        print("writing variables")
+        self.write_list_variables(var_dict,file_out,base_domains)
+        print("writing assertions")
+        self.write_assertions(asserts_list,file_out,var_dict)
+        print("writing soft")
+        self.write_assertions_soft(asserts_soft_list,file_out)
+        for line in common_lines:
+            file_out.write(line)
+        self.write_tables(file_out)
+        file_out.close()
         for (name,args) in commands_list:
             i+=1
             file_out=open(out_file.replace(".mzn","_b"+str(i))+".mzn","w")
-            print("writing variables")
-            self.write_list_variables(var_dict,file_out)
-            print("writing assertions")
-            self.write_assertions(asserts_list,file_out,var_dict)
-            print("writing soft")
-            self.write_assertions_soft(asserts_soft_list,file_out)
+            file_out.write("include \"%s\";\n"%os.path.basename(base_file))
             print("writing maximize/minimize")
-            for line in common_lines:
-                file_out.write(line)
-            file_out.write(unique_lower[i-1]) #same list as command_list
-            file_out.write(unique_upper[i-1]) #same list as command_list
+            file_out.write(unique_bounds[i-1]) #same list as command_list
             args_inner=args[1]
             index=args_inner.index(":id")
             opt_var=args_inner[index+1]
@@ -409,12 +546,18 @@ class Omt2Mzn():
                 signed=args_inner.index(":signed")
             except ValueError:
                 signed=-1
-            if name=='maximize': #qui si puo decidere facilmente se con segno o no, basta vedere se signed
+            if self.serializer.wide_bv(var_dict[opt_var][0]):
+                #lexicographic search on the limbs, from the most significant one
+                file_out.write("include \"minisearch.mzn\";\n")
+                file_out.write("%using minisearch\n")
+                file_out.write("solve search minimize_lex_pers([%s]);\n"%",".join(self.wide_objective(opt_symbol,name,signed!=-1)))
+                file_out.write(MINIMIZE_LEX_PERS % "int")
+                opt_var=limbs_value(limbs_name(opt_var),opt_symbol.bv_width(),self.serializer.limb)
+            elif name=='maximize': #qui si puo decidere facilmente se con segno o no, basta vedere se signed
                 if "BV" in str(var_dict[opt_var][0]):
                     file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
                     if signed!=-1:
-                        file_out.write("solve maximize (-%s*((%s div %s) mod 2))+sum([pow(2,i)*((%s div pow(2,i)) mod 2)| i in 0..%s-1]);\n"
-                                                        %(pow(2,opt_symbol.bv_width()-1),opt_symbol,pow(2,opt_symbol.bv_width()-1),opt_symbol,opt_symbol.bv_width()-1))
+                        file_out.write("solve maximize %s;\n"%signed_view(opt_symbol,opt_symbol.bv_width()))
                     else:
                         #bound = mgr.And(mgr.BVULE(opt_symbol,mgr.BV(pow(2,opt_symbol.bv_width())-1,width=opt_symbol.bv_width())),mgr.BVUGE(opt_symbol,mgr.BV(0,width=opt_symbol.bv_width())))
                         #file_out.write("constraint ("+self.serializer.serialize(bound)+");\n")
@@ -425,8 +568,7 @@ class Omt2Mzn():
                 if "BV" in str(var_dict[opt_var][0]):
                     file_out.write("constraint(%s >= %s /\ %s <= %s);\n"%(opt_symbol,0,opt_symbol,pow(2,opt_symbol.bv_width())-1))
                     if signed!=-1:
-                        file_out.write("solve minimize (-%s*((%s div %s) mod 2))+sum([pow(2,i)*((%s div pow(2,i)) mod 2)| i in 0..%s-1]);\n"
-                                                        %(pow(2,opt_symbol.bv_width()-1),opt_symbol,pow(2,opt_symbol.bv_width()-1),opt_symbol,opt_symbol.bv_width()-1))
+                        file_out.write("solve minimize %s;\n"%signed_view(opt_symbol,opt_symbol.bv_width()))
                     else:
                         #bound = mgr.And(mgr.BVULE(opt_symbol,mgr.BV(pow(2,opt_symbol.bv_width())-1,width=opt_symbol.bv_width())),mgr.BVUGE(opt_symbol,mgr.BV(0,width=opt_symbol.bv_width())))
                         #file_out.write("constraint ("+self.serializer.serialize(bound)+");\n")
@@ -438,48 +580,316 @@ class Omt2Mzn():
             file_out.write("output [ \"opt_var = \",show("+opt_var+")]")
             file_out.close()
 
+    def write_stack_box_minisearch(self,var_dict,asserts_list,asserts_soft_list,commands_list,out_file):
+        '''
+            Single MiniSearch model for all the functions to maximize or to minimize: they are
+            optimized one after the other, each one in a scope with its upper and lower constraints
+        '''
+        mgr = get_env()._formula_manager
+        out_file=out_file.replace(".mzn","b.mzn")
+        file_out=open(out_file,"w")
+        file_out.write("include \"minisearch.mzn\";\n")
+        objectives=[]
+        for (name,args) in commands_list:
+            (assignment,bounds)=self.serialize_box_objective(args,var_dict)
+            objectives.append((name,args,assignment,bounds))
+        relations=self.get_objective_relations(commands_list,var_dict)
+        print("writing variables")
+        self.write_list_variables(var_dict,file_out,self.get_domains(asserts_list,[assignment for (assignment,_) in relations]))
+        print("writing assertions")
+        self.write_assertions(asserts_list,file_out,var_dict)
+        print("writing soft")
+        self.write_assertions_soft(asserts_soft_list,file_out)
+        print("writing maximize/minimize")
+        searches=[]
+        types=set()
+        for (name,args,assignment,bounds) in objectives:
+            file_out.write("constraint ("+assignment+");\n")
+            args_inner=args[1]
+            opt_var=args_inner[args_inner.index(":id")+1]
+            opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
+            signed=":signed" in args_inner
+            if self.serializer.wide_bv(var_dict[opt_var][0]):
+                #lexicographic search on the limbs, from the most significant one
+                (obj,shown,typeO)=("[%s]"%",".join(self.wide_objective(opt_symbol,name,signed)),limbs_name(opt_var),"array")
+            else:
+                obj=signed_view(opt_symbol,opt_symbol.bv_width()) if signed else opt_var
+                if name=="maximize":
+                    obj="-"+obj
+                (shown,typeO)=(opt_var,"float" if "Real" in str(var_dict[opt_var][0]) else "int")
+            types.add(typeO)
+            post="post(%s) /\\ "%" /\\ ".join(bounds) if bounds else ""
+            searches.append("scope( %sminimize_box(%s,%s,\"%s\") )"%(post,obj,shown,opt_var))
+        self.write_tables(file_out)
+        file_out.write("%using minisearch\n")
+        file_out.write("solve search\n    "+" /\\\n    ".join(searches)+";\n")
+        for typeO in sorted(types):
+            file_out.write(MINIMIZE_BOX_LEX if typeO=="array" else MINIMIZE_BOX % (typeO,typeO))
+        file_out.close()
+
+    def serialize_box_objective(self,args,var_dict):
+        '''
+            Serialized assignment opt_var = objective of a box command and its :lower/:upper bounds
+        '''
+        mgr = get_env()._formula_manager
+        args_inner=args[1]
+        index=args_inner.index(":id")
+        opt_var=args_inner[index+1] #temp variable (d'appoggio) to maximize or minimize
+        objective_arg = args[0] #FNODE type -> parsed with get_expression
+        signed=":signed" in args_inner
+        if objective_arg.size() == 1: #name of a variable
+            objective_arg=mgr._create_symbol(str(args[0]),typename=var_dict[str(args[0])][0])
+        opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
+        assignment = mgr.Equals(opt_symbol,objective_arg)
+        bounds=[]
+        #opt_Var and opt_symbol are the same
+        if ":lower" in args_inner:
+            lower=args_inner[args_inner.index(":lower")+1]
+            if "BV" in str(lower.get_type()):
+                less_than = mgr.BVSLE(lower,opt_symbol) if signed else mgr.BVULE(lower,opt_symbol)
+                bounds.append(self.serializer.serialize(less_than))
+            else:
+                bounds.append(self.serializer.serialize(mgr.LE(lower,opt_symbol),daggify=False))
+        if ":upper" in args_inner:
+            upper=args_inner[args_inner.index(":upper")+1]
+            if "BV" in str(upper.get_type()):
+                less_than = mgr.BVSLE(opt_symbol,upper) if signed else mgr.BVULE(opt_symbol,upper)
+                bounds.append(self.serializer.serialize(less_than))
+            else:
+                bounds.append(self.serializer.serialize(mgr.LE(opt_symbol,upper),daggify=False))
+        return (self.serializer.serialize(assignment,daggify=False),bounds)
+
+    def wide_objective(self,opt_symbol,name,signed):
+        '''
+            Expressions on the limbs of a wide BV objective whose lexicographic minimization,
+            from the most significant limb, optimizes it
+        '''
+        sizes=limb_sizes(opt_symbol.bv_width(),self.serializer.limb)
+        res=[]
+        for k in reversed(range(len(sizes))):
+            limb="%s[%d]"%(limbs_name(str(opt_symbol)),k)
+            if signed and k==len(sizes)-1:
+                #flipping the sign bit maps the signed order on the unsigned one
+                limb=offset_view(limb,sizes[k])
+            if name=="maximize":
+                limb="%d - %s"%(pow(2,sizes[k])-1,limb)
+            res.append(limb)
+        return res
+
     ## ------  END BOX ------##
 
+    ## ------  FLATZINC ------##
+
+    def write_stack_fzn(self,var_dict,asserts_list,asserts_soft_list,commands_list,set_priority_option,out_file):
+        '''
+            Write directly the FlatZinc files of the section (simple or box), skipping mzn2fzn.
+            Only the boolean and linear arithmetic fragment is supported, NotImplementedErr
+            is raised otherwise and nothing is written
+        '''
+        if len(commands_list)>0 and set_priority_option=='lex':
+            raise NotImplementedErr("The lexicographic optimization requires minisearch")
+        mgr = get_env()._formula_manager
+        printer = FZNPrinter(self.float_domains)
+        names=dict((str(s),s.symbol_name()) for s in mgr.get_all_symbols())    #the keys of var_dict are printed symbols
+        for var in var_dict.keys():
+            printer.declare_symbol(names.get(var,var),var_dict[var][0])
+        print("writing assertions")
+        for el in asserts_list:
+            if type(el) is list:
+                el=el[0]
+            printer.assert_formula(el)
+        print("writing soft")
+        self.write_assertions_soft_fzn(asserts_soft_list,var_dict,printer)
+        files=[]                     #(file name, content) written only if the whole section is supported
+        if len(commands_list)==0:
+            buf=cStringIO()
+            printer.write(buf,"solve satisfy;\n")
+            files.append((out_file.replace(".mzn","s.fzn"),buf.getvalue()))
+        else:
+            print("writing maximize/minimize")
+            for (name,args) in commands_list:
+                args_inner=args[1]
+                opt_var=args_inner[args_inner.index(":id")+1]
+                objective_arg = args[0]
+                if objective_arg.size() == 1: #name of a variable
+                    objective_arg=mgr._create_symbol(str(args[0]),typename=var_dict[str(args[0])][0])
+                opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
+                printer.assert_formula(mgr.Equals(opt_symbol,objective_arg))
+            i=0
+            for (name,args) in commands_list:
+                i+=1
+                args_inner=args[1]
+                opt_var=args_inner[args_inner.index(":id")+1]
+                opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
+                state=printer.checkpoint()
+                if ":upper" in args_inner:
+                    printer.assert_formula(mgr.LE(opt_symbol,args_inner[args_inner.index(":upper")+1]))
+                if ":lower" in args_inner:
+                    printer.assert_formula(mgr.LE(args_inner[args_inner.index(":lower")+1],opt_symbol))
+                buf=cStringIO()
+                printer.write(buf,"solve %s %s;\n"%(name,printer._quote(names.get(opt_var,opt_var))))
+                files.append((out_file.replace(".mzn","_b"+str(i))+".fzn",buf.getvalue()))
+                printer.rollback(state)
+        for (name,content) in files:
+            file_out=open(name,"w")
+            file_out.write(content)
+            file_out.close()
+
+    def write_assertions_soft_fzn(self,asserts_soft_list,var_dict,printer):
+        '''
+            FlatZinc version of write_assertions_soft: the cost of each group is
+            posted as cost = sum(ite(indicator,0,weight))
+        '''
+        mgr = get_env()._formula_manager
+        var_index = {}
+        cost_terms = {}
+        for el in asserts_soft_list:
+            cost=el[-1]
+            cost_type=var_dict[cost][0]
+            indicator=mgr._create_symbol(cost+"_"+str(var_index.get(cost,0)),tp.BOOL)
+            var_index[cost]=var_index.get(cost,0)+1
+            printer.declare_symbol(str(indicator),tp.BOOL)
+            if cost in self.soft_directions:
+                weight_value=el[1].constant_value() if el[1].is_constant() else 0
+                if (self.soft_directions[cost]=="minimize") == (weight_value>=0):
+                    printer.assert_formula(mgr.Implies(indicator,el[0]))
+                else:
+                    printer.assert_formula(mgr.Implies(el[0],indicator))
+            else:
+                printer.assert_formula(mgr.Iff(indicator,el[0]))
+            if not el[1].is_constant():
+                raise NotImplementedErr("Only constant weights can be translated into FlatZinc")
+            if cost_type.is_real_type():
+                zero,weight=mgr.Real(0),mgr.Real(Fraction(el[1].constant_value()))
+            elif Fraction(el[1].constant_value()).denominator==1:
+                zero,weight=mgr.Int(0),mgr.Int(int(el[1].constant_value()))
+            else:
+                raise NotImplementedErr("Real weight for the integer cost %s"%cost)
+            cost_terms.setdefault(cost,[]).append(mgr.Ite(indicator,zero,weight))
+        for cost in cost_terms:
+            cost_symbol=mgr._create_symbol(cost,var_dict[cost][0])
+            printer.assert_formula(mgr.Equals(cost_symbol,mgr.Plus(cost_terms[cost])))
+
+    ## ------  END FLATZINC ------##
+
     def write_stack_simple(self,var_dict,asserts_list,asserts_soft_list,out_file):
         out_file=out_file.replace(".mzn","s.mzn")
         file_out=open(out_file,"w")
         print("writing variables")
-        self.write_list_variables(var_dict,file_out)
+        self.write_list_variables(var_dict,file_out,self.get_domains(asserts_list,[]))
         print("writing assertions")
         self.write_assertions(asserts_list,file_out,var_dict)
         print("writing soft")
         self.write_assertions_soft(asserts_soft_list,file_out)
+        self.write_tables(file_out)
         print("writing satisfy")
         file_out.write("solve satisfy;\n")
         file_out.close()
 
-    def write_list_variables(self,variables,file_out):
+    def write_tables(self,file_out):
+        '''
+            Write the power tables used by the variable shifts of the serialized formulae
+        '''
+        for width in sorted(self.serializer.pow2_widths):
+            file_out.write(pow2_table(width))
+
+    def write_list_variables(self,variables,file_out,domains=None):
         '''
             Writes list of the variables in mzn
+            domains: intervals (lo,hi) inferred by the DomainAnalyzer, None is an unbounded side
         '''
+        if domains is None:
+            domains={}
         for var in variables.keys():
+            (lo,hi)=domains.get(str(var),(None,None))
             #In minizinc if no domain is specified there can be problems with the solver like g12
             bv_search=re.search(r"BV{([0-9]+)}",str(variables[var][0]))
-            if bv_search:
-                file_out.write("var 0.."+str(pow(2,int(bv_search.groups(0)[0]))-1)+" : "+str(var)+";\n")
+            if bv_search and self.serializer.wide_bv(variables[var][0]):
+                sizes=limb_sizes(int(bv_search.groups(0)[0]),self.serializer.limb)
+                file_out.write("array[0..%d] of var 0..%d : %s;\n"%(len(sizes)-1,pow(2,self.serializer.limb)-1,limbs_name(str(var))))
+                if sizes[-1]<self.serializer.limb:
+                    file_out.write("constraint %s[%d] <= %d;\n"%(limbs_name(str(var)),len(sizes)-1,pow(2,sizes[-1])-1))
+            elif bv_search:
+                lo=0 if lo is None else max(lo,0)
+                hi=pow(2,int(bv_search.groups(0)[0]))-1 if hi is None else min(hi,pow(2,int(bv_search.groups(0)[0]))-1)
+                file_out.write("var "+str(lo)+".."+str(hi)+" : "+str(var)+";\n")
+                if self.bv_encoding=="bits":
+                    width=int(bv_search.groups(0)[0])
+                    file_out.write("array[0..%d] of var bool : %s;\n"%(width-1,bits_name(str(var))))
+                    file_out.write("constraint %s = sum(i in 0..%d)(bool2int(%s[i])*pow(2,i));\n"%(str(var),width-1,bits_name(str(var))))
+                elif self.bv_encoding=="sets":
+                    width=int(bv_search.groups(0)[0])
+                    file_out.write("var set of 0..%d : %s;\n"%(width-1,sets_name(str(var))))
+                    file_out.write("constraint %s = sum(i in 0..%d)(bool2int(i in %s)*pow(2,i));\n"%(str(var),width-1,sets_name(str(var))))
+                elif str(var) in self.serializer.bit_symbols:
+                    width=int(bv_search.groups(0)[0])
+                    file_out.write("array[0..%d] of var 0..1 : %s;\n"%(width-1,bits_name(str(var))))
+                    file_out.write("constraint %s = sum(i in 0..%d)(pow(2,i)*%s[i]);\n"%(str(var),width-1,bits_name(str(var))))
                 #   file_out.write("constraint("+str(var)+">=0 /\ "+str(pow(2,int(bv_search.groups(0)[0])))+" > "+str(var)+");\n")
             elif "Real" in str(variables[var][0]):
                 if self.float_domains==0:
-                    file_out.write("var -2147483648.0..2147483648.0: "+str(var)+";\n")
+                    (lo_s,hi_s)=("-2147483648.0","2147483648.0")
                 else:
-                    file_out.write("var -3.402823e+38..3.402823e+38 : "+str(var)+";\n")
+                    (lo_s,hi_s)=("-3.402823e+38","3.402823e+38")
+                #the inferred bounds are used only if they are exact as floats and inside the default domain
+                if lo is not None and Fraction(float(lo))==lo and float(lo)>float(lo_s):
+                    lo_s=repr(float(lo))
+                if hi is not None and Fraction(float(hi))==hi and float(hi)<float(hi_s):
+                    hi_s=repr(float(hi))
+                if self.float_domains==0:
+                    file_out.write("var "+lo_s+".."+hi_s+": "+str(var)+";\n")
+                else:
+                    file_out.write("var "+lo_s+".."+hi_s+" : "+str(var)+";\n")
                 #file_out.write("var float : "+str(var)+";\n")
+            elif "Int" in str(variables[var][0]) and lo is not None and hi is not None:
+                file_out.write("var "+str(lo)+".."+str(hi)+":"+str(var)+";\n")
             else:
                 typeD=variables[var][0]
                 file_out.write("var "+str(typeD).lower()+":"+str(var)+";\n")
 
+    def get_objective_relations(self,commands_list,var_dict):
+        '''
+            For each command the assignment opt_var = objective and the list of its :lower/:upper bounds,
+            the signed bitvector bounds are skipped since they are not intervals of the encoding
+        '''
+        mgr = get_env()._formula_manager
+        res=[]
+        for (name,args) in commands_list:
+            args_inner=args[1]
+            opt_var=args_inner[args_inner.index(":id")+1]
+            objective_arg = args[0]
+            if objective_arg.size() == 1: #name of a variable
+                objective_arg=mgr._create_symbol(str(args[0]),typename=var_dict[str(args[0])][0])
+            opt_symbol = mgr._create_symbol(opt_var,var_dict[opt_var][0])
+            bounds=[]
+            if ":signed" not in args_inner:
+                if ":upper" in args_inner:
+                    upper=args_inner[args_inner.index(":upper")+1]
+                    bounds.append(mgr.BVULE(opt_symbol,upper) if "BV" in str(upper.get_type()) else mgr.LE(opt_symbol,upper))
+                if ":lower" in args_inner:
+                    lower=args_inner[args_inner.index(":lower")+1]
+                    bounds.append(mgr.BVULE(lower,opt_symbol) if "BV" in str(lower.get_type()) else mgr.LE(lower,opt_symbol))
+            res.append((mgr.Equals(opt_symbol,objective_arg),bounds))
+        return res
+
+    def get_domains(self,asserts_list,relations,domains=None):
+        '''
+            Intervals of the variables implied by the hard assertions and the given relations
+        '''
+        formulas=list(relations)
+        for el in asserts_list:
+            if type(el) is list:
+                el=el[0]
+            formulas+=self.split_conjuncts(el)
+        return self.domain_analyzer.analyze(formulas,domains)
+
 
     def write_assertions(self,asserts_list,file_out,var_dict):
         '''
             Write the list of assertion
 
         '''
-        if self.flag_bigand==True: #necessary bigand
+        if self.flag_bigand==True and asserts_list: #necessary bigand
             mgr = get_env()._formula_manager
             bigAnd=asserts_list[0][0]
             tmp_ris=None
@@ -495,7 +905,53 @@ class Omt2Mzn():
             for el in asserts_list:
                 if type(el) is list:
                     el=el[0]
-                self.serializer.serialize(el,output_file=file_out)
+                cache=self.assertion_caches.get(el)
+                for conjunct in self.split_conjuncts(el):
+                    if cache is None:
+                        self.serializer.serialize(conjunct,output_file=file_out)
+                    else:
+                        self.write_cached_assertion(conjunct,cache,file_out)
+
+    def write_cached_assertion(self,formula,cache,file_out):
+        '''
+            Write the constraint of the formula serialized once per frame, the text depends also
+            on the BV variables of the formula with a global array of bits and on the BV split
+            in limbs in the section, see select_limbs
+        '''
+        bits=frozenset(quote(v.symbol_name()) for v in formula.get_free_variables())&self.serializer.bit_symbols
+        key=(formula,bits,self.serializer.wide_width)
+        if key not in cache:
+            widths=self.serializer.pow2_widths
+            self.serializer.pow2_widths=set()   #the power tables used by the formula
+            buf=cStringIO()
+            self.serializer.serialize(formula,output_file=buf)
+            cache[key]=(buf.getvalue(),self.serializer.pow2_widths)
+            buf.close()
+            self.serializer.pow2_widths=widths
+        (text,tables)=cache[key]
+        self.serializer.pow2_widths.update(tables)
+        file_out.write(text)
+
+    def split_conjuncts(self,formula):
+        '''
+            Splits a top level assertion in the list of its conjuncts
+            And(a,b) -> a,b    Not(Or(a,b)) -> Not(a),Not(b)    Not(Not(a)) -> a
+            each of them is written as a separate constraint item
+        '''
+        mgr = get_env()._formula_manager
+        res=[]
+        stack=[formula]
+        while stack:
+            f=stack.pop()
+            if f.is_and():
+                stack.extend(reversed(f.args()))
+            elif f.is_not() and f.arg(0).is_or():
+                stack.extend(reversed([mgr.Not(s) for s in f.arg(0).args()]))
+            elif f.is_not() and f.arg(0).is_not():
+                stack.append(f.arg(0).arg(0))
+            elif not f.is_true():
+                res.append(f)
+        return res
 
     def write_assertions_soft(self,asserts_soft_list,file_out):
         '''
@@ -516,8 +972,17 @@ class Omt2Mzn():
             file_out.write("var bool:"+el[-1]+"_"+str(var_index[el[-1]])+";\n")
 
             ris=self.serializer.serialize(el[0])
-            file_out.write("constraint ("+el[-1]+"_"+str(var_index[el[-1]])+" = "+ris+");\n")
-            var_weight[el[-1]+"_"+str(var_index[el[-1]])]=self.serializer.serialize(el[1],daggify=False)
+            weight=self.serializer.serialize(el[1],daggify=False)
+            indicator=el[-1]+"_"+str(var_index[el[-1]])
+            if el[-1] in self.soft_directions:
+                #the indicator is wanted true when the satisfied assertion lowers the optimized cost
+                if (self.soft_directions[el[-1]]=="minimize") == (eval(weight)>=0):
+                    file_out.write("constraint ("+indicator+" -> "+ris+");\n")
+                else:
+                    file_out.write("constraint (("+ris+") -> "+indicator+");\n")
+            else:
+                file_out.write("constraint ("+indicator+" = "+ris+");\n")
+            var_weight[indicator]=weight
             var_index[el[-1]]+=1
         for cost in cost_variables_set:
             file_out.write("constraint ("+cost+"=")
@@ -554,11 +1019,25 @@ if __name__ == "__main__":
     parser.add_argument("--asoft_var_type",type=str,default="Real",choices=["Real","Int"],help="Set type for all the assert-soft variables")
     parser.add_argument("--big_and", action="store_true",default=False, help="if used this option allows to merge all the asserts in only one big assert")
     parser.add_argument("--max_int_bit_size",type=int,default=32,choices=[32,64],help="""define the size of the integer variable used by the mzn solver.\n
-                                                                                                Is useful for the BV problems.\n
+                                                                                                Is useful for the BV problems: with the printers 0 and 2 the BV wider than half of it are split in limbs.\n
                                                                                                 The default values is 32. The possible values are 32,64""")
-    parser.add_argument("--printer_opt",type=int,default=0,choices=[0,1],help="""0: Default daggify print, it creates a new scopes for every subformula\n
-                                                                        1: 2 Fathers daggify print, it creates a labeling exclusively for every boolean subformula with 2 fathers in the formula DAG""")
+    parser.add_argument("--printer_opt",type=int,default=0,choices=[0,1,2],help="""0: Default daggify print, it creates a new scopes for every subformula\n
+                                                                        1: 2 Fathers daggify print, it creates a labeling exclusively for every boolean subformula with 2 fathers in the formula DAG\n
+                                                                        2: Flat daggify print, like 0 but all the subformulas of a constraint are declared in a single let scope""")
+    parser.add_argument("--label_threshold",type=int,default=None,help="""Used with --printer_opt 1: label a subformula only if (number of fathers - 1) * (size of the subformula)\n
+                                                                        is at least the threshold. Lower values produce smaller mzn files with more auxiliary variables.\n
+                                                                        By default the 2 fathers rule is used""")
+    parser.add_argument("--half_reif", action="store_true",default=False, help="""if used the boolean labels of --printer_opt 1 and the assert-soft indicators that occur\n
+                                                                        with a single polarity are half reified (label -> expr or expr -> label)""")
+    parser.add_argument("--fzn", action="store_true",default=False, help="""if used the sections in the boolean and linear arithmetic fragment (simple and box)\n
+                                                                        are written directly in FlatZinc (.fzn), the other ones are still written in mzn""")
+    parser.add_argument("--bv_encoding", type=str, choices=["int","bits","sets"],default="int", help="encoding of the bitvectors: integers (int), arrays of var bool with bitwise operators (bits) or var sets of the positions of the one bits (sets), bits and sets are used by the printers 0 and 2")
+    parser.add_argument("--box_minisearch", action="store_true",default=False, help="""if used the box sections are written as a single MiniSearch model that optimizes\n
+                                                                        the objectives one after the other, instead of a file for each objective""")
+    parser.add_argument("--activation", action="store_true",default=False, help="""if used a script without objectives and assert-soft is written as a single model, the assertions\n
+                                                                        of the pushed frames are guarded by par bool parameters set by a .dzn file for each check-sat""")
+    parser.add_argument("--compact", action="store_true",default=False, help="if used the mzn output is written with minimal separators and short names for the generated variables")
     parser.add_argument("--float_domains",type=int,default=0,choices=[0,1],help=" Float Domains options -> 0:-2147483648.0..2147483648.0  1:-3.402823e+38..3.402823e+38 ")
     args = parser.parse_args()
-    parser=Omt2Mzn(args.input_file,args.output_file,args.big_and,args.max_int_bit_size,args.printer_opt,args.asoft_var_type,args.float_domains)
+    parser=Omt2Mzn(args.input_file,args.output_file,args.big_and,args.max_int_bit_size,args.printer_opt,args.asoft_var_type,args.float_domains,args.label_threshold,args.half_reif,args.fzn,args.compact,args.bv_encoding,args.box_minisearch,args.activation)
     parser.startParsing()
@@ -0,0 +1,228 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import pyomt.operators as op
+from pyomt.walkers import DagWalker
+from pyomt.walkers.generic import handles
+from pyomt.typing import BOOL
+
+UNBOUNDED = (None, None)
+
+
+def _add(a, b):
+    if a is None or b is None:
+        return None
+    return a + b
+
+def _hull(intervals):
+    lows = [i[0] for i in intervals]
+    highs = [i[1] for i in intervals]
+    return (None if None in lows else min(lows), None if None in highs else max(highs))
+
+def _intersect(a, b):
+    lo = a[0] if b[0] is None or (a[0] is not None and a[0] >= b[0]) else b[0]
+    hi = a[1] if b[1] is None or (a[1] is not None and a[1] <= b[1]) else b[1]
+    return (lo, hi)
+
+
+class IntervalWalker(DagWalker):
+    """Over-approximates the values of a numeric or bitvector term with an
+    interval (lo, hi), None standing for an unbounded side.
+
+    Bitvectors are read as unsigned numbers, as they are encoded in mzn, the
+    symbols take their interval from the domains dictionary.
+    """
+
+    HANDLED = set([op.SYMBOL, op.INT_CONSTANT, op.REAL_CONSTANT, op.BV_CONSTANT,
+                   op.PLUS, op.MINUS, op.TIMES, op.TOREAL, op.ITE,
+                   op.BV_AND, op.BV_OR, op.BV_ZEXT, op.BV_CONCAT,
+                   op.BV_UREM, op.BV_UDIV, op.BV_LSHR])
+
+    def __init__(self, domains, env=None):
+        DagWalker.__init__(self, env=env)
+        self.domains = domains
+
+    def _bv_range(self, formula):
+        return (0, 2**formula.bv_width() - 1)
+
+    def _const(self, formula):
+        if formula.is_constant():
+            return formula.constant_value()
+        return None
+
+    @handles(set(op.ALL_TYPES) - HANDLED)
+    def walk_unbounded(self, formula, args, **kwargs):
+        if formula.get_type().is_bv_type():
+            return self._bv_range(formula)
+        return UNBOUNDED
+
+    def walk_symbol(self, formula, args, **kwargs):
+        res = self.domains.get(formula.symbol_name(), UNBOUNDED)
+        if formula.symbol_type().is_bv_type():
+            res = _intersect(res, self._bv_range(formula))
+        return res
+
+    @handles(op.INT_CONSTANT, op.REAL_CONSTANT, op.BV_CONSTANT)
+    def walk_constant(self, formula, args, **kwargs):
+        return (formula.constant_value(), formula.constant_value())
+
+    def walk_plus(self, formula, args, **kwargs):
+        res = (0, 0)
+        for (lo, hi) in args:
+            res = (_add(res[0], lo), _add(res[1], hi))
+        return res
+
+    def walk_minus(self, formula, args, **kwargs):
+        (l0, h0), (l1, h1) = args
+        return (_add(l0, None if h1 is None else -h1), _add(h0, None if l1 is None else -l1))
+
+    def walk_times(self, formula, args, **kwargs):
+        res = (1, 1)
+        for (lo, hi) in args:
+            if None in res or lo is None or hi is None:
+                #only a constant factor keeps the known side of an unbounded one
+                if lo is not None and lo == hi and lo != 0:
+                    res = (res[0]*lo if res[0] is not None else None, res[1]*lo if res[1] is not None else None)
+                    if lo < 0:
+                        res = (res[1], res[0])
+                elif res[0] is not None and res[0] == res[1] and res[0] != 0:
+                    k = res[0]
+                    res = (lo*k if lo is not None else None, hi*k if hi is not None else None)
+                    if k < 0:
+                        res = (res[1], res[0])
+                else:
+                    return UNBOUNDED
+            else:
+                products = [a*b for a in res for b in (lo, hi)]
+                res = (min(products), max(products))
+        return res
+
+    def walk_toreal(self, formula, args, **kwargs):
+        return args[0]
+
+    def walk_ite(self, formula, args, **kwargs):
+        if formula.get_type() == BOOL:
+            return UNBOUNDED
+        return _hull(args[1:])
+
+    def walk_bv_and(self, formula, args, **kwargs):
+        return (0, min(args[0][1], args[1][1]))
+
+    def walk_bv_or(self, formula, args, **kwargs):
+        return (max(args[0][0], args[1][0]), self._bv_range(formula)[1])
+
+    def walk_bv_zext(self, formula, args, **kwargs):
+        return args[0]
+
+    def walk_bv_concat(self, formula, args, **kwargs):
+        k = 2**formula.arg(1).bv_width()
+        return (args[0][0]*k + args[1][0], args[0][1]*k + args[1][1])
+
+    def walk_bv_urem(self, formula, args, **kwargs):
+        #the remainder of a division by zero is the dividend
+        if args[1][0] >= 1:
+            return (0, min(args[0][1], args[1][1] - 1))
+        return (0, args[0][1])
+
+    def walk_bv_udiv(self, formula, args, **kwargs):
+        if args[1][0] >= 1:
+            return (args[0][0] // args[1][1], args[0][1] // args[1][0])
+        return self._bv_range(formula)
+
+    def walk_bv_lshr(self, formula, args, **kwargs):
+        return (args[0][0] >> min(args[1][1], formula.bv_width()), args[0][1] >> args[1][0])
+
+#EOC IntervalWalker
+
+
+class DomainAnalyzer(object):
+    """Static interval analysis over top level assertions.
+
+    Bound atoms (x <= t, t < x, x = t, their negations and the unsigned
+    bitvector comparisons) restrict the domain of the symbol x to the interval
+    of the term t; the bounds are propagated until a fixpoint is reached or
+    max_rounds passes have been done.
+    """
+
+    def __init__(self, max_rounds=5, env=None):
+        self.max_rounds = max_rounds
+        self.env = env
+
+    def analyze(self, formulas, domains=None):
+        '''
+            Returns a dictionary symbol name -> (lo,hi) with the intervals inferred
+            from the conjunction of the formulas, starting from the given domains
+        '''
+        domains = dict(domains) if domains else {}
+        bounds = []
+        for f in formulas:
+            bounds += self._bound_atoms(f)
+        for _ in range(self.max_rounds):
+            walker = IntervalWalker(domains, env=self.env)
+            changed = False
+            for (sym, kind, term, strict) in bounds:
+                (lo, hi) = walker.walk(term)
+                if strict and not sym.symbol_type().is_real_type():
+                    lo, hi = _add(lo, 1), _add(hi, -1)
+                if kind == "le":
+                    new = (None, hi)
+                elif kind == "ge":
+                    new = (lo, None)
+                else:
+                    new = (lo, hi)
+                name = sym.symbol_name()
+                old = domains.get(name, UNBOUNDED)
+                res = _intersect(old, new)
+                if res != old:
+                    domains[name] = res
+                    changed = True
+            if not changed:
+                break
+        return domains
+
+    def _bound_atoms(self, formula):
+        '''
+            (symbol, "le"/"ge"/"eq", term, strict) for each side of a top level relation that
+            is a numeric or bitvector symbol
+        '''
+        negated = False
+        while formula.is_not():
+            negated = not negated
+            formula = formula.arg(0)
+        if formula.is_equals():
+            if negated:
+                return []
+            (l, r) = formula.args()
+            res = []
+            if l.is_symbol():
+                res.append((l, "eq", r, False))
+            if r.is_symbol():
+                res.append((r, "eq", l, False))
+            return res
+        if formula.is_le() or formula.is_lt() or formula.is_bv_ule() or formula.is_bv_ult():
+            strict = formula.is_lt() or formula.is_bv_ult()
+            (l, r) = formula.args()
+            if negated:
+                #not(l <= r) is r < l, not(l < r) is r <= l
+                (l, r, strict) = (r, l, not strict)
+            res = []
+            if l.is_symbol():
+                res.append((l, "le", r, strict))
+            if r.is_symbol():
+                res.append((r, "ge", l, strict))
+            return res
+        return []
+
+#EOC DomainAnalyzer
@@ -0,0 +1,308 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import collections
+from fractions import Fraction
+from pyomt.walkers import DagWalker
+from pyomt.utils import quote
+from pyomt.printers_mzn import NotImplementedErr
+from pyomt.typing import BOOL, REAL, INT
+
+
+class FZNPrinter(DagWalker):
+    """Serializes formulae of the boolean and linear arithmetic fragment
+    (QF_LIA, QF_LRA, pure boolean) directly into FlatZinc.
+
+    Top level conjunctions, clauses and linear relations are posted as
+    native constraints (bool_clause, int_lin_*, float_lin_*), every other
+    boolean subformula is reified into an introduced variable. Numeric terms
+    are kept as linear forms ({variable: coefficient}, constant) until a
+    relation or a nonlinear operator needs them.
+    """
+
+    def __init__(self,float_domains=0,template="X_INTRODUCED_%d_",env=None):
+        DagWalker.__init__(self, env=env)   #memoization is kept: subformulas are shared by all the constraints
+        self.float_domains=float_domains
+        self.template=template
+        self.name_seed=0
+        self.names=set()
+        self.declarations=[]
+        self.constraints=[]
+
+    def _new_var(self,typeF):
+        while (self.template % self.name_seed) in self.names:
+            self.name_seed += 1
+        res = (self.template % self.name_seed)
+        self.name_seed += 1
+        self.declarations.append("var %s: %s :: var_is_introduced;\n"%(self._fzn_type(typeF),res))
+        return res
+
+    def _fzn_type(self,typeF):
+        if typeF == BOOL:
+            return "bool"
+        elif typeF == INT:
+            return "int"
+        elif typeF == REAL:
+            if self.float_domains==0:
+                return "-2147483648.0..2147483648.0"
+            return "-3.402823e+38..3.402823e+38"
+        raise NotImplementedErr("The type %s cannot be translated into FlatZinc" % typeF)
+
+    def _post(self,constraint):
+        self.constraints.append(constraint)
+
+    def checkpoint(self):
+        """Returns the current state, to be restored by rollback"""
+        return (len(self.declarations),len(self.constraints),self.name_seed,dict(self.memoization))
+
+    def rollback(self,state):
+        """Drops everything that has been serialized after the checkpoint"""
+        n_decl,n_cons,self.name_seed,self.memoization = state
+        del self.declarations[n_decl:]
+        del self.constraints[n_cons:]
+
+    def declare_symbol(self,name,typeF):
+        name=self._quote(name)
+        self.names.add(name)
+        self.declarations.append("var %s: %s :: output_var;\n"%(self._fzn_type(typeF),name))
+
+    def _quote(self,name):
+        """Identifier of the symbol name, quoted as the mzn identifiers when needed"""
+        return quote(name,style="'")
+
+    def write(self,file_out,solve_item):
+        for decl in self.declarations:
+            file_out.write(decl)
+        for constraint in self.constraints:
+            file_out.write("constraint %s;\n"%constraint)
+        file_out.write(solve_item)
+
+    ## ------ literals and linear forms ------ ##
+
+    def _literal(self,value,typeF=None):
+        if isinstance(value,bool):
+            return "true" if value else "false"
+        if typeF==REAL or isinstance(value,Fraction):
+            res=repr(float(value))
+            if "." not in res and "e" not in res:
+                res+=".0"
+            return res
+        return str(value)
+
+    def _as_var(self,form,typeF):
+        """Returns a variable (or a constant) equal to the linear form"""
+        coeffs,const=form
+        if not coeffs:
+            return self._literal(const,typeF)
+        if len(coeffs)==1 and const==0 and list(coeffs.values())[0]==1:
+            return list(coeffs.keys())[0]
+        res=self._new_var(typeF)
+        lin=collections.OrderedDict(coeffs)
+        lin[res]=-1
+        self._post(self._linear_constraint("eq",lin,-const,typeF))
+        return res
+
+    def _combine(self,forms,factors):
+        coeffs=collections.OrderedDict()
+        const=0
+        for (form,k) in zip(forms,factors):
+            for (v,c) in form[0].items():
+                coeffs[v]=coeffs.get(v,0)+k*c
+            const+=k*form[1]
+        return (collections.OrderedDict((v,c) for (v,c) in coeffs.items() if c!=0),const)
+
+    def _linear_constraint(self,kind,coeffs,rhs,typeF,reif=None):
+        prefix="float" if typeF==REAL else "int"
+        if kind=="lt" and typeF!=REAL:
+            kind,rhs="le",rhs-1
+        name="%s_lin_%s"%(prefix,kind)
+        params=["[%s]"%",".join(self._literal(c,typeF) for c in coeffs.values()),
+                "[%s]"%",".join(coeffs.keys()),
+                self._literal(rhs,typeF)]
+        if reif is not None:
+            name+="_reif"
+            params.append(reif)
+        return "%s(%s)"%(name,",".join(params))
+
+    def _ground(self,kind,args):
+        """Truth value of args[0] kind args[1], None if it is not ground"""
+        coeffs,const=self._combine(args,[1,-1])
+        if coeffs:
+            return None
+        return {"le":const<=0,"lt":const<0,"eq":const==0}[kind]
+
+    def _relation(self,kind,typeF,args,reif=None):
+        """Posts (or reifies into reif) args[0] kind args[1], returns the
+        truth value when the relation is ground"""
+        value=self._ground(kind,args)
+        if value is not None:
+            return value
+        coeffs,const=self._combine(args,[1,-1])
+        self._post(self._linear_constraint(kind,coeffs,-const,typeF,reif))
+        return None
+
+    ## ------ top level constraints ------ ##
+
+    def assert_formula(self,formula):
+        """Posts the formula as a top level constraint"""
+        if formula.is_and():
+            for s in formula.args():
+                self.assert_formula(s)
+        elif formula.is_or() or formula.is_implies():
+            if formula.is_or():
+                pos,neg=list(formula.args()),[]
+            else:
+                pos,neg=[formula.arg(1)],[formula.arg(0)]
+            pos_l,neg_l=[],[]
+            for s in pos:
+                if s.is_not():
+                    neg_l.append(self.walk(s.arg(0)))
+                else:
+                    pos_l.append(self.walk(s))
+            neg_l+=[self.walk(s) for s in neg]
+            self._post("bool_clause([%s],[%s])"%(",".join(pos_l),",".join(neg_l)))
+        elif formula.is_iff():
+            self._post("bool_eq(%s,%s)"%(self.walk(formula.arg(0)),self.walk(formula.arg(1))))
+        elif formula.is_le() or formula.is_lt() or formula.is_equals():
+            kind="le" if formula.is_le() else ("lt" if formula.is_lt() else "eq")
+            args=[self.walk(s) for s in formula.args()]
+            value=self._relation(kind,formula.arg(0).get_type(),args)
+            if value is False:
+                self._post("bool_eq(true,false)")
+        elif formula.is_bool_constant():
+            if not formula.constant_value():
+                self._post("bool_eq(true,false)")
+        elif formula.is_not():
+            self._post("bool_eq(%s,false)"%self.walk(formula.arg(0)))
+        else:
+            self._post("bool_eq(%s,true)"%self.walk(formula))
+
+    ## ------ reified subformulas ------ ##
+
+    def walk_symbol(self, formula, **kwargs):
+        name=self._quote(formula.symbol_name())
+        if formula.symbol_type() == BOOL:
+            return name
+        if formula.symbol_type() not in (INT,REAL):
+            raise NotImplementedErr("The type %s cannot be translated into FlatZinc" % formula.symbol_type())
+        return (collections.OrderedDict([(name,1)]),0)
+
+    def walk_bool_constant(self, formula, **kwargs):
+        return self._literal(formula.constant_value())
+
+    def walk_int_constant(self, formula, **kwargs):
+        return (collections.OrderedDict(),formula.constant_value())
+
+    def walk_real_constant(self, formula, **kwargs):
+        return (collections.OrderedDict(),Fraction(formula.constant_value()))
+
+    def walk_and(self, formula, args, **kwargs):
+        res=self._new_var(BOOL)
+        self._post("array_bool_and([%s],%s)"%(",".join(args),res))
+        return res
+
+    def walk_or(self, formula, args, **kwargs):
+        res=self._new_var(BOOL)
+        self._post("array_bool_or([%s],%s)"%(",".join(args),res))
+        return res
+
+    def walk_not(self, formula, args, **kwargs):
+        res=self._new_var(BOOL)
+        self._post("bool_not(%s,%s)"%(args[0],res))
+        return res
+
+    def walk_implies(self, formula, args, **kwargs):
+        res=self._new_var(BOOL)
+        self._post("bool_le_reif(%s,%s,%s)"%(args[0],args[1],res))
+        return res
+
+    def walk_iff(self, formula, args, **kwargs):
+        res=self._new_var(BOOL)
+        self._post("bool_eq_reif(%s,%s,%s)"%(args[0],args[1],res))
+        return res
+
+    def _walk_relation(self, kind, typeF, args):
+        value=self._ground(kind,args)
+        if value is not None:
+            return self._literal(value)
+        res=self._new_var(BOOL)
+        self._relation(kind,typeF,args,reif=res)
+        return res
+
+    def walk_le(self, formula, args, **kwargs):
+        return self._walk_relation("le",formula.arg(0).get_type(),args)
+
+    def walk_lt(self, formula, args, **kwargs):
+        return self._walk_relation("lt",formula.arg(0).get_type(),args)
+
+    def walk_equals(self, formula, args, **kwargs):
+        return self._walk_relation("eq",formula.arg(0).get_type(),args)
+
+    def walk_ite(self, formula, args, **kwargs):
+        typeF=formula.get_type()
+        res=self._new_var(typeF)
+        if typeF == BOOL:
+            (c,t,e)=args
+            self._post("bool_clause([%s],[%s,%s])"%(res,c,t))
+            self._post("bool_clause([%s],[%s,%s])"%(t,c,res))
+            self._post("bool_clause([%s,%s],[%s])"%(c,res,e))
+            self._post("bool_clause([%s,%s],[%s])"%(c,e,res))
+        else:
+            #c -> res=then, not(c) -> res=else
+            res_form=(collections.OrderedDict([(res,1)]),0)
+            then_eq=self._walk_relation("eq",typeF,[res_form,args[1]])
+            else_eq=self._walk_relation("eq",typeF,[res_form,args[2]])
+            self._post("bool_clause([%s],[%s])"%(then_eq,args[0]))
+            self._post("bool_clause([%s,%s],[])"%(args[0],else_eq))
+            return res_form
+        return res
+
+    ## ------ numeric terms ------ ##
+
+    def walk_plus(self, formula, args, **kwargs):
+        return self._combine(args,[1]*len(args))
+
+    def walk_minus(self, formula, args, **kwargs):
+        return self._combine(args,[1,-1])
+
+    def walk_times(self, formula, args, **kwargs):
+        typeF=formula.get_type()
+        res=args[0]
+        for form in args[1:]:
+            if not form[0]:
+                res=self._combine([res],[form[1]])
+            elif not res[0]:
+                res=self._combine([form],[res[1]])
+            else:
+                var=self._new_var(typeF)
+                prefix="float" if typeF==REAL else "int"
+                self._post("%s_times(%s,%s,%s)"%(prefix,self._as_var(res,typeF),self._as_var(form,typeF),var))
+                res=(collections.OrderedDict([(var,1)]),0)
+        return res
+
+    def walk_div(self, formula, args, **kwargs):
+        if formula.get_type()!=REAL or args[1][0] or args[1][1]==0:
+            raise NotImplementedErr("Only the division of a real term by a constant can be translated into FlatZinc")
+        return self._combine([args[0]],[1/Fraction(args[1][1])])
+
+    def walk_toreal(self, formula, args, **kwargs):
+        coeffs,const=args[0]
+        if not coeffs:
+            return (collections.OrderedDict(),Fraction(const))
+        res=self._new_var(REAL)
+        self._post("int2float(%s,%s)"%(self._as_var(args[0],INT),res))
+        return (collections.OrderedDict([(res,1)]),0)
+
+#EOC FZNPrinter
@@ -36,7 +36,7 @@ import shortcuts as sh
 from substituter import MGSubstituter
 from six.moves import cStringIO
 import pyomt.operators as op
-from pyomt.walkers import TreeWalker,DagWalker
+from pyomt.walkers import TreeWalker,DagWalker,IdentityDagWalker
 from pyomt.walkers.generic import handles
 from pyomt.utils import quote
 from pyomt.environment import get_env
@@ -45,6 +45,301 @@ from pyomt.oracles import SizeOracle
 from pyomt.typing import BOOL, REAL, INT, BVType, ArrayType, STRING
 
 
+POSITIVE = 1    #polarity of the occurrences of a boolean subformula
+NEGATIVE = 2
+
+#operators whose integer encoding reads the bits of their arguments
+BIT_ACCESS_OPS = frozenset([op.BV_AND, op.BV_OR, op.BV_XOR, op.BV_EXTRACT])
+
+#string literals are kept, spaces around punctuation are dropped, other blanks become a single space
+_COMPACT_RE = re.compile(r'("(?:[^"\\]|\\.)*")|\s*([()\[\]{};,:])\s*|\s+')
+
+def compact_mzn(text):
+    """Removes the formatting whitespace from a mzn expression"""
+    return _COMPACT_RE.sub(lambda m: m.group(1) or m.group(2) or " ", text)
+
+def bits_name(name):
+    """Name of the global array with the bits of the BV variable name"""
+    return "%s_bits" % name
+
+def sets_name(name):
+    """Name of the global set with the positions of the one bits of the BV variable name"""
+    return "%s_set" % name
+
+def signed_view(term,width):
+    """Two's complement value of the printed BV term, linear in the test of its sign"""
+    return "(%s - %d*bool2int(%s >= %d))" % (term,pow(2,width),term,pow(2,width-1))
+
+def offset_view(term,width):
+    """Printed BV term with the sign bit flipped: the unsigned order on it is the signed one"""
+    return "((%s + %d) mod %d)" % (term,pow(2,width-1),pow(2,width))
+
+def pow2_name(width):
+    """Name of the global table of the powers of two 2^0..2^width"""
+    return "POW2_%d" % width
+
+def pow2_table(width):
+    """Declaration of the table pow2_name(width)"""
+    return "array[0..%d] of int : %s = array1d(0..%d,[%s]);\n" % (width,pow2_name(width),width,",".join(str(pow(2,i)) for i in range(width+1)))
+
+def shift_expressions(value,amount,width,table=None):
+    '''
+        Integer encodings of bvshl, bvlshr and bvashr of the printed term value by amount: the
+        amount indexes the power table (an element constraint), or is an integer when table is
+        None; it is capped at the width since 2^width shifts every bit out
+    '''
+    if table is None:
+        k = min(amount,width)
+        (power,fill) = (str(pow(2,k)),str(pow(2,width)-pow(2,width-k)))
+    else:
+        power = "%s[min(%s,%d)]" % (table,amount,width)
+        fill = "(%d - %s[%d - min(%s,%d)])" % (pow(2,width),table,width,amount,width)
+    return {"shl":"(%s * %s) mod %d" % (value,power,pow(2,width)),
+            "lshr":"%s div %s" % (value,power),
+            "ashr":"%s div %s + bool2int(%s >= %d)*%s" % (value,power,value,pow(2,width-1),fill)}
+
+def limbs_name(name):
+    """Name of the global array with the limbs of the wide BV variable name"""
+    return "%s_limbs" % name
+
+def limb_width(max_int_bit_size):
+    """Bits of a limb: the product of two limbs must fit in the solver integers"""
+    return max_int_bit_size//2 - 1
+
+def wide_width(max_int_bit_size):
+    """Bits above which a BV is split in limbs, the narrower ones are plain integers"""
+    return max_int_bit_size//2
+
+def limb_sizes(width,limb):
+    """Bits of each limb of a BV of the given width, from the least significant one"""
+    return [min(limb,width-k) for k in range(0,width,limb)]
+
+def limbs_value(name,width,limb):
+    """Unsigned value of the wide BV whose limbs are the array name"""
+    return "sum(k in 0..%d)(pow(2,%d*k)*%s[k])" % (len(limb_sizes(width,limb))-1,limb,name)
+
+def limbs_unsupported(formula,max_int_bit_size):
+    '''
+        First subterm of the formula that DagLimbsMznPrinter cannot translate: a division,
+        a remainder, a shift by a variable amount or a bv2nat of a wide BV. None if there is none
+    '''
+    wide = lambda f: f.get_type().is_bv_type() and f.bv_width() > wide_width(max_int_bit_size)
+    seen = set()
+    stack = [formula]
+    while stack:
+        f = stack.pop()
+        if f in seen:
+            continue
+        seen.add(f)
+        if f.node_type() in (op.BV_UDIV, op.BV_UREM, op.BV_SDIV, op.BV_SREM) and wide(f):
+            return f
+        if f.node_type() in (op.BV_LSHL, op.BV_LSHR, op.BV_ASHR) and wide(f) and not f.arg(1).is_bv_constant():
+            return f
+        if f.node_type() == op.BV_TONATURAL and wide(f.arg(0)):
+            return f
+        stack.extend(f.args())
+    return None
+
+#declaration of a generated integer temporary: name and the suffix of its role in the BV encodings
+_BV_DECL_RE = re.compile(r'var int\s*:\s*(\w+?)(_args1_in|_args2_in|_args1|_args2|_ris|_s1)?(?=\s*=)')
+
+def bv_temporary_range(formula,suffix,max_int_bit_size):
+    '''
+        Interval (lo,hi) of the temporary with the given suffix declared by the encoding of the BV
+        operator formula (suffix None is the result), None if it is not a BV value
+    '''
+    unsigned = lambda k: (0,pow(2,k)-1)
+    signed = lambda k: (-pow(2,k-1),pow(2,k-1)-1)
+    if suffix is None:
+        if formula.get_type().is_bv_type():
+            return unsigned(formula.bv_width())
+        if formula.is_bv_tonatural():
+            return unsigned(formula.arg(0).bv_width())
+        return None
+    if suffix in ("_args1_in","_args2_in"):
+        return unsigned(formula.arg(0 if suffix=="_args1_in" else 1).bv_width())
+    if suffix == "_s1":
+        return unsigned(formula.arg(0).bv_width()-formula.bv_extract_start())
+    w = formula.bv_width()
+    if suffix in ("_args1","_args2"):
+        return signed(formula.arg(0 if suffix=="_args1" else 1).bv_width())
+    if formula.is_bv_sub():
+        return (-(pow(2,w)-1),pow(2,w)-1)
+    if formula.is_bv_neg():
+        return (-(pow(2,w-1)-1),pow(2,w-1))
+    if formula.is_bv_sdiv():
+        return (-pow(2,w-1),pow(2,w-1))
+    if formula.is_bv_srem():
+        return (-(pow(2,w-1)-1),pow(2,w-1)-1)
+    return None
+
+def mzn_type(typeF):
+    """Type of a mzn temporary holding a value of type typeF, the bitvectors are ranges"""
+    if typeF.is_bv_type():
+        return "0..%d" % (pow(2,typeF.width)-1)
+    return str(typeF).lower().replace("real","float")
+
+def bv_domains(text,formula,max_int_bit_size):
+    '''
+        Declares the integer temporaries of the encoding of the BV operator formula with their range
+    '''
+    def typed(m):
+        rng = bv_temporary_range(formula,m.group(2),max_int_bit_size)
+        if rng is None:
+            return m.group(0)
+        return "var %d..%d : %s%s" % (rng[0],rng[1],m.group(1),m.group(2) or "")
+    return _BV_DECL_RE.sub(typed,text)
+
+def ite_cases(formula,allow_gaps=True):
+    '''
+        Cases of a chain of nested ite ite(c1,v1,ite(c2,v2,...,e)): returns (lookup,guards,values,e)
+        lookup is (term,lo,hi,constants) when every guard compares the same term with a distinct
+        integer constant and the constants are dense enough to index an array, None otherwise
+    '''
+    guards,values=[],[]
+    while formula.is_ite():
+        guards.append(formula.arg(0))
+        values.append(formula.arg(1))
+        formula=formula.arg(2)
+    lookup=None
+    if len(guards)>=3:
+        term,constants=None,[]
+        for g in guards:
+            if not g.is_equals():
+                break
+            (l,r)=g.args()
+            if r.is_int_constant() or r.is_bv_constant():
+                (t,c)=(l,r)
+            elif l.is_int_constant() or l.is_bv_constant():
+                (t,c)=(r,l)
+            else:
+                break
+            if term is not None and t is not term:
+                break
+            term=t
+            constants.append(c.constant_value())
+        else:
+            lo,hi=min(constants),max(constants)
+            size=hi-lo+1
+            if len(set(constants))==len(constants) and (size==len(constants) or (allow_gaps and size<=2*len(constants))):
+                lookup=(term,lo,hi,constants)
+    return lookup,guards,values,formula
+
+def ite_children(cases):
+    '''Subformulas printed by the flat version of an ite chain, in order'''
+    lookup,guards,values,else_f=cases
+    if lookup is not None:
+        return [lookup[0]]+values+[else_f]
+    res=[]
+    for (g,v) in zip(guards,values):
+        res+=[g,v]
+    return res+[else_f]
+
+def ite_flat_expression(cases,args):
+    '''
+        if/elseif chain or array lookup of an ite chain, args are the printed ite_children
+    '''
+    lookup,guards,values,else_f=cases
+    if lookup is not None:
+        (term,lo,hi,constants)=lookup
+        t,e=args[0],args[-1]
+        table=dict(zip(constants,args[1:-1]))
+        elements=", ".join(table.get(i,e) for i in range(lo,hi+1))
+        return " if (%s in %d..%d) then (array1d(%d..%d,[%s])[%s]) else (%s) endif " % (t,lo,hi,lo,hi,elements,t,e)
+    res=" if (%s) then (%s)" % (args[0],args[1])
+    for i in range(2,len(args)-1,2):
+        res+=" elseif (%s) then (%s)" % (args[i],args[i+1])
+    return res+" else (%s) endif " % args[-1]
+
+#operators with a cheaper integer encoding when one operand is a constant, see bv_constant_operand
+BV_CONSTANT_OPS = frozenset([op.BV_AND, op.BV_OR, op.BV_XOR, op.BV_ADD, op.BV_SUB,
+                             op.BV_MUL, op.BV_UDIV, op.BV_UREM, op.BV_LSHL, op.BV_LSHR,
+                             op.BV_ASHR, op.BV_ULT, op.BV_ULE])
+
+def _bv_mask(v,mask,width):
+    '''Pieces of the integer encoding of bvand(arg v, mask)'''
+    low = (mask & -mask).bit_length()-1
+    run = (mask >> low).bit_length()
+    if mask >> low == pow(2,run)-1:
+        #contiguous mask: the bits low..low+run-1 are kept by a div and a mod
+        if low == 0:
+            return ["(",v," mod %d)" % pow(2,run)]
+        if low+run == width:
+            return ["((",v," div %d)*%d)" % (pow(2,low),pow(2,low))]
+        return ["(((",v," div %d) mod %d)*%d)" % (pow(2,low),pow(2,run),pow(2,low))]
+    ones = ",".join(str(i) for i in range(width) if (mask >> i) & 1)
+    return ["sum(i in {%s})(pow(2,i)*((" % ones,v," div pow(2,i)) mod 2))"]
+
+def bv_constant_operand(formula):
+    '''
+        Integer encoding of a BV operator with exactly one constant operand, as a list of strings
+        and indexes of the printed arguments to concatenate; None when there is no specialization
+    '''
+    if formula.node_type() not in BV_CONSTANT_OPS:
+        return None
+    (a0,a1) = formula.args()
+    if a0.is_bv_constant() == a1.is_bv_constant():
+        return None
+    (v,c) = (1,a0.constant_value()) if a0.is_bv_constant() else (0,a1.constant_value())
+    width = a0.bv_width()
+    full = pow(2,width)-1
+    if formula.is_bv_and():
+        if c == 0:
+            return ["0"]
+        return [v] if c == full else _bv_mask(v,c,width)
+    if formula.is_bv_or():
+        if c == full:
+            return [str(full)]
+        #x|c = x + c - x&c
+        return [v] if c == 0 else ["(",v," + %d - " % c]+_bv_mask(v,c,width)+[")"]
+    if formula.is_bv_xor():
+        if c == full:
+            return ["(%d - " % full,v,")"]
+        #x^c = x + c - 2*(x&c)
+        return [v] if c == 0 else ["(",v," + %d - 2*" % c]+_bv_mask(v,c,width)+[")"]
+    if formula.is_bv_add():
+        return [v] if c == 0 else ["((",v," + %d) mod %d)" % (c,full+1)]
+    if formula.is_bv_mul():
+        if c == 0:
+            return ["0"]
+        return [v] if c == 1 else ["((",v," * %d) mod %d)" % (c,full+1)]
+    if formula.is_bv_sub():
+        if v == 1:
+            return ["((%d - " % (c+full+1),v,") mod %d)" % (full+1)]
+        return [v] if c == 0 else ["((",v," + %d) mod %d)" % (full+1-c,full+1)]
+    if formula.is_bv_ult():
+        #nothing is below 0 or above the all-ones vector
+        return ["false"] if (v == 0 and c == 0) or (v == 1 and c == full) else None
+    if formula.is_bv_ule():
+        return ["true"] if (v == 0 and c == full) or (v == 1 and c == 0) else None
+    if v == 1:
+        #constant first operand of a division, remainder or shift
+        if c == 0 and not formula.is_bv_udiv():
+            return ["0"]
+        if c == full and formula.is_bv_ashr():
+            return [str(full)]
+        return None
+    if formula.is_bv_udiv():
+        #the division by zero is the all-ones vector
+        if c == 0:
+            return [str(full)]
+        return [v] if c == 1 else ["(",v," div %d)" % c]
+    if formula.is_bv_urem():
+        if c == 1:
+            return ["0"]
+        #the remainder of a division by zero is the dividend
+        return [v] if c == 0 else ["(",v," mod %d)" % c]
+    if c == 0:
+        return [v]
+    if formula.is_bv_ashr():
+        return None
+    if c >= width:
+        return ["0"]
+    if formula.is_bv_lshl():
+        return ["((",v," * %d) mod %d)" % (pow(2,c),full+1)]
+    return ["(",v," div %d)" % pow(2,c)]
+
+
 '''
 #TODO: -> bveq con = in print con daggify
 '''
@@ -56,23 +351,30 @@ class TreeMznPrinter(TreeWalker):
     E.g., Implies(And(Symbol(x), Symbol(y)), Symbol(z))  ~>   '(x * y) -> z'
     """
 
-    def __init__(self,max_int_bit_size,stream,env=None):
+    def __init__(self,max_int_bit_size,stream,env=None,template="bv_%d",tables=None):
         TreeWalker.__init__(self, env=env)
         self.stream = stream
         self.write = self.stream.write
         self.name_seed = 0
-        self.template = "bv_%d"
+        self.template = template
+        self.names = set()
         self.max_int_bit_size=max_int_bit_size
+        self.tables=tables if tables is not None else set()    #widths of the pow2_table used
+        for o in BV_CONSTANT_OPS:
+            self.functions[o] = self._specialized(self.functions[o])
 
 
 
     def printer(self, f,threshold=None):
         """Performs the serialization of 'f' MZN"""
+        self.names = set(quote(x.symbol_name()) for x in f.get_free_variables())
         self.write("(")
         self.walk(f,threshold=None)
         self.write(")")
 
     def _new_symbol_bv(self):
+        while (self.template % self.name_seed) in self.names:
+            self.name_seed += 1
         res = (self.template % self.name_seed)
         self.name_seed += 1
         return res
@@ -81,6 +383,29 @@ class TreeMznPrinter(TreeWalker):
     def walk_threshold(self, formula):
         self.write("...")
 
+    def _write_bv(self, formula, text):
+        self.write(bv_domains(text,formula,self.max_int_bit_size))
+
+    def _pow2(self, width):
+        self.tables.add(width)
+        return pow2_name(width)
+
+    def _specialized(self, walker):
+        """Walker of a BV operator that prints the bv_constant_operand encoding when it exists"""
+        def walk(formula):
+            pieces = bv_constant_operand(formula)
+            if pieces is None:
+                return walker(formula)
+            return self._walk_constant_operand(formula,pieces)
+        return walk
+
+    def _walk_constant_operand(self, formula, pieces):
+        for p in pieces:
+            if isinstance(p,int):
+                yield formula.arg(p)
+            else:
+                self.write(p)
+
     def walk_nary(self, formula, operator):
         args = formula.args()
         if operator=="ite":
@@ -132,7 +457,41 @@ class TreeMznPrinter(TreeWalker):
     def walk_le(self, formula):     return self.walk_nary(formula, "<=")
     def walk_lt(self, formula):     return self.walk_nary(formula, "<")
     def walk_toreal(self, formula): return self.walk_nary(formula, "int2float")
-    def walk_ite(self, formula):    return self.walk_nary(formula, "ite")
+    def walk_ite(self, formula):
+        #the else branch would be printed again for every gap of the lookup array
+        cases=ite_cases(formula,allow_gaps=False)
+        if len(cases[1])==1:
+            return self.walk_nary(formula, "ite")
+        return self.walk_ite_chain(cases)
+
+    def walk_ite_chain(self, cases):
+        lookup,guards,values,else_f=cases
+        if lookup is not None:
+            (term,lo,hi,constants)=lookup
+            table=dict(zip(constants,values))
+            self.write(" if (")
+            yield term
+            self.write(" in %d..%d) then (array1d(%d..%d,[" % (lo,hi,lo,hi))
+            for i in range(lo,hi+1):
+                if i>lo:
+                    self.write(", ")
+                yield table[i]
+            self.write("])[")
+            yield term
+            self.write("]) else (")
+        else:
+            self.write(" if (")
+            yield guards[0]
+            self.write(") then (")
+            yield values[0]
+            for (g,v) in zip(guards[1:],values[1:]):
+                self.write(") elseif (")
+                yield g
+                self.write(") then (")
+                yield v
+            self.write(") else (")
+        yield else_f
+        self.write(") endif ")
 
     ### ----------------- BV ------------------------------------------#
 
@@ -140,53 +499,53 @@ class TreeMznPrinter(TreeWalker):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write("""let { var int : %s  = sum([pow(2,i)* (((( """%(sym))
+        self._write_bv(formula,"""let { var int : %s  = sum([pow(2,i)* (((( """%(sym))
         yield args[0]
-        self.write("div pow(2,i)) mod 2)) * (((")
+        self._write_bv(formula,"div pow(2,i)) mod 2)) * (((")
         yield args[1]
-        self.write("""div pow(2,i)) mod 2))) | i in 0..%s]);
+        self._write_bv(formula,"""div pow(2,i)) mod 2))) | i in 0..%s]);
                     } in \n %s""" %(size-1,sym))
 
     def walk_bv_or(self,formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write("""let { var int : %s  = sum([pow(2,i)* ((((("""%(sym))
+        self._write_bv(formula,"""let { var int : %s  = sum([pow(2,i)* ((((("""%(sym))
         yield args[0]
-        self.write("div pow(2,i)) mod 2)) + (((")
+        self._write_bv(formula,"div pow(2,i)) mod 2)) + (((")
         yield args[1]
-        self.write("""div pow(2,i)) mod 2)))>0) | i in 0..%s]);
+        self._write_bv(formula,"""div pow(2,i)) mod 2)))>0) | i in 0..%s]);
                     }  in \n %s """ %(size-1,sym))
 
     def walk_bv_not(self,formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write("""let { var int : %s  = sum([pow(2,i)* (1-("""%(sym))
+        self._write_bv(formula,"""let { var int : %s  = sum([pow(2,i)* (1-("""%(sym))
         yield args[0]
-        self.write("""div pow(2,i)) mod 2) | i in 0..%s]);
+        self._write_bv(formula,"""div pow(2,i)) mod 2) | i in 0..%s]);
                     } in \n %s""" %(size-1,sym))
 
     def walk_bv_xor(self, formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write("""let { var int : %s  = sum([pow(2,i)* ((((("""%(sym))
+        self._write_bv(formula,"""let { var int : %s  = sum([pow(2,i)* ((((("""%(sym))
         yield args[0]
-        self.write("div pow(2,i)) mod 2)) != (((")
+        self._write_bv(formula,"div pow(2,i)) mod 2)) != (((")
         yield args[1]
-        self.write("""div pow(2,i)) mod 2)))) | i in 0..%s]);
+        self._write_bv(formula,"""div pow(2,i)) mod 2)))) | i in 0..%s]);
                     } in \n %s""" %(size-1,sym))
 
     def walk_bv_add(self,formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write("""let{ var int:%s = ( """%(sym))
+        self._write_bv(formula,"""let{ var int:%s = ( """%(sym))
         yield args[0]
-        self.write(" + ")
+        self._write_bv(formula," + ")
         yield args[1]
-        self.write(""" ) mod %s;
+        self._write_bv(formula,""" ) mod %s;
         } in \n %s """%(str(pow(2,size)),sym))
 
 
@@ -194,11 +553,11 @@ class TreeMznPrinter(TreeWalker):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s_args1_in = """%(sym))
+        self._write_bv(formula,""" let { var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(";\n var int:%s_args2_in = "%(sym))
+        self._write_bv(formula,";\n var int:%s_args2_in = "%(sym))
         yield args[1]
-        self.write(""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
+        self._write_bv(formula,""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
                     var int:%s_args2 = if (%s_args2_in >= %s) then (%s_args2_in-%s) else %s_args2_in endif;
                     var int:%s_ris = (%s_args1 - %s_args2) mod %s;
                     var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
@@ -212,9 +571,9 @@ class TreeMznPrinter(TreeWalker):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s_args1_in = """%(sym))
+        self._write_bv(formula,""" let { var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else (%s_args1_in) endif;
+        self._write_bv(formula,""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else (%s_args1_in) endif;
                             var int:%s_ris = (0 - %s_args1);
                             var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
                         } in \n %s""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
@@ -225,52 +584,52 @@ class TreeMznPrinter(TreeWalker):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s = ( """%(sym))
+        self._write_bv(formula,""" let { var int:%s = ( """%(sym))
         yield args[0]
-        self.write(" * ")
+        self._write_bv(formula," * ")
         yield args[1]
-        self.write("""); mod %s } in \n %s"""%(str(pow(2,size)),sym))
+        self._write_bv(formula,"""); mod %s } in \n %s"""%(str(pow(2,size)),sym))
 
     def walk_bv_concat(self, formula):
         sym = self._new_symbol_bv()
         args = formula.args()
         size_s1=formula.args()[0].bv_width()
         size_s2=formula.args()[1].bv_width()
-        self.write(""" let { var int: %s = """%(sym))
+        self._write_bv(formula,""" let { var int: %s = """%(sym))
         yield args[1]
-        self.write(" + sum([pow(2,i+%s)*((("%(size_s2))
+        self._write_bv(formula," + sum([pow(2,i+%s)*((("%(size_s2))
         yield args[0]
-        self.write(""" div pow(2,i)) mod 2)) | i in 0..%s]); } in \n %s"""%(size_s1-1,sym))
+        self._write_bv(formula,""" div pow(2,i)) mod 2)) | i in 0..%s]); } in \n %s"""%(size_s1-1,sym))
 
     def walk_bv_udiv(self, formula):
         sym = self._new_symbol_bv()
         #size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s = ("""%(sym))
+        self._write_bv(formula,""" let { var int:%s = ("""%(sym))
         yield args[0]
-        self.write(" div ")
+        self._write_bv(formula," div ")
         yield args[1]
-        self.write("""); } in \n %s"""%(sym))
+        self._write_bv(formula,"""); } in \n %s"""%(sym))
 
     def walk_bv_urem(self, formula):
         sym = self._new_symbol_bv()
         #size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s = (""" %(sym))
+        self._write_bv(formula,""" let { var int:%s = (""" %(sym))
         yield args[0]
-        self.write(" mod ")
+        self._write_bv(formula," mod ")
         yield args[1]
-        self.write("""); } in \n %s"""%(sym))
+        self._write_bv(formula,"""); } in \n %s"""%(sym))
 
     def walk_bv_sdiv(self, formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s_args1_in = """%(sym))
+        self._write_bv(formula,""" let { var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(""";\nvar int:%s_args2_in = """%(sym))
+        self._write_bv(formula,""";\nvar int:%s_args2_in = """%(sym))
         yield args[1]
-        self.write("""    ;\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
+        self._write_bv(formula,"""    ;\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
                              var int:%s_args2 = if (%s_args2_in >= %s) then (%s_args2_in-%s) else %s_args2_in endif;
                              var int:%s_ris = (%s_args1 div %s_args2);
                              var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
@@ -283,11 +642,11 @@ class TreeMznPrinter(TreeWalker):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s_args1_in = """%(sym))
+        self._write_bv(formula,""" let { var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(";\n var int:%s_args2_in = "%(sym))
+        self._write_bv(formula,";\n var int:%s_args2_in = "%(sym))
         yield args[1]
-        self.write(""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
+        self._write_bv(formula,""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
                              var int:%s_args2 = if (%s_args2_in >= %s) then (%s_args2_in-%s) else %s_args2_in endif;
                              var int:%s_ris = (%s_args1 mod %s_args2);
                              var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
@@ -296,104 +655,82 @@ class TreeMznPrinter(TreeWalker):
                                    sym,sym,sym,
                                    sym,sym,sym,str(pow(2,size)),sym,sym))
 
+    def walk_bv_signed_comparison(self, formula, operator):
+        #unsigned comparison of the offset_view of the arguments, each one is printed once
+        size = formula.arg(0).bv_width()
+        (half,mod) = (pow(2,size-1),pow(2,size))
+        self.write("(")
+        for (i,a) in enumerate(formula.args()):
+            if i == 1:
+                self.write(" %s " % operator)
+            if a.is_bv_constant():
+                self.write(str((a.constant_value()+half) % mod))
+            else:
+                self.write("((")
+                yield a
+                self.write(" + %d) mod %d)" % (half,mod))
+        self.write(")")
+
     def walk_bv_sle(self, formula):
-        sym = self._new_symbol_bv()
-        size = formula.bv_width()
-        args = formula.args()
-        self.write(""" let {
-                    var int:%s_args1_in = """%(sym))
-        yield args[0]
-        self.write(";\n var int:%s_args2_in = "%(sym))
-        yield args[1]
-        self.write(""";\nvar int:%s_args1 = if (%s_args1_in >= %s) then (%s_args1_in-%s) else %s_args1_in endif;
-                             var int:%s_args2 = if (%s_args2_in >= %s) then (%s_args2_in-%s) else %s_args2_in endif;
-                             var bool:%s = (%s_args1 <= %s_args2);
-                        } in \n %s"""%(sym,sym,str(pow(2,size-1)),sym,str(pow(2,size)),sym,
-                                   sym,sym,str(pow(2,size-1)),args[1],str(pow(2,size)),sym,
-                                   sym,sym,sym,sym))
+        return self.walk_bv_signed_comparison(formula,"<=")
 
     def walk_bv_slt(self, formula):
-        sym = self._new_symbol_bv()
-        size = formula.bv_width()
-        args = formula.args()
-        self.write(""" let {
-                    var int:%s_args1_in = """%(sym))
-        yield args[0]
-        self.write(";\n var int:%s_args2_in = "%(sym))
-        yield args[1]
-        self.write(""";\nvar int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var bool:%s = (%s_args1 < %s_args2);
-                        } in \n%s"""%(sym,sym,str(pow(2,size-1)),sym,str(pow(2,size)),sym,
-                                   sym,sym,str(pow(2,size-1)),sym,str(pow(2,size)),sym,
-                                   sym,sym,sym,sym))
+        return self.walk_bv_signed_comparison(formula,"<")
 
     def walk_bv_ule(self, formula):
         sym = self._new_symbol_bv()
         #size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var bool:%s  = (""" %(sym))
+        self._write_bv(formula,""" let { var bool:%s  = (""" %(sym))
         yield args[0]
-        self.write(" <= ")
+        self._write_bv(formula," <= ")
         yield args[1]
-        self.write(");} in \n%s"%(sym))
+        self._write_bv(formula,");} in \n%s"%(sym))
 
 
     def walk_bv_ult(self, formula):
         sym = self._new_symbol_bv()
         #size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var bool:%s  = (""" %(sym))
+        self._write_bv(formula,""" let { var bool:%s  = (""" %(sym))
         yield args[0]
-        self.write(" < ")
+        self._write_bv(formula," < ")
         yield args[1]
-        self.write(");} in \n%s"%(sym))
+        self._write_bv(formula,");} in \n%s"%(sym))
 
-    def walk_bv_lshl(self, formula):
+    def walk_bv_shift(self, formula, kind):
+        #the arguments are printed once, in the let of the shift_expressions
         sym = self._new_symbol_bv()
-        size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int:%s = ("""%(sym))
+        size = formula.bv_width()
+        self._write_bv(formula,""" let { var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write("* pow(2,")
-        yield args[1]
-        self.write(""")) mod %s; } in \n%s"""%(str(pow(2,size)),sym))
+        if args[1].is_bv_constant():
+            value = shift_expressions(sym+"_args1_in",args[1].constant_value(),size)[kind]
+        else:
+            self._write_bv(formula,";\n var int:%s_args2_in = "%(sym))
+            yield args[1]
+            value = shift_expressions(sym+"_args1_in",sym+"_args2_in",size,self._pow2(size))[kind]
+        self._write_bv(formula,""";\n var int:%s = %s; } in \n%s"""%(sym,value,sym))
 
-    def walk_bv_lshr(self, formula):
-        sym = self._new_symbol_bv()
-        #size = formula.bv_width()
-        args = formula.args()
-        self.write(""" let { var int:%s = ("""%(sym))
-        yield args[0]
-        self.write(""" div pow(2,""")
-        yield args[1]
-        self.write(""" )) ; } in \n%s"""%(sym))
+    def walk_bv_lshl(self, formula):
+        return self.walk_bv_shift(formula,"shl")
 
+    def walk_bv_lshr(self, formula):
+        return self.walk_bv_shift(formula,"lshr")
 
     def walk_bv_ashr(self, formula):
-        sym = self._new_symbol_bv()
-        size = formula.bv_width()
-        args = formula.args()
-        self.write(""" let { var int:%s_args1_in = """%(sym))
-        yield args[0]
-        self.write(";\n var int:%s_args2_in = "%(sym))
-        yield args[1]
-        self.write(""";\nvar  int:%s_args1 = if (%s_args1_in>=%s) then (%s_args1_in-%s+%s) else %s_args1_in endif;
-                              var int:%s_ris =  %s_args1 div pow(2,%s_args2_in);
-                              var int:%s = if (%s_args1_in<%s)  then %s_ris else sum([pow(2,i)*(((%s_ris+%s) div pow(2,i)) mod 2)|i in 0..%s]) endif;
-                            } in \n%s"""%(sym,sym,str(pow(2,size-1)),sym,str(pow(2,size)),str(pow(2,self.max_int_bit_size-1)),sym,
-                                      sym,sym,sym,
-                                      sym,sym,str(pow(2,size-1)),sym,sym,str(pow(2,self.max_int_bit_size-3)+pow(2,self.max_int_bit_size-2)+pow(2,self.max_int_bit_size-1)+pow(2,size)),size-1,sym))
+        return self.walk_bv_shift(formula,"ashr")
 
     def walk_bv_comp(self, formula):
         sym = self._new_symbol_bv()
         #size = formula.bv_width()
         args = formula.args()
-        self.write(""" let { var int : %s  = if ("""%(sym))
+        self._write_bv(formula,""" let { var int : %s  = if ("""%(sym))
         yield args[0]
-        self.write(" = ")
+        self._write_bv(formula," = ")
         yield args[1]
-        self.write(""") then 1 else 0 endif; } in \n%s""" %(sym))
+        self._write_bv(formula,""") then 1 else 0 endif; } in \n%s""" %(sym))
 
     def walk_bv_tonatural(self, formula):
         yield formula.args()[0]
@@ -405,27 +742,27 @@ class TreeMznPrinter(TreeWalker):
         start=int(formula.bv_extract_start())
         end=int(formula.bv_extract_end())
         if start != end:
-            self.write(""" let { var int : %s_s1 = """ %(sym))
+            self._write_bv(formula,""" let { var int : %s_s1 = """ %(sym))
             yield args[0]
-            self.write("""div %s;
+            self._write_bv(formula,"""div %s;
                             var int : %s = sum([pow(2,i)*(((%s_s1 div pow(2,i)) mod 2)) | i in 0..%s]);
                         } in \n%s"""%(str(pow(2,start)),sym,sym,str(end-start),sym))
 
 
         else:
-            self.write(""" let { var int : %s =  ("""%(sym))
+            self._write_bv(formula,""" let { var int : %s =  ("""%(sym))
             yield args[0]
-            self.write(""" div pow(2,%s)) mod 2; } in \n%s""" %(start,sym))
+            self._write_bv(formula,""" div %s) mod 2; } in \n%s""" %(pow(2,start),sym))
 
     def walk_bv_ror(self, formula):
         sym = self._new_symbol_bv()
         size = formula.bv_width()
         args = formula.args()
         rotate=formula.bv_rotation_step()%size
-        self.write(""" let {
+        self._write_bv(formula,""" let {
                     var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(""";\nvar int:%s = (%s_args1_in div %s + ((%s_args1_in * %s) mod %s)) mod %s;
+        self._write_bv(formula,""";\nvar int:%s = (%s_args1_in div %s + ((%s_args1_in * %s) mod %s)) mod %s;
                             } in \n%s"""%(sym,sym,str(pow(2,rotate)),sym,str(pow(2,size-rotate)),str(pow(2,size)),str(pow(2,size)),sym))
 
     def walk_bv_rol(self, formula):
@@ -433,10 +770,10 @@ class TreeMznPrinter(TreeWalker):
         size = formula.bv_width()
         args = formula.args()
         rotate=formula.bv_rotation_step()%size
-        self.write(""" let {
+        self._write_bv(formula,""" let {
                     var int:%s_args1_in = """%(sym))
         yield args[0]
-        self.write(""";\nvar int:%s = (%s_args1_in div %s) + ((%s_args1_in * %s mod %s)) mod %s;
+        self._write_bv(formula,""";\nvar int:%s = (%s_args1_in div %s) + ((%s_args1_in * %s mod %s)) mod %s;
                 } in \n%s"""%(sym,sym,str(pow(2,size-rotate)),sym,str(pow(2,rotate)),str(pow(2,size)),str(pow(2,size)),sym))
 
     def walk_bv_zext(self, formula):
@@ -445,9 +782,9 @@ class TreeMznPrinter(TreeWalker):
     def walk_bv_sext(self, formula):
         sym = self._new_symbol_bv()
         args = formula.args()
-        self.write(""" let { var int:%s = """%(sym))
+        self._write_bv(formula,""" let { var int:%s = """%(sym))
         yield args[0]
-        self.write("""+sum([pow(2,i) | i in %s..%s ]); } in \n%s"""%(formula.args()[0].bv_width(),formula.bv_width()-1,sym))
+        self._write_bv(formula,"""+sum([pow(2,i) | i in %s..%s ]); } in \n%s"""%(formula.args()[0].bv_width(),formula.bv_width()-1,sym))
 
 
 
@@ -504,7 +841,7 @@ class TreeMznPrinter(TreeWalker):
             self.write("false")
 
     def walk_bv_constant(self, formula):
-        self.write(str(formula.constant_value()))
+        self._write_bv(formula,str(formula.constant_value()))
 
     def walk_algebraic_constant(self, formula):
         self.write(str(formula.constant_value()))
@@ -571,7 +908,9 @@ class TreeMznPrinter(TreeWalker):
 
 class DagMznPrinter(DagWalker):
 
-    def __init__(self,max_int_bit_size,stream,template="tmp_%d"):
+    specialize_constants = True    #BV operators with a constant operand use bv_constant_operand
+
+    def __init__(self,max_int_bit_size,stream,template="tmp_%d",flat_let=False,bit_symbols=None,tables=None):
         DagWalker.__init__(self, invalidate_memoization=True)
         self.stream = stream
         self.write = self.stream.write
@@ -581,6 +920,16 @@ class DagMznPrinter(DagWalker):
         self.names = None
         self.mgr = get_env().formula_manager
         self.max_int_bit_size=max_int_bit_size
+        self.flat_let=flat_let  #True: one let block per constraint, False: one let for each node
+        self.let_decls=[]
+        self.bit_symbols=bit_symbols if bit_symbols is not None else set()  #BV variables with a global bits_name array
+        self.bit_views={}       #BV term -> array of its bits, shared by all the operators of the constraint
+        self.signed_views={}    #BV term -> variable with its signed value, see _signed
+        self.tables=tables if tables is not None else set()    #widths of the pow2_table used
+        self.ite_cases={}       #ite chain -> its cases, see ite_cases
+        if self.specialize_constants:
+            for o in BV_CONSTANT_OPS:
+                self.functions[o] = self._specialized(self.functions[o])
 
     def _push_with_children_to_stack(self, formula, **kwargs):
         """Add children to the stack."""
@@ -601,8 +950,17 @@ class DagMznPrinter(DagWalker):
     def printer(self, f):
         self.openings = 0
         self.name_seed = 0
+        self.let_decls = []
+        self.bit_views = {}
+        self.signed_views = {}
         self.names = set(quote(x.symbol_name()) for x in f.get_free_variables())
         key = self.walk(f)
+        if self.let_decls:
+            #the walk is post-order, so the declarations are already in topological order
+            self.write("let {\n")
+            for decl in self.let_decls:
+                self.write("   %s\n" % decl)
+            self.write("} in\n ")
         self.write(key)
 
 
@@ -614,36 +972,92 @@ class DagMznPrinter(DagWalker):
         self.name_seed += 1
         return res
 
+    def _write_let(self, decls):
+        """Writes the declarations of a new scope, or stores them for the
+        single let block of the constraint when flat_let is set"""
+        self.openings += 1
+        if self.flat_let:
+            self.let_decls.append(decls)
+        else:
+            self.write("let { %s } in\n " % decls)
+
+    def _write_let_bv(self, formula, decls):
+        self._write_let(bv_domains(decls,formula,self.max_int_bit_size))
+
+    def _pow2(self, width):
+        self.tables.add(width)
+        return pow2_name(width)
+
+    def _walk_shift(self, formula, args, kind):
+        sym = self._new_symbol()
+        size = formula.bv_width()
+        if formula.arg(1).is_bv_constant():
+            value = shift_expressions(args[0],formula.arg(1).constant_value(),size)[kind]
+        else:
+            value = shift_expressions(args[0],args[1],size,self._pow2(size))[kind]
+        self._write_let_bv(formula,"""var int:%s = %s;"""%(sym,value))
+        return sym
+
+    def _specialized(self, walker):
+        """Walker of a BV operator that uses the bv_constant_operand encoding when it exists"""
+        def walk(formula, args, **kwargs):
+            pieces = bv_constant_operand(formula)
+            if pieces is None:
+                return walker(formula, args, **kwargs)
+            return self._walk_constant_operand(formula, args, pieces)
+        return walk
+
+    def _walk_constant_operand(self, formula, args, pieces):
+        expr = "".join(args[p] if isinstance(p,int) else p for p in pieces)
+        if len(pieces) == 1:
+            return expr
+        sym = self._new_symbol()
+        typeF = "bool" if formula.get_type().is_bool_type() else "int"
+        self._write_let_bv(formula,"""var %s:%s = %s;"""%(typeF,sym,expr))
+        return sym
+
+    def _bits(self, term, formula):
+        '''
+            Array[0..w-1] of var 0..1 with the bits of the printed BV term, the decomposition
+            is done once per term: the variables use their global array
+        '''
+        if formula.is_symbol() and quote(formula.symbol_name()) in self.bit_symbols:
+            return bits_name(quote(formula.symbol_name()))
+        if formula.is_bv_constant():
+            value = formula.constant_value()
+            return "array1d(0..%d,[%s])" % (formula.bv_width()-1,",".join(str((value >> i) & 1) for i in range(formula.bv_width())))
+        if term not in self.bit_views:
+            sym = self._new_symbol()
+            size = formula.bv_width()
+            self._write_let("array[0..%d] of var 0..1 : %s = array1d(0..%d,[(%s div pow(2,i)) mod 2 | i in 0..%d]);" % (size-1,sym,size-1,term,size-1))
+            self.bit_views[term] = sym
+        return self.bit_views[term]
+
+    def _signed(self, term, formula):
+        '''
+            Signed value of the printed BV term, the signed_view is declared once per term
+        '''
+        size = formula.bv_width()
+        if formula.is_bv_constant():
+            value = formula.bv_signed_value()
+            return str(value) if value >= 0 else "(- %d)" % -value
+        if term not in self.signed_views:
+            sym = self._new_symbol()
+            self._write_let("var %d..%d : %s = %s;" % (-pow(2,size-1),pow(2,size-1)-1,sym,signed_view(term,size)))
+            self.signed_views[term] = sym
+        return self.signed_views[term]
+
     def walk_nary(self, formula, args, operator):
         assert formula is not None
         sym = self._new_symbol()
-        self.openings += 1
-        typeF=str(formula.get_type()).lower().replace("real","float")
-        self.write("let { var %s : %s = ( " % (typeF,sym))
+        typeF=mzn_type(formula.get_type())
         if operator=="ite":
-            self.write(" if (")
-            self.write(args[0])
-            self.write(") then (")
-            self.write(args[1])
-            self.write(") else (")
-            self.write(args[2])
-            self.write(") endif ")
-            self.write(" ); } in \n")
+            expr = " if (%s) then (%s) else (%s) endif " % (args[0],args[1],args[2])
         elif len(args)==1 and (operator=="not" or operator=="int2float"):
-            self.write(" ")
-            self.write("not(")
-            self.write(args[0])
-            self.write(")")
-            self.write("); } in \n")
+            expr = " not(%s)" % args[0]
         else:
-            self.write(args[0])
-            for s in args[1:]:
-                self.write(" ")
-                self.write(operator)
-                self.write(" ")
-                self.write(s)
-            self.write("); } in\n ")
-            #self.write(");\n")
+            expr = (" "+operator+" ").join(args)
+        self._write_let("var %s : %s = ( %s);" % (typeF,sym,expr))
         return sym
 
     def walk_and(self, formula, args):
@@ -668,6 +1082,9 @@ class DagMznPrinter(DagWalker):
         return self.walk_nary(formula, args, "-")
 
     def walk_times(self, formula, args):
+        if len(args)==2 and formula.arg(0).is_constant():
+            #coefficient of a linear term: kept inline in the sum
+            return "(%s * %s)" % (args[0],args[1])
         return self.walk_nary(formula, args, "*")
 
     def walk_equals(self, formula, args):
@@ -679,8 +1096,22 @@ class DagMznPrinter(DagWalker):
     def walk_lt(self, formula, args):
         return self.walk_nary(formula, args, "<")
 
+    def _get_children(self, formula):
+        if formula.is_ite():
+            #the nested ite of a chain are printed by the head of the chain
+            if formula not in self.ite_cases:
+                self.ite_cases[formula]=ite_cases(formula)
+            return ite_children(self.ite_cases[formula])
+        return formula.args()
+
     def walk_ite(self, formula, args):
-        return self.walk_nary(formula, args, "ite")
+        cases=self.ite_cases[formula]
+        if len(cases[1])==1:
+            return self.walk_nary(formula, args, "ite")
+        sym = self._new_symbol()
+        typeF=mzn_type(formula.get_type())
+        self._write_let("var %s : %s = ( %s);" % (typeF,sym,ite_flat_expression(cases,args)))
+        return sym
 
     def walk_toreal(self, formula, args):
         return self.walk_nary(formula, args, "int2float")
@@ -694,62 +1125,51 @@ class DagMznPrinter(DagWalker):
 
     def walk_pow(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         typeF=str(formula.get_type()).lower().replace("real","float")
-        self.write("""let { var %s:%s = pow(%s,%s)
-                      } in \n """%(typeF,sym,args[0],args[1]))
+        self._write_let("""var %s:%s = pow(%s,%s);"""%(typeF,sym,args[0],args[1]))
         return sym
 
 
     def walk_bv_and(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* ((((%s div pow(2,i)) mod 2)) * (((%s div pow(2,i)) mod 2))) | i in 0..%s]);
-                       } in \n """ %(sym,args[0],args[1],size-1))
+        (b0,b1)=(self._bits(args[0],formula.arg(0)),self._bits(args[1],formula.arg(1)))
+        self._write_let_bv(formula,"""var int : %s  = sum(i in 0..%s)(pow(2,i)*%s[i]*%s[i]);""" %(sym,size-1,b0,b1))
         return sym
 
     def walk_bv_or(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) + (((%s div pow(2,i)) mod 2)))>0) | i in 0..%s]);
-                       } in \n""" %(sym,args[0],args[1],size-1))
+        (b0,b1)=(self._bits(args[0],formula.arg(0)),self._bits(args[1],formula.arg(1)))
+        self._write_let_bv(formula,"""var int : %s  = sum(i in 0..%s)(pow(2,i)*max(%s[i],%s[i]));""" %(sym,size-1,b0,b1))
         return sym
 
     def walk_bv_not(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (1-(%s div pow(2,i)) mod 2) | i in 0..%s]);
-                       } in \n""" %(sym,args[0],size-1))
+        self._write_let_bv(formula,"""var int : %s  = %s - %s;""" %(sym,pow(2,size)-1,args[0]))
         return sym
 
     def walk_bv_xor(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) != (((%s div pow(2,i)) mod 2)))) | i in 0..%s]);
-                       } in \n""" %(sym,args[0],args[1],size-1))
+        (b0,b1)=(self._bits(args[0],formula.arg(0)),self._bits(args[1],formula.arg(1)))
+        self._write_let_bv(formula,"""var int : %s  = sum(i in 0..%s)(pow(2,i)*bool2int(%s[i] != %s[i]));""" %(sym,size-1,b0,b1))
         return sym
 
     def walk_bv_add(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write("""let{ var int:%s = (%s+%s) mod %s;
-                        } in \n """%(sym,args[0],args[1],pow(2,size)))
+        self._write_let_bv(formula,"""var int:%s = (%s+%s) mod %s;"""%(sym,args[0],args[1],pow(2,size)))
         return sym
 
     def walk_bv_sub(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_let_bv(formula,"""var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
                             var int:%s_ris = (%s_args1 - %s_args2) mod %s;
-                            var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
-                       } in \n""" %(sym,args[0],str(pow(2,size-1)),args[0],pow(2,size),args[0],
+                            var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;""" %(sym,args[0],str(pow(2,size-1)),args[0],pow(2,size),args[0],
                                   sym,args[1],str(pow(2,size-1)),args[1],pow(2,size),args[1],
                                   sym,sym,sym,str(pow(2,size)),
                                   sym,sym,sym,str(pow(2,size)),sym))
@@ -757,12 +1177,10 @@ class DagMznPrinter(DagWalker):
 
     def walk_bv_neg(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_let_bv(formula,"""var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                             var int:%s_ris = (0 - %s_args1);
-                            var int:%s = if %s_ris < 0 then (%s_ris+%s) else %s_ris endif;
-                        } in \n""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
+                            var int:%s = if %s_ris < 0 then (%s_ris+%s) else %s_ris endif;""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
                                    sym,sym,
                                    sym,sym,sym,str(pow(2,size)),sym))
         return sym
@@ -770,123 +1188,72 @@ class DagMznPrinter(DagWalker):
 
     def walk_bv_mul(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s = (%s*%s) mod %s;
-                        } in  \n"""%(sym,args[0],args[1],str(pow(2,size))))
+        self._write_let_bv(formula,"""var int:%s = (%s*%s) mod %s;"""%(sym,args[0],args[1],str(pow(2,size))))
         return sym
 
 
 
     def walk_bv_udiv(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var int:%s = (%s div %s);
-                       } in \n"""%(sym,args[0],args[1]))
+        self._write_let_bv(formula,"""var int:%s = (%s div %s);"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_urem(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var int:%s = (%s mod %s);
-                        } in \n"""%(sym,args[0],args[1]))
+        self._write_let_bv(formula,"""var int:%s = (%s mod %s);"""%(sym,args[0],args[1]))
         return sym
 
 
     def walk_bv_lshl(self, formula, args):
-        sym = self._new_symbol()
-        self.openings += 1
-        typeF=str(formula.get_type()).lower()
-        size=re.sub(r"bv{([0-9]+)}",r"\1",typeF)
-        self.write(""" let { var int:%s = (%s*pow(2,%s)) mod %s;
-                        } in \n"""%(sym,args[0],args[1],str(pow(2,size))))
-        return sym
-
+        return self._walk_shift(formula,args,"shl")
 
     def walk_bv_lshr(self, formula, args):
-        sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var int:%s = (%s div pow(2,%s));
-                        } in \n"""%(sym,args[0],args[1]))
-        return sym
+        return self._walk_shift(formula,args,"lshr")
 
     def walk_bv_ult(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var bool:%s = (%s<%s);
-                        } in \n"""%(sym,args[0],args[1]))
+        self._write_let_bv(formula,"""var bool:%s = (%s<%s);"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_ule(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var bool:%s = (%s<=%s);
-                       } in \n"""%(sym,args[0],args[1]))
+        self._write_let_bv(formula,"""var bool:%s = (%s<=%s);"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_slt(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        size=int(formula.args()[0].bv_width())
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var bool:%s = (%s_args1 < %s_args2);
-                        } in \n """%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
-                                   sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
-                                   sym,sym,sym))
+        self._write_let_bv(formula,"""var bool:%s = (%s < %s);"""%(sym,self._signed(args[0],formula.arg(0)),self._signed(args[1],formula.arg(1))))
         return sym
 
     def walk_bv_sle(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        size=int(formula.args()[0].bv_width())
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var bool:%s = (%s_args1 <= %s_args2);
-                        } in \n """%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
-                                   sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
-                                   sym,sym,sym))
+        self._write_let_bv(formula,"""var bool:%s = (%s <= %s);"""%(sym,self._signed(args[0],formula.arg(0)),self._signed(args[1],formula.arg(1))))
         return sym
 
     def walk_bv_concat(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        size_s1=formula.args()[0].bv_width()
         size_s2=formula.args()[1].bv_width()
-        self.write(""" let { var int: %s = %s + sum([pow(2,i+%s)*(((%s div pow(2,i)) mod 2)) | i in 0..%s]);
-                            } in \n"""%(sym,args[1],size_s2,args[0],size_s1-1))
+        self._write_let_bv(formula,"""var int: %s = %s + %s*%s;"""%(sym,args[1],pow(2,size_s2),args[0]))
         return sym
 
     def walk_bv_comp(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var int : %s  = if (%s=%s) then 1 else 0 endif;
-                        } in \n""" %(sym,args[0],args[1]))
+        self._write_let_bv(formula,"""var int : %s  = if (%s=%s) then 1 else 0 endif;""" %(sym,args[0],args[1]))
         return sym
 
 
     def walk_bv_ashr(self, formula, args):
-        sym = self._new_symbol()
-        self.openings += 1
-        size=formula.bv_width()
-        self.write(""" let {  var int:%s_args1 = if (%s>=%s) then (%s-%s+%s) else %s endif;
-                              var int:%s_ris =  %s_args1 div pow(2,%s);
-                              var int:%s = if (%s<%s)  then %s_ris else sum([pow(2,i)*(((%s_ris+%s) div pow(2,i)) mod 2)|i in 0..%s]) endif;
-                            } in \n"""%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),str(pow(2,self.max_int_bit_size-1)),args[0],
-                                      sym,sym,args[1],
-                                      sym,args[0],str(pow(2,size-1)),sym,sym,str(pow(2,self.max_int_bit_size-3)+pow(2,self.max_int_bit_size-2)+pow(2,self.max_int_bit_size-1)+pow(2,size)),size-1))
-        return sym
-
+        #the sign bit is replicated in the vacated positions
+        return self._walk_shift(formula,args,"ashr")
 
     def walk_bv_sdiv(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_let_bv(formula,"""var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_ris = (%s_args1 div %s_args2);
-                             var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
-                        } in \n""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
+                             var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
                                    sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
                                    sym,sym,sym,
                                    sym,sym,sym,str(pow(2,size)),sym))
@@ -894,13 +1261,11 @@ class DagMznPrinter(DagWalker):
 
     def walk_bv_srem(self, formula, args):
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()  #(sign follows dividend)
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_let_bv(formula,"""var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_ris = (%s_args1 mod %s_args2);
-                             var int:%s = if (%s_ris < 0) then %s_ris+%s else %s_ris endif;
-                        } in \n """ %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
+                             var int:%s = if (%s_ris < 0) then %s_ris+%s else %s_ris endif;""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
                                    sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
                                    sym,sym,sym,
                                    sym,sym,sym,str(pow(2,size)),sym))
@@ -911,9 +1276,7 @@ class DagMznPrinter(DagWalker):
         # Kind of useless
         #return self.walk_nary(formula, args, "bv2nat")
         sym = self._new_symbol()
-        self.openings += 1
-        self.write(""" let { var int:%s = %s;
-                        } in \n"""%(sym,args[0]))
+        self._write_let_bv(formula,"""var int:%s = %s;"""%(sym,args[0]))
         return sym
 
     def walk_array_select(self, formula, args):
@@ -999,47 +1362,36 @@ class DagMznPrinter(DagWalker):
     def walk_bv_extract(self, formula, args, **kwargs):
         assert formula is not None
         sym = self._new_symbol()
-        self.openings += 1
         start=int(formula.bv_extract_start())
         end=int(formula.bv_extract_end())
-        if start != end:
-            self.write(""" let { var int : %s_s1 = %s div %s;
-                                 var int : %s = sum([pow(2,i)*(((%s_s1 div pow(2,i)) mod 2)) | i in 0..%s]);
-                            } in \n"""%(sym,args[0],str(pow(2,start)),sym,sym,str(end-start)))
-
-
+        bits=self._bits(args[0],formula.arg(0))
+        if start==0:
+            self._write_let_bv(formula,"""var int : %s = sum(i in 0..%s)(pow(2,i)*%s[i]);"""%(sym,end,bits))
         else:
-            self.write(""" let { var int : %s =  (%s div pow(2,%s)) mod 2;
-                            } in \n""" %(sym,args[0],start))
+            self._write_let_bv(formula,"""var int : %s = sum(i in %s..%s)(pow(2,i-%s)*%s[i]);"""%(sym,start,end,start,bits))
         return sym
 
     @handles(op.BV_SEXT, op.BV_ZEXT)
     def walk_bv_extend(self, formula, args, **kwargs):
         #pylint: disable=unused-argument
         sym = self._new_symbol()
-        self.openings += 1
         if formula.is_bv_zext():
-            self.write(""" let { var int:%s = %s;
-                          } in """%(sym,args[0]))
+            self._write_let_bv(formula,"""var int:%s = %s;"""%(sym,args[0]))
         else:
             assert formula.is_bv_sext()
-            self.write(""" let { var int:%s = %s+sum([pow(2,i) | i in %s..%s ]);
-                           } in \n"""%(sym,args[0],formula.args()[0].bv_width(),formula.bv_width()-1))
+            self._write_let_bv(formula,"""var int:%s = %s+sum([pow(2,i) | i in %s..%s ]);"""%(sym,args[0],formula.args()[0].bv_width(),formula.bv_width()-1))
         return sym
 
     @handles(op.BV_ROR, op.BV_ROL)
     def walk_bv_rotate(self, formula, args, **kwargs):
         #pylint: disable=unused-argument
         sym = self._new_symbol()
-        self.openings += 1
         size=formula.bv_width()
         rotate=formula.bv_rotation_step()%size
         if formula.is_bv_ror():
-            self.write(""" let { var int:%s = (%s div %s + ((%s * %s) mod %s)) mod %s;
-                            } in \n """%(sym,args[0],str(pow(2,rotate)),args[0],str(pow(2,size-rotate)),str(pow(2,size)),str(pow(2,size))))
+            self._write_let_bv(formula,"""var int:%s = (%s div %s + ((%s * %s) mod %s)) mod %s;"""%(sym,args[0],str(pow(2,rotate)),args[0],str(pow(2,size-rotate)),str(pow(2,size)),str(pow(2,size))))
         else:
-            self.write(""" let { var int:%s = (%s div %s) + ((%s * %s mod %s)) mod %s;
-                           } in \n"""%(sym,args[0],str(pow(2,size-rotate)),args[0],str(pow(2,rotate)),str(pow(2,size)),str(pow(2,size))))
+            self._write_let_bv(formula,"""var int:%s = (%s div %s) + ((%s * %s mod %s)) mod %s;"""%(sym,args[0],str(pow(2,size-rotate)),args[0],str(pow(2,rotate)),str(pow(2,size)),str(pow(2,size))))
 
         return sym
 
@@ -1100,8 +1452,737 @@ class DagMznPrinter(DagWalker):
         raise NotImplementedErr("Operation that cannot be translated into MzN")
 
 
+class DagBitsMznPrinter(DagMznPrinter):
+    """DAG printer for the bit-blasted encoding of the bitvectors.
+
+    Every BV term is an array[0..w-1] of var bool (bit 0 is the least
+    significant one): the bitwise operators are pointwise, add/sub/neg are
+    ripple carry adders and the comparisons are chains from the least
+    significant bit. The BV variables are the arrays bits_name(x), channelled
+    with the integer x by a linear sum in the declarations. The operators
+    without a boolean encoding (mul, div, rem, variable shifts) go through an
+    integer view of their arguments.
+    """
+
+    specialize_constants = False
+
+    def __init__(self,max_int_bit_size,stream,template="tmp_%d",flat_let=False,tables=None):
+        DagMznPrinter.__init__(self,max_int_bit_size,stream,template=template,flat_let=flat_let,tables=tables)
+        self.bv_constants={}    #literal array of a BV constant -> its value
+        self.int_views={}       #bits array -> integer variable with its value
+
+    def printer(self, f):
+        self.int_views={}
+        DagMznPrinter.printer(self, f)
+
+    def _declare_bits(self, width, elements, decls=""):
+        sym = self._new_symbol()
+        self._write_let("%sarray[0..%d] of var bool : %s = array1d(0..%d,%s);" % (decls,width-1,sym,width-1,elements))
+        return sym
+
+    def _bit(self, bits, i):
+        if bits in self.bv_constants:
+            return "true" if (self.bv_constants[bits] >> i) & 1 else "false"
+        return "%s[%d]" % (bits,i)
+
+    def _int_view(self, bits, width):
+        if bits in self.bv_constants:
+            return str(self.bv_constants[bits])
+        if bits not in self.int_views:
+            sym = self._new_symbol()
+            self._write_let("var 0..%d : %s = sum(i in 0..%d)(bool2int(%s[i])*pow(2,i));" % (pow(2,width)-1,sym,width-1,bits))
+            self.int_views[bits] = sym
+        return self.int_views[bits]
+
+    def _from_int(self, value, width):
+        return self._declare_bits(width,"[((%s div pow(2,i)) mod 2) = 1 | i in 0..%d]" % (value,width-1))
+
+    def _walk_via_int(self, walker, formula, args):
+        '''
+            Applies the integer encoding of the operator to the integer views of the arguments
+        '''
+        int_args = [self._int_view(a,s.bv_width()) if s.get_type().is_bv_type() else a for (a,s) in zip(args,formula.args())]
+        res = walker(self, formula, int_args)
+        if formula.get_type().is_bv_type():
+            return self._from_int(res,formula.bv_width())
+        return res
+
+    def _get_children(self, formula):
+        if formula.is_ite() and formula.get_type().is_bv_type():
+            return formula.args()
+        if formula.is_ite() and formula not in self.ite_cases:
+            cases = ite_cases(formula)
+            if cases[0] is not None and cases[0][0].get_type().is_bv_type():
+                #a bits array cannot index the lookup table
+                cases = (None,)+cases[1:]
+            self.ite_cases[formula] = cases
+        return DagMznPrinter._get_children(self, formula)
+
+    def walk_symbol(self, formula, **kwargs):
+        if formula.symbol_type().is_bv_type():
+            return bits_name(quote(formula.symbol_name()))
+        return DagMznPrinter.walk_symbol(self, formula, **kwargs)
+
+    def walk_bv_constant(self, formula, **kwargs):
+        width = formula.bv_width()
+        value = formula.constant_value()
+        res = "array1d(0..%d,[%s])" % (width-1,", ".join("true" if (value >> i) & 1 else "false" for i in range(width)))
+        self.bv_constants[res] = value
+        return res
+
+    def walk_bv_not(self, formula, args):
+        return self._declare_bits(formula.bv_width(),"[not %s[i] | i in 0..%d]" % (args[0],formula.bv_width()-1))
+
+    def walk_bv_and(self, formula, args):
+        return self._declare_bits(formula.bv_width(),"[%s[i] /\\ %s[i] | i in 0..%d]" % (args[0],args[1],formula.bv_width()-1))
+
+    def walk_bv_or(self, formula, args):
+        return self._declare_bits(formula.bv_width(),"[%s[i] \\/ %s[i] | i in 0..%d]" % (args[0],args[1],formula.bv_width()-1))
+
+    def walk_bv_xor(self, formula, args):
+        return self._declare_bits(formula.bv_width(),"[%s[i] xor %s[i] | i in 0..%d]" % (args[0],args[1],formula.bv_width()-1))
+
+    def _adder(self, width, x, y, carry):
+        '''
+            Ripple carry adder of the lists of bits x and y with the carry in ("true"/"false")
+        '''
+        sym = self._new_symbol()
+        decls = ""
+        bits = []
+        for i in range(width):
+            if carry == "false":
+                bits.append("(%s xor %s)" % (x[i],y[i]))
+                next_carry = "(%s /\\ %s)" % (x[i],y[i])
+            elif carry == "true":
+                bits.append("not (%s xor %s)" % (x[i],y[i]))
+                next_carry = "(%s \\/ %s)" % (x[i],y[i])
+            else:
+                bits.append("(%s xor %s xor %s)" % (x[i],y[i],carry))
+                next_carry = "((%s /\\ %s) \\/ (%s /\\ (%s xor %s)))" % (x[i],y[i],carry,x[i],y[i])
+            if i < width-1:
+                carry = "%s_c%d" % (sym,i+1)
+                decls += "var bool : %s = %s; " % (carry,next_carry)
+        self._write_let("%sarray[0..%d] of var bool : %s = array1d(0..%d,[%s]);" % (decls,width-1,sym,width-1,", ".join(bits)))
+        return sym
+
+    def walk_bv_add(self, formula, args):
+        width = formula.bv_width()
+        return self._adder(width,[self._bit(args[0],i) for i in range(width)],[self._bit(args[1],i) for i in range(width)],"false")
+
+    def walk_bv_sub(self, formula, args):
+        #a - b = a + not(b) + 1
+        width = formula.bv_width()
+        return self._adder(width,[self._bit(args[0],i) for i in range(width)],["(not %s)" % self._bit(args[1],i) for i in range(width)],"true")
+
+    def walk_bv_neg(self, formula, args):
+        width = formula.bv_width()
+        return self._adder(width,["false"]*width,["(not %s)" % self._bit(args[0],i) for i in range(width)],"true")
+
+    def _comparison(self, formula, args, strict, signed):
+        '''
+            Chain from the least significant bit: l_i is the comparison restricted to the bits 0..i
+        '''
+        width = formula.arg(0).bv_width()
+        sym = self._new_symbol()
+        prev = "false" if strict else "true"
+        decls = ""
+        for i in range(width):
+            (a,b) = (self._bit(args[0],i),self._bit(args[1],i))
+            if signed and i == width-1:
+                #the sign bit is set in the smaller number
+                smaller = "(%s /\\ not %s)" % (a,b)
+            else:
+                smaller = "(not %s /\\ %s)" % (a,b)
+            name = sym if i == width-1 else "%s_l%d" % (sym,i)
+            decls += "var bool : %s = (%s \\/ ((%s = %s) /\\ %s)); " % (name,smaller,a,b,prev)
+            prev = name
+        self._write_let(decls.strip())
+        return sym
+
+    def walk_bv_ult(self, formula, args):
+        return self._comparison(formula,args,True,False)
+
+    def walk_bv_ule(self, formula, args):
+        return self._comparison(formula,args,False,False)
+
+    def walk_bv_slt(self, formula, args):
+        return self._comparison(formula,args,True,True)
+
+    def walk_bv_sle(self, formula, args):
+        return self._comparison(formula,args,False,True)
+
+    def walk_equals(self, formula, args):
+        if formula.arg(0).get_type().is_bv_type():
+            sym = self._new_symbol()
+            self._write_let("var bool : %s = forall(i in 0..%d)(%s[i] = %s[i]);" % (sym,formula.arg(0).bv_width()-1,args[0],args[1]))
+            return sym
+        return DagMznPrinter.walk_equals(self, formula, args)
+
+    def walk_bv_comp(self, formula, args):
+        return self._declare_bits(1,"[forall(i in 0..%d)(%s[i] = %s[i])]" % (formula.arg(0).bv_width()-1,args[0],args[1]))
+
+    def walk_ite(self, formula, args):
+        if formula.get_type().is_bv_type():
+            return self._declare_bits(formula.bv_width(),"[if %s then %s[i] else %s[i] endif | i in 0..%d]" % (args[0],args[1],args[2],formula.bv_width()-1))
+        return DagMznPrinter.walk_ite(self, formula, args)
+
+    def walk_bv_concat(self, formula, args):
+        low = formula.arg(1).bv_width()
+        return self._declare_bits(formula.bv_width(),"[if i < %d then %s[i] else %s[i-%d] endif | i in 0..%d]" % (low,args[1],args[0],low,formula.bv_width()-1))
+
+    def walk_bv_extract(self, formula, args, **kwargs):
+        start = formula.bv_extract_start()
+        end = formula.bv_extract_end()
+        return self._declare_bits(end-start+1,"[%s[i] | i in %d..%d]" % (args[0],start,end))
+
+    @handles(op.BV_SEXT, op.BV_ZEXT)
+    def walk_bv_extend(self, formula, args, **kwargs):
+        width = formula.arg(0).bv_width()
+        if formula.is_bv_zext():
+            elements = "[if i < %d then %s[i] else false endif | i in 0..%d]" % (width,args[0],formula.bv_width()-1)
+        else:
+            elements = "[%s[min(i,%d)] | i in 0..%d]" % (args[0],width-1,formula.bv_width()-1)
+        return self._declare_bits(formula.bv_width(),elements)
+
+    @handles(op.BV_ROR, op.BV_ROL)
+    def walk_bv_rotate(self, formula, args, **kwargs):
+        width = formula.bv_width()
+        step = formula.bv_rotation_step() % width
+        if formula.is_bv_rol():
+            step = width - step
+        return self._declare_bits(width,"[%s[(i+%d) mod %d] | i in 0..%d]" % (args[0],step,width,width-1))
+
+    def walk_bv_lshl(self, formula, args):
+        if not formula.arg(1).is_bv_constant():
+            return self._walk_via_int(DagMznPrinter.walk_bv_lshl, formula, args)
+        k = formula.arg(1).constant_value()
+        return self._declare_bits(formula.bv_width(),"[if i >= %d then %s[i-%d] else false endif | i in 0..%d]" % (k,args[0],k,formula.bv_width()-1))
+
+    def walk_bv_lshr(self, formula, args):
+        if not formula.arg(1).is_bv_constant():
+            return self._walk_via_int(DagMznPrinter.walk_bv_lshr, formula, args)
+        k = formula.arg(1).constant_value()
+        return self._declare_bits(formula.bv_width(),"[if i+%d < %d then %s[i+%d] else false endif | i in 0..%d]" % (k,formula.bv_width(),args[0],k,formula.bv_width()-1))
+
+    def walk_bv_ashr(self, formula, args):
+        if formula.arg(1).is_bv_constant():
+            k = formula.arg(1).constant_value()
+        else:
+            k = self._int_view(args[1],formula.bv_width())
+        return self._declare_bits(formula.bv_width(),"[%s[min(i+%s,%d)] | i in 0..%d]" % (args[0],k,formula.bv_width()-1,formula.bv_width()-1))
+
+    def walk_bv_mul(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_mul, formula, args)
+
+    def walk_bv_udiv(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_udiv, formula, args)
+
+    def walk_bv_urem(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_urem, formula, args)
+
+    def walk_bv_sdiv(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_sdiv, formula, args)
+
+    def walk_bv_srem(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_srem, formula, args)
+
+    def walk_bv_tonatural(self, formula, args):
+        return self._int_view(args[0],formula.arg(0).bv_width())
+
+#EOC DagBitsMznPrinter
+
+
+class DagSetsMznPrinter(DagBitsMznPrinter):
+    """DAG printer for the set encoding of the bitvectors.
+
+    Every BV term is a var set of 0..w-1 with the positions of its one bits:
+    and/or/xor/not are intersect/union/symdiff/complement and the structural
+    operators (extract, extend, concat, rotate, constant shifts) channel the
+    positions of the result with the ones of the argument. The BV variables
+    are the sets sets_name(x), channelled with the integer x in the
+    declarations; the arithmetic and the comparisons go through the integer
+    views of their arguments as in the bits encoding.
+    """
+
+    def __init__(self,max_int_bit_size,stream,template="tmp_%d",flat_let=False,tables=None):
+        DagBitsMznPrinter.__init__(self,max_int_bit_size,stream,template=template,flat_let=flat_let,tables=tables)
+        self.set_symbols={}     #set of a BV variable -> the integer variable
+
+    def _declare_set(self, width, value=None, condition=None):
+        '''
+            Set of 0..width-1 equal to the expression value, or with the positions i
+            that satisfy the condition (an expression of i)
+        '''
+        sym = self._new_symbol()
+        if condition is None:
+            self._write_let("var set of 0..%d : %s = %s;" % (width-1,sym,value))
+        else:
+            self._write_let("var set of 0..%d : %s; constraint forall(i in 0..%d)((i in %s) <-> (%s));" % (width-1,sym,width-1,sym,condition))
+        return sym
+
+    def _int_view(self, bits, width):
+        if bits in self.bv_constants:
+            return str(self.bv_constants[bits])
+        if bits in self.set_symbols:
+            return self.set_symbols[bits]
+        if bits not in self.int_views:
+            sym = self._new_symbol()
+            self._write_let("var 0..%d : %s = sum(i in 0..%d)(bool2int(i in %s)*pow(2,i));" % (pow(2,width)-1,sym,width-1,bits))
+            self.int_views[bits] = sym
+        return self.int_views[bits]
+
+    def _from_int(self, value, width):
+        return self._declare_set(width,condition="((%s div pow(2,i)) mod 2) = 1" % value)
+
+    def walk_symbol(self, formula, **kwargs):
+        if formula.symbol_type().is_bv_type():
+            name = quote(formula.symbol_name())
+            self.set_symbols[sets_name(name)] = name
+            return sets_name(name)
+        return DagMznPrinter.walk_symbol(self, formula, **kwargs)
+
+    def walk_bv_constant(self, formula, **kwargs):
+        value = formula.constant_value()
+        res = "{%s}" % ",".join(str(i) for i in range(formula.bv_width()) if (value >> i) & 1)
+        self.bv_constants[res] = value
+        return res
+
+    def walk_bv_not(self, formula, args):
+        return self._declare_set(formula.bv_width(),"(0..%d) diff %s" % (formula.bv_width()-1,args[0]))
+
+    def walk_bv_and(self, formula, args):
+        return self._declare_set(formula.bv_width(),"%s intersect %s" % (args[0],args[1]))
+
+    def walk_bv_or(self, formula, args):
+        return self._declare_set(formula.bv_width(),"%s union %s" % (args[0],args[1]))
+
+    def walk_bv_xor(self, formula, args):
+        return self._declare_set(formula.bv_width(),"%s symdiff %s" % (args[0],args[1]))
+
+    def walk_bv_add(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_add, formula, args)
+
+    def walk_bv_sub(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_sub, formula, args)
+
+    def walk_bv_neg(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_neg, formula, args)
+
+    def walk_bv_ult(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_ult, formula, args)
+
+    def walk_bv_ule(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_ule, formula, args)
+
+    def walk_bv_slt(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_slt, formula, args)
+
+    def walk_bv_sle(self, formula, args):
+        return self._walk_via_int(DagMznPrinter.walk_bv_sle, formula, args)
+
+    def walk_equals(self, formula, args):
+        if formula.arg(0).get_type().is_bv_type():
+            sym = self._new_symbol()
+            self._write_let("var bool : %s = (%s = %s);" % (sym,args[0],args[1]))
+            return sym
+        return DagMznPrinter.walk_equals(self, formula, args)
+
+    def walk_bv_comp(self, formula, args):
+        return self._declare_set(1,condition="%s = %s" % (args[0],args[1]))
+
+    def walk_ite(self, formula, args):
+        if formula.get_type().is_bv_type():
+            return self._declare_set(formula.bv_width(),condition="if %s then i in %s else i in %s endif" % (args[0],args[1],args[2]))
+        return DagMznPrinter.walk_ite(self, formula, args)
+
+    def walk_bv_concat(self, formula, args):
+        low = formula.arg(1).bv_width()
+        return self._declare_set(formula.bv_width(),condition="if i < %d then i in %s else i-%d in %s endif" % (low,args[1],low,args[0]))
+
+    def walk_bv_extract(self, formula, args, **kwargs):
+        start = formula.bv_extract_start()
+        end = formula.bv_extract_end()
+        if start == 0:
+            return self._declare_set(end+1,"%s intersect (0..%d)" % (args[0],end))
+        return self._declare_set(end-start+1,condition="i+%d in %s" % (start,args[0]))
+
+    @handles(op.BV_SEXT, op.BV_ZEXT)
+    def walk_bv_extend(self, formula, args, **kwargs):
+        if formula.is_bv_zext():
+            #the positions of the argument are the ones of the result
+            return args[0]
+        return self._declare_set(formula.bv_width(),condition="min(i,%d) in %s" % (formula.arg(0).bv_width()-1,args[0]))
+
+    @handles(op.BV_ROR, op.BV_ROL)
+    def walk_bv_rotate(self, formula, args, **kwargs):
+        width = formula.bv_width()
+        step = formula.bv_rotation_step() % width
+        if formula.is_bv_rol():
+            step = width - step
+        return self._declare_set(width,condition="(i+%d) mod %d in %s" % (step,width,args[0]))
+
+    def walk_bv_lshl(self, formula, args):
+        if not formula.arg(1).is_bv_constant():
+            return self._walk_via_int(DagMznPrinter.walk_bv_lshl, formula, args)
+        k = formula.arg(1).constant_value()
+        return self._declare_set(formula.bv_width(),condition="i >= %d /\\ i-%d in %s" % (k,k,args[0]))
+
+    def walk_bv_lshr(self, formula, args):
+        if not formula.arg(1).is_bv_constant():
+            return self._walk_via_int(DagMznPrinter.walk_bv_lshr, formula, args)
+        k = formula.arg(1).constant_value()
+        return self._declare_set(formula.bv_width(),condition="i+%d in %s" % (k,args[0]))
+
+    def walk_bv_ashr(self, formula, args):
+        if not formula.arg(1).is_bv_constant():
+            return self._walk_via_int(DagMznPrinter.walk_bv_ashr, formula, args)
+        k = formula.arg(1).constant_value()
+        return self._declare_set(formula.bv_width(),condition="min(i+%d,%d) in %s" % (k,formula.bv_width()-1,args[0]))
+
+#EOC DagSetsMznPrinter
+
+
+class DagLimbsMznPrinter(DagMznPrinter):
+    """DAG printer of the integer encoding with the wide bitvectors split in limbs.
+
+    A BV term wider than half of the solver integers (see wide_width) is an
+    array[0..n-1] of var int, the element k holds the bits k*L..k*L+L-1 with
+    the limb width L (see limb_width, the product of two limbs fits in the
+    solver integers); the narrower terms keep the
+    encoding of DagMznPrinter. add/sub/neg propagate a carry between the
+    limbs, mul is the schoolbook product truncated to the width and the
+    comparisons are lexicographic from the most significant limb. The bitwise
+    and the structural operators go through the bits of the limbs. Divisions,
+    remainders, shifts by a variable amount and bv2nat of a wide term are not
+    supported, see limbs_unsupported.
+    """
+
+    def __init__(self,max_int_bit_size,stream,template="tmp_%d",flat_let=False,bit_symbols=None,tables=None):
+        DagMznPrinter.__init__(self,max_int_bit_size,stream,template=template,flat_let=flat_let,bit_symbols=bit_symbols,tables=tables)
+        self.limb=limb_width(max_int_bit_size)
+        self.wide_width=wide_width(max_int_bit_size)
+        self.limb_constants={}  #literal array of a wide BV constant -> its value
+
+    def _wide(self, formula):
+        return formula.get_type().is_bv_type() and formula.bv_width() > self.wide_width
+
+    def _unsupported(self, formula):
+        raise NotImplementedErr("The operator %s on bitvectors wider than %d bits cannot be translated into Mzn" % (op.op_to_str(formula.node_type()),self.limb))
+
+    def _specialized(self, walker):
+        narrow = DagMznPrinter._specialized(self, walker)
+        def walk(formula, args, **kwargs):
+            if self._wide(formula.arg(0)):
+                return walker(formula, args, **kwargs)
+            return narrow(formula, args, **kwargs)
+        return walk
+
+    def _limb(self, limbs, k):
+        if limbs in self.limb_constants:
+            return str((self.limb_constants[limbs] >> (k*self.limb)) % pow(2,self.limb))
+        return "%s[%d]" % (limbs,k)
+
+    def _limbs(self, limbs, formula):
+        return [self._limb(limbs,k) for k in range(len(limb_sizes(formula.bv_width(),self.limb)))]
+
+    def _declare_limbs(self, width, elements, decls="", sym=None):
+        if sym is None:
+            sym = self._new_symbol()
+        n = len(elements)
+        self._write_let("%sarray[0..%d] of var 0..%d : %s = array1d(0..%d,[%s]);" % (decls,n-1,pow(2,self.limb)-1,sym,n-1,", ".join(elements)))
+        return sym
+
+    def _bits(self, term, formula):
+        if not self._wide(formula) or formula.is_bv_constant():
+            return DagMznPrinter._bits(self, term, formula)
+        if term not in self.bit_views:
+            sym = self._new_symbol()
+            size = formula.bv_width()
+            self._write_let("array[0..%d] of var 0..1 : %s = array1d(0..%d,[(%s[i div %d] div pow(2,i mod %d)) mod 2 | i in 0..%d]);" % (size-1,sym,size-1,term,self.limb,self.limb,size-1))
+            self.bit_views[term] = sym
+        return self.bit_views[term]
+
+    def _from_bits(self, formula, elements):
+        '''
+            Value of the BV formula whose bits (var 0..1) are the comprehension elements
+        '''
+        width = formula.bv_width()
+        bits = self._new_symbol()
+        self._write_let("array[0..%d] of var 0..1 : %s = array1d(0..%d,%s);" % (width-1,bits,width-1,elements))
+        if not self._wide(formula):
+            sym = self._new_symbol()
+            self._write_let_bv(formula,"var int : %s = sum(i in 0..%d)(pow(2,i)*%s[i]);" % (sym,width-1,bits))
+            return sym
+        res = ["sum(i in 0..%d)(pow(2,i)*%s[i])" % (min(self.limb,width)-1,bits)]
+        for (k,size) in list(enumerate(limb_sizes(width,self.limb)))[1:]:
+            lo = k*self.limb
+            res.append("sum(i in %d..%d)(pow(2,i-%d)*%s[i])" % (lo,lo+size-1,lo,bits))
+        sym = self._declare_limbs(width,res)
+        self.bit_views[sym] = bits
+        return sym
+
+    def _get_children(self, formula):
+        if formula.is_ite() and self._wide(formula):
+            return formula.args()
+        if formula.is_ite() and formula not in self.ite_cases:
+            cases = ite_cases(formula)
+            if cases[0] is not None and self._wide(cases[0][0]):
+                #a limbs array cannot index the lookup table
+                cases = (None,)+cases[1:]
+            self.ite_cases[formula] = cases
+        return DagMznPrinter._get_children(self, formula)
+
+    def walk_symbol(self, formula, **kwargs):
+        if self._wide(formula):
+            return limbs_name(quote(formula.symbol_name()))
+        return DagMznPrinter.walk_symbol(self, formula, **kwargs)
+
+    def walk_bv_constant(self, formula, **kwargs):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_constant(self, formula, **kwargs)
+        value = formula.constant_value()
+        n = len(limb_sizes(formula.bv_width(),self.limb))
+        res = "array1d(0..%d,[%s])" % (n-1,", ".join(str((value >> (k*self.limb)) % pow(2,self.limb)) for k in range(n)))
+        self.limb_constants[res] = value
+        return res
+
+    def walk_bv_not(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_not(self, formula, args)
+        sizes = limb_sizes(formula.bv_width(),self.limb)
+        return self._declare_limbs(formula.bv_width(),["%d - %s" % (pow(2,s)-1,x) for (s,x) in zip(sizes,self._limbs(args[0],formula))])
+
+    def _bitwise(self, formula, args, template):
+        (b0,b1) = (self._bits(args[0],formula.arg(0)),self._bits(args[1],formula.arg(1)))
+        return self._from_bits(formula,"[%s | i in 0..%d]" % (template % (b0,b1),formula.bv_width()-1))
+
+    def walk_bv_and(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_and(self, formula, args)
+        return self._bitwise(formula,args,"%s[i]*%s[i]")
+
+    def walk_bv_or(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_or(self, formula, args)
+        return self._bitwise(formula,args,"max(%s[i],%s[i])")
+
+    def walk_bv_xor(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_xor(self, formula, args)
+        return self._bitwise(formula,args,"bool2int(%s[i] != %s[i])")
+
+    def _carry_adder(self, formula, x, y, carry):
+        '''
+            Sum of the lists of limbs x and y with the carry in ("0"/"1"), the carry out is dropped
+        '''
+        sym = self._new_symbol()
+        decls = ""
+        res = []
+        sizes = limb_sizes(formula.bv_width(),self.limb)
+        for (k,size) in enumerate(sizes):
+            total = "%s + %s" % (x[k],y[k]) if carry == "0" else "%s + %s + %s" % (x[k],y[k],carry)
+            res.append("(%s) mod %d" % (total,pow(2,size)))
+            if k < len(sizes)-1:
+                carry = "%s_c%d" % (sym,k+1)
+                decls += "var 0..1 : %s = (%s) div %d; " % (carry,total,pow(2,size))
+        return self._declare_limbs(formula.bv_width(),res,decls,sym)
+
+    def walk_bv_add(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_add(self, formula, args)
+        return self._carry_adder(formula,self._limbs(args[0],formula),self._limbs(args[1],formula),"0")
+
+    def walk_bv_sub(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_sub(self, formula, args)
+        #a - b = a + not(b) + 1
+        sizes = limb_sizes(formula.bv_width(),self.limb)
+        negated = ["(%d - %s)" % (pow(2,s)-1,y) for (s,y) in zip(sizes,self._limbs(args[1],formula))]
+        return self._carry_adder(formula,self._limbs(args[0],formula),negated,"1")
+
+    def walk_bv_neg(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_neg(self, formula, args)
+        sizes = limb_sizes(formula.bv_width(),self.limb)
+        negated = ["(%d - %s)" % (pow(2,s)-1,y) for (s,y) in zip(sizes,self._limbs(args[0],formula))]
+        return self._carry_adder(formula,["0"]*len(sizes),negated,"1")
+
+    def walk_bv_mul(self, formula, args):
+        '''
+            Schoolbook product: the product of the limbs i and j is split in its low and high
+            limb, added to the columns i+j and i+j+1 with the carry of the previous column
+        '''
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_mul(self, formula, args)
+        (x,y) = (self._limbs(args[0],formula),self._limbs(args[1],formula))
+        sizes = limb_sizes(formula.bv_width(),self.limb)
+        n = len(sizes)
+        base = pow(2,self.limb)
+        sym = self._new_symbol()
+        decls = ""
+        products = {}
+        for i in range(n):
+            for j in range(n-i):
+                if x[i] != "0" and y[j] != "0":
+                    products[(i,j)] = "%s_p%d_%d" % (sym,i,j)
+                    decls += "var 0..%d : %s = %s * %s; " % ((base-1)*(base-1),products[(i,j)],x[i],y[j])
+        res = []
+        carry = None
+        for (k,size) in enumerate(sizes):
+            terms = ["(%s mod %d)" % (products[(i,k-i)],base) for i in range(k+1) if (i,k-i) in products]
+            terms += ["(%s div %d)" % (products[(i,k-1-i)],base) for i in range(k) if (i,k-1-i) in products]
+            if carry is not None:
+                terms.append(carry)
+            total = " + ".join(terms) if terms else "0"
+            res.append("(%s) mod %d" % (total,pow(2,size)))
+            if k < n-1:
+                carry = "%s_c%d" % (sym,k+1)
+                decls += "var int : %s = (%s) div %d; " % (carry,total,base)
+        return self._declare_limbs(formula.bv_width(),res,decls,sym)
+
+    def _comparison(self, formula, args, strict, signed):
+        '''
+            Lexicographic comparison of the limbs, built from the least significant one;
+            the signed order flips the sign bit of the most significant limb
+        '''
+        (x,y) = (self._limbs(args[0],formula.arg(0)),self._limbs(args[1],formula.arg(1)))
+        sizes = limb_sizes(formula.arg(0).bv_width(),self.limb)
+        if signed:
+            top = sizes[-1]
+            (x[-1],y[-1]) = (offset_view(x[-1],top),offset_view(y[-1],top))
+        res = "%s %s %s" % (x[0],"<" if strict else "<=",y[0])
+        for k in range(1,len(sizes)):
+            res = "%s < %s \\/ (%s = %s /\\ (%s))" % (x[k],y[k],x[k],y[k],res)
+        sym = self._new_symbol()
+        self._write_let("var bool : %s = (%s);" % (sym,res))
+        return sym
+
+    def walk_bv_ult(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_bv_ult(self, formula, args)
+        return self._comparison(formula,args,True,False)
+
+    def walk_bv_ule(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_bv_ule(self, formula, args)
+        return self._comparison(formula,args,False,False)
+
+    def walk_bv_slt(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_bv_slt(self, formula, args)
+        return self._comparison(formula,args,True,True)
+
+    def walk_bv_sle(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_bv_sle(self, formula, args)
+        return self._comparison(formula,args,False,True)
+
+    def _limbs_equal(self, formula, args):
+        (x,y) = (self._limbs(args[0],formula.arg(0)),self._limbs(args[1],formula.arg(1)))
+        return " /\\ ".join("%s = %s" % (a,b) for (a,b) in zip(x,y))
+
+    def walk_equals(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_equals(self, formula, args)
+        sym = self._new_symbol()
+        self._write_let("var bool : %s = (%s);" % (sym,self._limbs_equal(formula,args)))
+        return sym
+
+    def walk_bv_comp(self, formula, args):
+        if not self._wide(formula.arg(0)):
+            return DagMznPrinter.walk_bv_comp(self, formula, args)
+        sym = self._new_symbol()
+        self._write_let_bv(formula,"var int : %s = bool2int(%s);" % (sym,self._limbs_equal(formula,args)))
+        return sym
+
+    def walk_ite(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_ite(self, formula, args)
+        (t,e) = (self._limbs(args[1],formula),self._limbs(args[2],formula))
+        return self._declare_limbs(formula.bv_width(),["if %s then %s else %s endif" % (args[0],a,b) for (a,b) in zip(t,e)])
+
+    def walk_bv_concat(self, formula, args):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_concat(self, formula, args)
+        low = formula.arg(1).bv_width()
+        (hi,lo) = (self._bits(args[0],formula.arg(0)),self._bits(args[1],formula.arg(1)))
+        return self._from_bits(formula,"[if i < %d then %s[i] else %s[i-%d] endif | i in 0..%d]" % (low,lo,hi,low,formula.bv_width()-1))
+
+    def walk_bv_extract(self, formula, args, **kwargs):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_extract(self, formula, args, **kwargs)
+        bits = self._bits(args[0],formula.arg(0))
+        return self._from_bits(formula,"[%s[i] | i in %d..%d]" % (bits,formula.bv_extract_start(),formula.bv_extract_end()))
+
+    @handles(op.BV_SEXT, op.BV_ZEXT)
+    def walk_bv_extend(self, formula, args, **kwargs):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_extend(self, formula, args, **kwargs)
+        width = formula.arg(0).bv_width()
+        bits = self._bits(args[0],formula.arg(0))
+        if formula.is_bv_zext():
+            elements = "[if i < %d then %s[i] else 0 endif | i in 0..%d]" % (width,bits,formula.bv_width()-1)
+        else:
+            elements = "[%s[min(i,%d)] | i in 0..%d]" % (bits,width-1,formula.bv_width()-1)
+        return self._from_bits(formula,elements)
+
+    @handles(op.BV_ROR, op.BV_ROL)
+    def walk_bv_rotate(self, formula, args, **kwargs):
+        if not self._wide(formula):
+            return DagMznPrinter.walk_bv_rotate(self, formula, args, **kwargs)
+        width = formula.bv_width()
+        step = formula.bv_rotation_step() % width
+        if formula.is_bv_rol():
+            step = width - step
+        return self._from_bits(formula,"[%s[(i+%d) mod %d] | i in 0..%d]" % (self._bits(args[0],formula.arg(0)),step,width,width-1))
+
+    def _shift(self, formula, args, walker, elements):
+        if not self._wide(formula):
+            return walker(self, formula, args)
+        if not formula.arg(1).is_bv_constant():
+            self._unsupported(formula)
+        (k,width) = (formula.arg(1).constant_value(),formula.bv_width())
+        return self._from_bits(formula,elements % {"b":self._bits(args[0],formula.arg(0)),"k":k,"w":width,"m":width-1})
+
+    def walk_bv_lshl(self, formula, args):
+        return self._shift(formula,args,DagMznPrinter.walk_bv_lshl,"[if i >= %(k)d then %(b)s[i-%(k)d] else 0 endif | i in 0..%(m)d]")
+
+    def walk_bv_lshr(self, formula, args):
+        return self._shift(formula,args,DagMznPrinter.walk_bv_lshr,"[if i+%(k)d < %(w)d then %(b)s[i+%(k)d] else 0 endif | i in 0..%(m)d]")
+
+    def walk_bv_ashr(self, formula, args):
+        return self._shift(formula,args,DagMznPrinter.walk_bv_ashr,"[%(b)s[min(i+%(k)d,%(m)d)] | i in 0..%(m)d]")
+
+    def walk_bv_udiv(self, formula, args):
+        if self._wide(formula):
+            self._unsupported(formula)
+        return DagMznPrinter.walk_bv_udiv(self, formula, args)
+
+    def walk_bv_urem(self, formula, args):
+        if self._wide(formula):
+            self._unsupported(formula)
+        return DagMznPrinter.walk_bv_urem(self, formula, args)
+
+    def walk_bv_sdiv(self, formula, args):
+        if self._wide(formula):
+            self._unsupported(formula)
+        return DagMznPrinter.walk_bv_sdiv(self, formula, args)
+
+    def walk_bv_srem(self, formula, args):
+        if self._wide(formula):
+            self._unsupported(formula)
+        return DagMznPrinter.walk_bv_srem(self, formula, args)
+
+    def walk_bv_tonatural(self, formula, args):
+        if self._wide(formula.arg(0)):
+            self._unsupported(formula)
+        return DagMznPrinter.walk_bv_tonatural(self, formula, args)
+
+#EOC DagLimbsMznPrinter
+
+
 class DagFathersMznPrinter(DagWalker):
-    def __init__(self,max_int_bit_size,stream,dict_fathers,template="tmp_%d",boolean_invalidate=True):
+    def __init__(self,max_int_bit_size,stream,dict_fathers,template="tmp_%d",boolean_invalidate=True,bv_template="bv_%d",tables=None):
         DagWalker.__init__(self, invalidate_memoization=boolean_invalidate)
         self.stream = stream
         self.write = self.stream.write
@@ -1109,9 +2190,14 @@ class DagFathersMznPrinter(DagWalker):
         self.name_seed = 0
         self.memoization = copy.copy(dict_fathers)
         self.template = template
+        self.bv_template = bv_template
         self.names = None
         self.mgr = get_env().formula_manager
         self.max_int_bit_size=max_int_bit_size
+        self.ite_cases={}       #ite chain -> its cases, see ite_cases
+        self.tables=tables if tables is not None else set()    #widths of the pow2_table used
+        for o in BV_CONSTANT_OPS:
+            self.functions[o] = self._specialized(self.functions[o])
 
 
     ### MODIFIY THE DAGWALKER:
@@ -1179,6 +2265,45 @@ class DagFathersMznPrinter(DagWalker):
         self.name_seed += 1
         return res
 
+    def _write_bv(self, formula, text):
+        self.write(bv_domains(text,formula,self.max_int_bit_size))
+
+    def _pow2(self, width):
+        self.tables.add(width)
+        return pow2_name(width)
+
+    def _walk_shift(self, formula, args, kind):
+        sym=self._new_symbol_bv(self.bv_template)
+        self.openings += 1
+        size=formula.bv_width()
+        if formula.arg(1).is_bv_constant():
+            value=shift_expressions(args[0],formula.arg(1).constant_value(),size)[kind]
+        else:
+            value=shift_expressions(args[0],args[1],size,self._pow2(size))[kind]
+        self._write_bv(formula,""" let { var int:%s = %s;
+                        } in \n"""%(sym,value))
+        return sym
+
+    def _specialized(self, walker):
+        """Walker of a BV operator that uses the bv_constant_operand encoding when it exists"""
+        def walk(formula, args, **kwargs):
+            pieces = bv_constant_operand(formula)
+            if pieces is None:
+                return walker(formula, args, **kwargs)
+            return self._walk_constant_operand(formula, args, pieces)
+        return walk
+
+    def _walk_constant_operand(self, formula, args, pieces):
+        expr = "".join(args[p] if isinstance(p,int) else p for p in pieces)
+        if len(pieces) == 1:
+            return expr
+        sym=self._new_symbol_bv(self.bv_template)
+        self.openings += 1
+        typeF = "bool" if formula.get_type().is_bool_type() else "int"
+        self._write_bv(formula,""" let { var %s:%s = %s;
+                        } in \n"""%(typeF,sym,expr))
+        return sym
+
 
     def walk_nary(self, formula, args, operator):
         assert formula is not None
@@ -1240,8 +2365,20 @@ class DagFathersMznPrinter(DagWalker):
     def walk_lt(self, formula, args):
         return self.walk_nary(formula, args, "<")
 
+    def _get_children(self, formula):
+        if formula.is_ite():
+            #the nested ite of a chain are printed by the head of the chain
+            if formula not in self.ite_cases:
+                self.ite_cases[formula]=ite_cases(formula)
+            return ite_children(self.ite_cases[formula])
+        return formula.args()
+
     def walk_ite(self, formula, args):
-        return self.walk_nary(formula, args, "ite")
+        cases=self.ite_cases[formula]
+        if len(cases[1])==1:
+            return self.walk_nary(formula, args, "ite")
+        self.openings += 1
+        return ite_flat_expression(cases,args)
 
     def walk_toreal(self, formula, args):
         return self.walk_nary(formula, args, "int2float")
@@ -1258,50 +2395,50 @@ class DagFathersMznPrinter(DagWalker):
 
 
     def walk_bv_and(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* ((((%s div pow(2,i)) mod 2)) * (((%s div pow(2,i)) mod 2))) | i in 0..%s]);
+        self._write_bv(formula,""" let { var int : %s  = sum([pow(2,i)* ((((%s div pow(2,i)) mod 2)) * (((%s div pow(2,i)) mod 2))) | i in 0..%s]);
                          in \n""" %(sym,args[0],args[1],size-1))
         return sym
 
     def walk_bv_or(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) + (((%s div pow(2,i)) mod 2)))>0) | i in 0..%s]);
+        self._write_bv(formula,""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) + (((%s div pow(2,i)) mod 2)))>0) | i in 0..%s]);
                        } in \n""" %(sym,args[0],args[1],size-1))
         return sym
 
     def walk_bv_not(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (1-(%s div pow(2,i)) mod 2) | i in 0..%s]);
+        self._write_bv(formula,""" let { var int : %s  = sum([pow(2,i)* (1-(%s div pow(2,i)) mod 2) | i in 0..%s]);
                        } in \n""" %(sym,args[0],size-1))
         return sym
 
     def walk_bv_xor(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) != (((%s div pow(2,i)) mod 2)))) | i in 0..%s]);
+        self._write_bv(formula,""" let { var int : %s  = sum([pow(2,i)* (((((%s div pow(2,i)) mod 2)) != (((%s div pow(2,i)) mod 2)))) | i in 0..%s]);
                        } in \n""" %(sym,args[0],args[1],size-1))
         return sym
 
     def walk_bv_add(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write("""let{ var int:%s = (%s+%s) mod %s;
+        self._write_bv(formula,"""let{ var int:%s = (%s+%s) mod %s;
                         } in \n """%(sym,args[0],args[1],pow(2,size)))
         return sym
 
     def walk_bv_sub(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if %s >= %s then %s-%s else %s endif;
+        self._write_bv(formula,""" let { var int:%s_args1 = if %s >= %s then %s-%s else %s endif;
                             var int:%s_args2 = if %s >= %s then %s-%s else %s endif;
                             var int:%s_ris = (%s_args1 - %s_args2) mod %s;
                             var int:%s = if %s_ris < 0 then %s_ris+%s else %s_ris endif;
@@ -1312,10 +2449,10 @@ class DagFathersMznPrinter(DagWalker):
         return sym
 
     def walk_bv_neg(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if %s >= %s then %s-%s else %s endif;
+        self._write_bv(formula,""" let { var int:%s_args1 = if %s >= %s then %s-%s else %s endif;
                              var int:%s_ris = (0 - %s_args1);
                              var int:%s = if %s_ris < 0 then %s_ris+%s else %s_ris endif;
                         } in \n""" %(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
@@ -1325,121 +2462,93 @@ class DagFathersMznPrinter(DagWalker):
 
 
     def walk_bv_mul(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         typeF=int(str(formula.get_type()).lower())
         size=re.sub(r"bv{([0-9]+)}",r"\1",typeF)
-        self.write(""" let { var int:%s = (%s*%s) mod %s;
+        self._write_bv(formula,""" let { var int:%s = (%s*%s) mod %s;
                         } in \n"""%(sym,args[0],args[1],str(pow(2,size))))
         return sym
 
 
 
     def walk_bv_udiv(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
-        self.write(""" let { var int:%s = (%s div %s);
+        self._write_bv(formula,""" let { var int:%s = (%s div %s);
                        } in \n"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_urem(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
-        self.write(""" let { var int:%s = (%s mod %s);
+        self._write_bv(formula,""" let { var int:%s = (%s mod %s);
                         } in \n"""%(sym,args[0],args[1]))
         return sym
 
 
     def walk_bv_lshl(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
-        self.openings += 1
-        typeF=str(formula.get_type()).lower()
-        size=re.sub(r"bv{([0-9]+)}",r"\1",typeF)
-        self.write(""" let { var int:%s = (%s*pow(2,%s)) mod %s;
-                        } in \n"""%(sym,args[0],args[1],str(pow(2,size))))
-        return sym
-
+        return self._walk_shift(formula,args,"shl")
 
     def walk_bv_lshr(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
-        self.openings += 1
-        self.write(""" let { var int:%s = (%s div pow(2,%s));
-                        } in \n"""%(sym,args[0],args[1]))
-        return sym
+        return self._walk_shift(formula,args,"lshr")
 
     def walk_bv_ult(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
-        self.write(""" let { var bool:%s = (%s<%s);
+        self._write_bv(formula,""" let { var bool:%s = (%s<%s);
                         } in \n"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_ule(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
-        self.write(""" let { var bool:%s = (%s<=%s);
+        self._write_bv(formula,""" let { var bool:%s = (%s<=%s);
                        } in \n"""%(sym,args[0],args[1]))
         return sym
 
     def walk_bv_slt(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=int(formula.args()[0].bv_width())
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var bool:%s = (%s_args1 < %s_args2);
-                        } in  \n"""%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
-                                   sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
-                                   sym,sym,sym))
+        self._write_bv(formula,""" let { var bool:%s = (%s < %s);
+                        } in  \n"""%(sym,signed_view(args[0],size),signed_view(args[1],size)))
         return sym
 
     def walk_bv_sle(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=int(formula.args()[0].bv_width())
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
-                             var bool:%s = (%s_args1 <= %s_args2);
-                        } in  \n"""%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),args[0],
-                                   sym,args[1],str(pow(2,size-1)),args[1],str(pow(2,size)),args[1],
-                                   sym,sym,sym))
+        self._write_bv(formula,""" let { var bool:%s = (%s <= %s);
+                        } in  \n"""%(sym,signed_view(args[0],size),signed_view(args[1],size)))
         return sym
 
     def walk_bv_concat(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size_s1=formula.args()[0].bv_width()
         size_s2=formula.args()[1].bv_width()
-        self.write(""" let { var int: %s = %s + sum([pow(2,i+%s)*(((%s div pow(2,i)) mod 2)) | i in 0..%s]);
+        self._write_bv(formula,""" let { var int: %s = %s + sum([pow(2,i+%s)*(((%s div pow(2,i)) mod 2)) | i in 0..%s]);
                             } in \n"""%(sym,args[1],size_s2,args[0],size_s1-1))
         return sym
 
     def walk_bv_comp(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
-        self.write(""" let { var int : %s  = if %s=%s then 1 else 0 endif;
+        self._write_bv(formula,""" let { var int : %s  = if %s=%s then 1 else 0 endif;
                         } in \n""" %(sym,args[0],args[1]))
         return sym
 
 
     def walk_bv_ashr(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
-        self.openings += 1
-        size=formula.bv_width()
-        self.write(""" let {  var int:%s_args1 = if (%s>=%s) then (%s-%s+%s) else %s endif;
-                              var int:%s_ris =  %s_args1 div pow(2,%s);
-                              var int:%s = if (%s<%s)  then %s_ris else sum([pow(2,i)*(((%s_ris+%s) div pow(2,i)) mod 2)|i in 0..%s]) endif;
-                            } in \n"""%(sym,args[0],str(pow(2,size-1)),args[0],str(pow(2,size)),str(pow(2,self.max_int_bit_size-1)),args[0],
-                                      sym,sym,args[1],
-                                      sym,args[0],str(pow(2,size-1)),sym,sym,str(pow(2,self.max_int_bit_size-3)+pow(2,self.max_int_bit_size-2)+pow(2,self.max_int_bit_size-1)+pow(2,size)),size-1))
-        return sym
+        return self._walk_shift(formula,args,"ashr")
 
 
     def walk_bv_sdiv(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_bv(formula,""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_ris = (%s_args1 div %s_args2);
                              var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
@@ -1450,10 +2559,10 @@ class DagFathersMznPrinter(DagWalker):
         return sym
 
     def walk_bv_srem(self, formula, args):
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()  #(sign follows dividend)
-        self.write(""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
+        self._write_bv(formula,""" let { var int:%s_args1 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_args2 = if (%s >= %s) then (%s-%s) else %s endif;
                              var int:%s_ris = (%s_args1 mod %s_args2);
                              var int:%s = if (%s_ris < 0) then (%s_ris+%s) else %s_ris endif;
@@ -1532,46 +2641,46 @@ class DagFathersMznPrinter(DagWalker):
 
     def walk_bv_extract(self, formula, args, **kwargs):
         assert formula is not None
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         start=int(formula.bv_extract_start())
         end=int(formula.bv_extract_end())
         if start != end:
-            self.write(""" let { var int : %s_s1 = %s div %s;
+            self._write_bv(formula,""" let { var int : %s_s1 = %s div %s;
                                  var int : %s = sum([pow(2,i)*(((%s_s1 div pow(2,i)) mod 2)) | i in 0..%s]);
                             } in \n"""%(sym,args[0],str(pow(2,start)),sym,sym,str(end-start)))
 
 
         else:
-            self.write(""" let { var int : %s =  (%s div pow(2,%s)) mod 2;
-                            } in \n""" %(sym,args[0],start))
+            self._write_bv(formula,""" let { var int : %s =  (%s div %s) mod 2;
+                            } in \n""" %(sym,args[0],pow(2,start)))
         return sym
     @handles(op.BV_SEXT, op.BV_ZEXT)
     def walk_bv_extend(self, formula, args, **kwargs):
         #pylint: disable=unused-argument
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         if formula.is_bv_zext():
-            self.write(""" let { var int:%s = %s;
+            self._write_bv(formula,""" let { var int:%s = %s;
                           } in \n"""%(sym,args[0]))
         else:
             assert formula.is_bv_sext()
-            self.write(""" let { var int:%s = %s+sum([pow(2,i) | i in %s..%s ]);
+            self._write_bv(formula,""" let { var int:%s = %s+sum([pow(2,i) | i in %s..%s ]);
                            } in \n"""%(sym,args[0],formula.args()[0].bv_width(),formula.bv_width()-1))
         return sym
 
     @handles(op.BV_ROR, op.BV_ROL)
     def walk_bv_rotate(self, formula, args, **kwargs):
         #pylint: disable=unused-argument
-        sym=self._new_symbol_bv("bv_%d")
+        sym=self._new_symbol_bv(self.bv_template)
         self.openings += 1
         size=formula.bv_width()
         rotate=formula.bv_rotation_step()%size
         if formula.is_bv_ror():
-            self.write(""" let { var int:%s = (%s div %s + ((%s * %s) mod %s)) mod %s;
+            self._write_bv(formula,""" let { var int:%s = (%s div %s + ((%s * %s) mod %s)) mod %s;
                             } in \n """%(sym,args[0],str(pow(2,rotate)),args[0],str(pow(2,size-rotate)),str(pow(2,size)),str(pow(2,size))))
         else:
-            self.write(""" let { var int:%s = (%s div %s) + ((%s * %s mod %s)) mod %s;
+            self._write_bv(formula,""" let { var int:%s = (%s div %s) + ((%s * %s mod %s)) mod %s;
                            } in  \n"""%(sym,args[0],str(pow(2,size-rotate)),args[0],str(pow(2,rotate)),str(pow(2,size)),str(pow(2,size))))
 
         return sym
@@ -1623,15 +2732,225 @@ class DagFathersMznPrinter(DagWalker):
         raise NotImplementedErr("Operation that cannot be translated into MzN")
 
 
+class ConstantFolder(IdentityDagWalker):
+    """Replaces the ground subterms of a formula with their value.
+
+    The value is computed by the Simplifier, hence with exact rationals and
+    the modular semantics of the bitvectors, and the printers emit it as a
+    literal instead of declaring a var temporary for it.
+    """
+
+    def __init__(self, env=None):
+        IdentityDagWalker.__init__(self, env=env)
+        self.simplifier = self.env.simplifier
+
+    def fold(self, formula):
+        return self.walk(formula)
+
+    def _compute_node_result(self, formula, **kwargs):
+        IdentityDagWalker._compute_node_result(self, formula, **kwargs)
+        key = self._get_key(formula, **kwargs)
+        res = self.memoization[key]
+        if len(res.args())>0 and all(s.is_constant() for s in res.args()) and self._is_foldable(res):
+            folded = self.simplifier.simplify(res)
+            if folded.is_constant():
+                self.memoization[key] = folded
+
+    def _is_foldable(self, formula):
+        '''
+            Excludes the cases where the python evaluation differs from the printed mzn one
+            (division by zero, integer division of negative numbers, non integer powers)
+        '''
+        if formula.node_type() == op.DIV:
+            (l,r) = [s.constant_value() for s in formula.args()]
+            return r != 0 and (formula.args()[0].is_real_constant() or (l >= 0 and r > 0))
+        if formula.node_type() == op.POW:
+            r = formula.args()[1].constant_value()
+            return r >= 0 and r == int(r)
+        return True
+
+
+class BVNormalizer(IdentityDagWalker):
+    """Fuses the chains of structural bitvector operators.
+
+    The extracts of a concat, of an extension or of another extract are
+    moved on the arguments, the nested extensions of the same kind are
+    merged, double negations and the identity extracts and extensions are
+    removed: every removed node is a let less in the printed formula.
+    """
+
+    def __init__(self, env=None):
+        IdentityDagWalker.__init__(self, env=env)
+
+    def normalize(self, formula):
+        return self.walk(formula)
+
+    def _compute_node_result(self, formula, **kwargs):
+        IdentityDagWalker._compute_node_result(self, formula, **kwargs)
+        key = self._get_key(formula, **kwargs)
+        self.memoization[key] = self._normalize(self.memoization[key])
+
+    def _normalize(self, formula):
+        '''
+            Normal form of a node whose arguments are already normal
+        '''
+        if formula.is_bv_not() and formula.arg(0).is_bv_not():
+            return formula.arg(0).arg(0)
+        if formula.is_bv_zext() or formula.is_bv_sext():
+            x = formula.arg(0)
+            if formula.bv_extend_step() == 0:
+                return x
+            if x.is_bv_zext() or x.node_type() == formula.node_type():
+                #the extension of a zero extension adds zeros
+                extend = self.mgr.BVZExt if x.is_bv_zext() else self.mgr.BVSExt
+                return extend(x.arg(0),x.bv_extend_step()+formula.bv_extend_step())
+            return formula
+        if formula.is_bv_extract():
+            return self._extract(formula.arg(0),formula.bv_extract_start(),formula.bv_extract_end())
+        return formula
+
+    def _extract(self, x, start, end):
+        '''
+            Normal form of the bits start..end of the normal term x
+        '''
+        width = x.bv_width()
+        if start == 0 and end == width-1:
+            return x
+        if x.is_bv_extract():
+            return self._extract(x.arg(0),x.bv_extract_start()+start,x.bv_extract_start()+end)
+        if x.is_bv_concat():
+            (high,low) = x.args()
+            split = low.bv_width()
+            if end < split:
+                return self._extract(low,start,end)
+            if start >= split:
+                return self._extract(high,start-split,end-split)
+            return self.mgr.BVConcat(self._extract(high,0,end-split),self._extract(low,start,split-1))
+        if x.is_bv_zext() or x.is_bv_sext():
+            inner = x.arg(0).bv_width()
+            if end < inner:
+                return self._extract(x.arg(0),start,end)
+            if x.is_bv_zext():
+                if start >= inner:
+                    return self.mgr.BV(0,end-start+1)
+                return self._normalize(self.mgr.BVZExt(self._extract(x.arg(0),start,inner-1),end-inner+1))
+            #above the argument every bit is its sign bit
+            base = self._extract(x.arg(0),min(start,inner-1),inner-1)
+            return self._normalize(self.mgr.BVSExt(base,end-start+1-base.bv_width()))
+        return self.mgr.BVExtract(x,start,end)
+
+
+class LinearCanonicalizer(IdentityDagWalker):
+    """Rewrites the linear integer and real terms in canonical form.
+
+    Every maximal Plus/Minus/Times-by-constant term is reduced to a map from
+    its non linear subterms (variables, ite, nonlinear products...) to their
+    coefficient plus a constant, with like terms merged, and it is rebuilt
+    as a single flat sum c1*x1 + ... + cn*xn + c.
+    """
+
+    def __init__(self, env=None):
+        IdentityDagWalker.__init__(self, env=env)
+        self.forms = {}     #canonical term -> (OrderedDict atom->coefficient, constant)
+
+    def canonicalize(self, formula):
+        return self.walk(formula)
+
+    def _compute_node_result(self, formula, **kwargs):
+        IdentityDagWalker._compute_node_result(self, formula, **kwargs)
+        key = self._get_key(formula, **kwargs)
+        res = self.memoization[key]
+        if res.node_type() in (op.PLUS, op.MINUS, op.TIMES) and res.get_type() in (INT, REAL):
+            form = self._linear_form(res)
+            if form is not None:
+                canonical = self._rebuild(form, res.get_type())
+                self.forms[canonical] = form
+                self.memoization[key] = canonical
+
+    def _form(self, formula):
+        if formula in self.forms:
+            return self.forms[formula]
+        if formula.is_constant():
+            return (collections.OrderedDict(), formula.constant_value())
+        return (collections.OrderedDict([(formula, 1)]), 0)
+
+    def _combine(self, forms, factors):
+        coeffs = collections.OrderedDict()
+        const = 0
+        for (form, k) in zip(forms, factors):
+            for (atom, c) in form[0].items():
+                coeffs[atom] = coeffs.get(atom, 0) + k*c
+            const += k*form[1]
+        return (collections.OrderedDict((atom, c) for (atom, c) in coeffs.items() if c != 0), const)
+
+    def _linear_form(self, formula):
+        '''
+            Linear form of a node whose arguments are already canonical,
+            None for the products of two non constant terms
+        '''
+        forms = [self._form(s) for s in formula.args()]
+        if formula.is_plus():
+            return self._combine(forms, [1]*len(forms))
+        if formula.is_minus():
+            return self._combine(forms, [1, -1])
+        variables = [form for form in forms if form[0]]
+        if len(variables) > 1:
+            return None
+        k = 1
+        for form in forms:
+            if not form[0]:
+                k = k*form[1]
+        if not variables:
+            return (collections.OrderedDict(), k)
+        return self._combine(variables, [k])
+
+    def _constant(self, value, typeF):
+        if typeF == REAL:
+            return self.mgr.Real(value)
+        return self.mgr.Int(value)
+
+    def _rebuild(self, form, typeF):
+        coeffs, const = form
+        terms = []
+        for (atom, c) in coeffs.items():
+            if c == 1:
+                terms.append(atom)
+            else:
+                terms.append(self.mgr.Times(self._constant(c, typeF), atom))
+        if const != 0 or not terms:
+            terms.append(self._constant(const, typeF))
+        if len(terms) == 1:
+            return terms[0]
+        return self.mgr.Plus(terms)
+
+
 class MZNPrinter(object):
     """Return the MZN version of the input formula"""
-    def __init__(self,printer_selection,max_int_bit_size,environment=None):
+    def __init__(self,printer_selection,max_int_bit_size,environment=None,label_threshold=None,half_reif=False,compact=False,bv_encoding="int"):
         self.environment = environment
         self.last_counter=0
         self.max_int_bit_size=max_int_bit_size
-        self.printer_selection=printer_selection #0 simple daggify, 1 2fathers labeling
+        self.printer_selection=printer_selection #0 simple daggify, 1 2fathers labeling, 2 flat daggify
+        self.label_threshold=label_threshold     #None: 2 fathers rule, otherwise cost model used by the labeling
+        self.half_reif=half_reif                 #half reification of the boolean labels with a single polarity
+        self.compact=compact                     #minimal separators and short names for the generated variables
+        self.bv_encoding=bv_encoding             #"int": BV as integers, "bits": arrays of var bool, "sets": var sets of the one bits (DAG printers 0,2)
+        self.bit_symbols=set()                   #BV variables with a global array of bits, see get_bit_symbols
+        self.pow2_widths=set()                   #widths of the pow2_table used by the serialized formulae
+        #bits of a limb of the wide BV, None if they are plain integers (printer 1, bits encoding)
+        self.limb=limb_width(max_int_bit_size) if printer_selection!=1 and bv_encoding=="int" else None
+        #bits above which a BV is split in limbs, None if every BV is a plain integer, see select_limbs
+        self.wide_width=wide_width(max_int_bit_size) if self.limb is not None else None
+        if compact:
+            self.templates={"tmp":"t%d","bv":"b%d","label":"l%d"}
+        else:
+            self.templates={"tmp":"tmp_%d","bv":"bv_%d","label":"label_%d"}
         self.mgr = get_env()._formula_manager
         self.seen=set()
+        self.polarities={}
+        self.folder=ConstantFolder()
+        self.bv_normalizer=BVNormalizer()
+        self.linearizer=LinearCanonicalizer()
 
 
 
@@ -1641,26 +2960,76 @@ class MZNPrinter(object):
         counter = collections.Counter()
         subs = {}
         q = [formula]
+        visited = []    #subformulas in BFS order
+        names = set(quote(x.symbol_name()) for x in formula.get_free_variables())
 
         while q:
             e=q.pop(0)
             for s in e.args():
                 if s not in counter:
                     counter[s]=1
+                    visited.append(s)
                 else:
                     counter[s]+=1
-                    if s not in fathers and counter[s]==2 and ((BOOL == s.get_type() and len(s.args())>=1) or len(s.args())>=2):
-                        ns = self.mgr._create_symbol("label_"+str(cnt),s.get_type())
+                    if self.label_threshold is None and s not in fathers and counter[s]==2 and ((BOOL == s.get_type() and len(s.args())>=1) or len(s.args())>=2):
+                        while (self.templates["label"] % cnt) in names:
+                            cnt+=1
+                        ns = self.mgr._create_symbol(self.templates["label"] % cnt,s.get_type())
                         subs[s]=ns
-                        fathers[s]="label_"+str(cnt)
+                        fathers[s]=self.templates["label"] % cnt
                         cnt+=1
                 if counter[s]<2:
                     q.append(s)
+        if self.label_threshold is not None:
+            for s in visited:
+                if len(s.args())>=1 and self.labeling_cost(s,counter[s])>=self.label_threshold:
+                    while (self.templates["label"] % cnt) in names:
+                        cnt+=1
+                    ns = self.mgr._create_symbol(self.templates["label"] % cnt,s.get_type())
+                    subs[s]=ns
+                    fathers[s]=self.templates["label"] % cnt
+                    cnt+=1
         return fathers,subs,formula
 
+    def labeling_cost(self,formula,n_fathers):
+        '''
+            Size of the mzn text saved by labeling the subformula: every father after the first
+            one would print again the whole subtree
+        '''
+        return (n_fathers-1)*formula.size()
+
+    def get_polarities(self,formula):
+        '''
+            Polarity of every boolean subformula in the DAG of the formula (POSITIVE, NEGATIVE or both)
+            the root is positive, Not and the antecedent of an Implies flip the polarity,
+            every other non connective context (Iff, ite conditions, theory atoms) gives both
+        '''
+        polarities = collections.defaultdict(int)
+        polarities[formula] = POSITIVE
+        stack = [formula]
+        while stack:
+            e = stack.pop()
+            pol = polarities[e]
+            flipped = ((pol & POSITIVE) and NEGATIVE) | ((pol & NEGATIVE) and POSITIVE)
+            if e.is_and() or e.is_or():
+                children = [(s,pol) for s in e.args()]
+            elif e.is_not():
+                children = [(e.arg(0),flipped)]
+            elif e.is_implies():
+                children = [(e.arg(0),flipped),(e.arg(1),pol)]
+            elif e.is_ite() and BOOL == e.get_type():
+                children = [(e.arg(0),POSITIVE|NEGATIVE),(e.arg(1),pol),(e.arg(2),pol)]
+            else:
+                children = [(s,POSITIVE|NEGATIVE) for s in e.args()]
+            for (s,s_pol) in children:
+                if polarities[s] | s_pol != polarities[s]:
+                    polarities[s] |= s_pol
+                    stack.append(s)
+        return polarities
+
     def walk_print(self,formula,p,dict_f,str_let_list):
         for subs_formula in formula.args():
-            if subs_formula not in self.seen and ((BOOL == subs_formula.get_type() and len(subs_formula.args())>=1) or len(subs_formula.args())>=2):
+            if subs_formula not in self.seen and len(subs_formula.args())>=1:
                 self.walk_print(subs_formula,p,dict_f,str_let_list)
         if formula not in self.seen and formula in dict_f:
             label=dict_f[formula]
@@ -1669,32 +3038,131 @@ class MZNPrinter(object):
             p.printer(formula)
             formula_type = str(formula.get_type()).lower().replace("real","float")
             formula_type=re.sub(r"bv{[0-9]+}","int",formula_type)
-            str_let_list.append("   var %s : %s =  %s;\n"%(formula_type,label,p.stream.getvalue()))
+            polarity = self.polarities.get(formula,POSITIVE|NEGATIVE)
+            if polarity == POSITIVE:
+                str_let_list.append("   var bool : %s;\n   constraint %s -> (%s);\n"%(label,label,p.stream.getvalue()))
+            elif polarity == NEGATIVE:
+                str_let_list.append("   var bool : %s;\n   constraint (%s) -> %s;\n"%(label,p.stream.getvalue(),label))
+            else:
+                str_let_list.append("   var %s : %s =  %s;\n"%(formula_type,label,p.stream.getvalue()))
             p.memoization[formula]=label
             p.stream.close()
             self.last_counter+=1
         self.seen.add(formula)
 
 
+    def get_bit_symbols(self,formulas):
+        '''
+            Names of the BV variables read bit by bit by the integer encoding of the DAG printers,
+            they are decomposed once in a global array[0..w-1] of var 0..1 channelled with the variable
+        '''
+        res=set()
+        if self.printer_selection==1 or self.bv_encoding!="int":
+            return res
+        seen=set()
+        stack=list(formulas)
+        while stack:
+            f=stack.pop()
+            if f in seen:
+                continue
+            seen.add(f)
+            if f.node_type() in BIT_ACCESS_OPS and bv_constant_operand(f) is None:
+                res.update(quote(s.symbol_name()) for s in f.args() if s.is_symbol() and not self.wide_bv(s.symbol_type()))
+            stack.extend(f.args())
+        return res
+
+    def wide_bv(self,typeF):
+        '''
+            True if the values of the type are split in limbs, see DagLimbsMznPrinter
+        '''
+        return self.wide_width is not None and typeF.is_bv_type() and typeF.width>self.wide_width
+
+    def select_limbs(self,formulas):
+        '''
+            Splits the wide BV in limbs only if DagLimbsMznPrinter can translate all the formulas
+            of the section, otherwise every BV keeps the plain integer encoding
+        '''
+        self.wide_width=None
+        if self.limb is None:
+            return
+        for f in formulas:
+            unsupported=limbs_unsupported(f,self.max_int_bit_size)
+            if unsupported is not None:
+                print("%s on a wide bitvector, the bitvectors are not split in limbs"%op.op_to_str(unsupported.node_type()))
+                return
+        self.wide_width=wide_width(self.max_int_bit_size)
+
+    def has_wide_bv(self,formula):
+        seen=set()
+        stack=[formula]
+        while stack:
+            f=stack.pop()
+            if f in seen:
+                continue
+            seen.add(f)
+            if self.wide_bv(f.get_type()) or (f.args() and self.wide_bv(f.arg(0).get_type())):
+                return True
+            stack.extend(f.args())
+        return False
+
+    def get_clause(self,formula):
+        '''
+            Positive and negative literals of a disjunction of boolean variables and
+            negated boolean variables, None if the formula is not a clause
+        '''
+        if not formula.is_or():
+            return None
+        pos,neg=[],[]
+        for s in formula.args():
+            if s.is_symbol(BOOL):
+                pos.append(quote(s.symbol_name()))
+            elif s.is_not() and s.arg(0).is_symbol(BOOL):
+                neg.append(quote(s.arg(0).symbol_name()))
+            else:
+                return None
+        return pos,neg
+
     def serialize(self,formula,daggify=True,output_file=None):
-        if self.printer_selection==0:
+        formula=self.linearizer.canonicalize(self.folder.fold(self.bv_normalizer.normalize(formula)))
+        clause=self.get_clause(formula)
+        if clause is not None:
+            #native clause, no flattening needed
+            sep="," if self.compact else ", "
+            pos,neg=clause
+            if output_file is None:
+                return "exists([%s])" % sep.join(pos+["not(%s)" % n for n in neg])
+            output_file.write("constraint bool_clause([%s],[%s]);\n" % (sep.join(pos),sep.join(neg)))
+            return
+        if self.printer_selection==0 or self.printer_selection==2:
             buf = cStringIO()
-            if daggify:
-                p = DagMznPrinter(self.max_int_bit_size,buf)
+            if daggify and self.bv_encoding=="bits":
+                p = DagBitsMznPrinter(self.max_int_bit_size,buf,template=self.templates["tmp"],flat_let=(self.printer_selection==2),tables=self.pow2_widths)
+            elif daggify and self.bv_encoding=="sets":
+                p = DagSetsMznPrinter(self.max_int_bit_size,buf,template=self.templates["tmp"],flat_let=(self.printer_selection==2),tables=self.pow2_widths)
+            elif self.wide_width is not None and self.has_wide_bv(formula):
+                #the tree printer has no limbs encoding
+                p = DagLimbsMznPrinter(self.max_int_bit_size,buf,template=self.templates["tmp"],flat_let=(self.printer_selection==2),bit_symbols=self.bit_symbols,tables=self.pow2_widths)
+            elif daggify:
+                p = DagMznPrinter(self.max_int_bit_size,buf,template=self.templates["tmp"],flat_let=(self.printer_selection==2),bit_symbols=self.bit_symbols,tables=self.pow2_widths)
             else:
-                p = TreeMznPrinter(self.max_int_bit_size,buf)
+                p = TreeMznPrinter(self.max_int_bit_size,buf,template=self.templates["bv"],tables=self.pow2_widths)
             p.printer(formula)
             res_f=buf.getvalue()
         else:
             print("starting 2 fathers print")
             dict_f,subs,formula = self.get_fathers(formula)
+            #the let constraints of the half reified labels are sound only in the root context
+            if self.half_reif and output_file is not None:
+                self.polarities = self.get_polarities(formula)
+            else:
+                self.polarities = {}
             buf = cStringIO()
             str_let=""
             str_let_list=[]
             self.seen.clear()
             self.last_counter=0
             if dict_f:
-                p = DagFathersMznPrinter(self.max_int_bit_size,buf,{},boolean_invalidate=False)
+                p = DagFathersMznPrinter(self.max_int_bit_size,buf,{},boolean_invalidate=False,bv_template=self.templates["bv"],tables=self.pow2_widths)
                 for sub_f in dict_f.keys():
                     if sub_f not in self.seen:
                         self.walk_print(sub_f,p,dict_f,str_let_list)
@@ -1705,7 +3173,7 @@ class MZNPrinter(object):
                 str_let = "let {\n"+"".join(str_let_list)+"} in\n"
                 substituter = MGSubstituter(env=get_env())
                 formula=substituter.substitute(formula,subs)
-            p = TreeMznPrinter(self.max_int_bit_size,buf)
+            p = TreeMznPrinter(self.max_int_bit_size,buf,template=self.templates["bv"],tables=self.pow2_widths)
             p.printer(formula)
             res=buf.getvalue()
             buf.close()
@@ -1715,6 +3183,8 @@ class MZNPrinter(object):
                 res_f = res
             else:
                 res_f=str_let+"\n"+res
+        if self.compact:
+            res_f=compact_mzn(res_f)
         if output_file is None:
             return res_f
         else:
@@ -0,0 +1,67 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+from six.moves import cStringIO
+from pyomt.environment import reset_env
+from pyomt.printers_mzn import MZNPrinter
+from omt2mzn import Omt2Mzn
+
+
+def translate(smt2, **options):
+    '''
+        Translates the smt2 script with the given Omt2Mzn options, returns a dictionary
+        output file name -> content (the input is out.smt2, the output path out.mzn)
+    '''
+    tmp = tempfile.mkdtemp()
+    stdout = sys.stdout
+    try:
+        with open(os.path.join(tmp, "out.smt2"), "w") as f:
+            f.write(smt2)
+        reset_env()
+        args = dict(flag_bigand=False, max_int_bit_size=32, printer_opt=0, asoft_var_type="Real", float_domains=0)
+        args.update(options)
+        sys.stdout = cStringIO()     #progress messages
+        Omt2Mzn(os.path.join(tmp, "out.smt2"), os.path.join(tmp, "out.mzn"), **args).startParsing()
+        sys.stdout = stdout
+        res = {}
+        for name in os.listdir(tmp):
+            if name != "out.smt2":
+                with open(os.path.join(tmp, name)) as f:
+                    res[name] = f.read()
+        return res
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(tmp)
+
+
+def translate_serialized(smt2, **options):
+    '''
+        Translates the smt2 script as translate, returns also the list of the formulas
+        (as strings) passed to MZNPrinter.serialize
+    '''
+    serialized = []
+    serialize = MZNPrinter.serialize
+    def counting(printer, formula, *args, **kwargs):
+        serialized.append(str(formula))
+        return serialize(printer, formula, *args, **kwargs)
+    MZNPrinter.serialize = counting
+    try:
+        return translate(smt2, **options), serialized
+    finally:
+        MZNPrinter.serialize = serialize
@@ -0,0 +1,141 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from tests.helpers import translate
+
+ADD = """(declare-fun v () (_ BitVec 4))
+(declare-fun w () (_ BitVec 4))
+(assert (bvult (bvadd v w) #x3))
+(check-sat)
+"""
+
+
+class TestBitsEncoding(unittest.TestCase):
+
+    def test_bits_declared_and_channelled(self):
+        model = translate(ADD, bv_encoding="bits")["out_1s.mzn"]
+        self.assertIn("var 0..15 : v;\narray[0..3] of var bool : v_bits;\n", model)
+        self.assertIn("constraint v = sum(i in 0..3)(bool2int(v_bits[i])*pow(2,i));", model)
+
+    def test_ripple_carry_adder(self):
+        model = translate(ADD, bv_encoding="bits")["out_1s.mzn"]
+        self.assertIn("var bool : tmp_0_c1 = (v_bits[0] /\\ w_bits[0]);", model)
+        self.assertIn("(v_bits[3] xor w_bits[3] xor tmp_0_c3)", model)
+
+
+BV8 = """(declare-fun x () (_ BitVec 8))
+(declare-fun y () (_ BitVec 8))
+(assert %s)
+(check-sat)
+"""
+
+
+class TestSharedBits(unittest.TestCase):
+
+    def test_one_decomposition_per_variable(self):
+        model = translate(BV8 % "(and (= (bvand x y) #x05) (= (bvor x y) #x07))")["out_1s.mzn"]
+        self.assertEqual(model.count("array[0..7] of var 0..1 : x_bits;"), 1)
+        self.assertIn("constraint x = sum(i in 0..7)(pow(2,i)*x_bits[i]);", model)
+        self.assertIn("sum(i in 0..7)(pow(2,i)*x_bits[i]*y_bits[i])", model)
+
+
+class TestBVRanges(unittest.TestCase):
+
+    def test_temporaries_get_width_ranges(self):
+        model = translate(BV8 % "(bvult (bvadd x y) #x03)")["out_1s.mzn"]
+        self.assertIn("var 0..255 : tmp_0 = (x+y) mod 256;", model)
+        self.assertNotIn("var int", model)
+
+
+class TestConstantOperands(unittest.TestCase):
+
+    def test_mask_becomes_mod(self):
+        model = translate(BV8 % "(= (bvand x #x0f) #x05)")["out_1s.mzn"]
+        self.assertIn("var 0..255 : tmp_0 = (x mod 16);", model)
+        self.assertNotIn("x_bits", model)
+
+
+WIDE = """(declare-fun a () (_ BitVec %(w)d))
+(declare-fun b () (_ BitVec %(w)d))
+(assert (bvult (%(op)s a b) #x%(c)s))
+(minimize a)
+(check-sat)
+"""
+
+
+class TestLimbs(unittest.TestCase):
+
+    def test_half_width_is_an_integer(self):
+        files = translate(WIDE % {"w":16, "op":"bvudiv", "c":"0010"})
+        self.assertIn("var 0..65535 : a;", files["out_1_base.mzn"])
+        self.assertIn("var 0..65535 : tmp_0 = (a div b);", files["out_1_base.mzn"])
+
+    def test_wide_bv_split_in_limbs(self):
+        files = translate(WIDE % {"w":32, "op":"bvadd", "c":"00000010"})
+        self.assertIn("array[0..2] of var 0..32767 : a_limbs;\nconstraint a_limbs[2] <= 3;", files["out_1_base.mzn"])
+        self.assertIn("var 0..1 : tmp_0_c1 = (a_limbs[0] + b_limbs[0]) div 32768;", files["out_1_base.mzn"])
+        self.assertIn("show(sum(k in 0..2)(pow(2,15*k)*opt_var_0_limbs[k]))", files["out_1_b1.mzn"])
+
+    def test_unsupported_operator_keeps_integers(self):
+        files = translate(WIDE % {"w":32, "op":"bvudiv", "c":"00000010"})
+        self.assertIn("var 0..4294967295 : a;", files["out_1_base.mzn"])
+        self.assertIn("(a div b)", files["out_1_base.mzn"])
+        self.assertNotIn("_limbs", files["out_1_base.mzn"] + files["out_1_b1.mzn"])
+
+
+class TestSignedViews(unittest.TestCase):
+
+    def test_signed_comparison(self):
+        model = translate(BV8 % "(bvslt x y)")["out_1s.mzn"]
+        self.assertIn("var -128..127 : tmp_1 = (x - 256*bool2int(x >= 128));", model)
+        self.assertNotIn("x_bits", model)
+
+    def test_offset_comparison_of_the_tree_printer(self):
+        model = translate(BV8 % "(bvslt x y)", printer_opt=1)["out_1s.mzn"]
+        self.assertIn("(((x + 128) mod 256) < ((y + 128) mod 256))", model)
+
+    def test_signed_objective(self):
+        files = translate(BV8.replace("(check-sat)", "(maximize x :signed)\n(check-sat)") % "(bvslt x #x10)")
+        self.assertIn("solve maximize (opt_var_0 - 256*bool2int(opt_var_0 >= 128));", files["out_1_b1.mzn"])
+
+
+class TestPow2Tables(unittest.TestCase):
+
+    def test_variable_shift_indexes_the_table(self):
+        model = translate(BV8 % "(= (bvshl x y) #x04)")["out_1s.mzn"]
+        self.assertIn("var 0..255 : tmp_0 = (x * POW2_8[min(y,8)]) mod 256;", model)
+        self.assertEqual(model.count("array[0..8] of int : POW2_8 = array1d(0..8,[1,2,4,8,16,32,64,128,256]);"), 1)
+
+    def test_constant_shift_has_no_table(self):
+        model = translate(BV8 % "(= (bvshl x #x02) #x04)")["out_1s.mzn"]
+        self.assertNotIn("POW2_", model)
+
+
+class TestSetsEncoding(unittest.TestCase):
+
+    def test_sets_declared_and_channelled(self):
+        model = translate(BV8 % "(= (bvand x y) #x05)", bv_encoding="sets")["out_1s.mzn"]
+        self.assertIn("var set of 0..7 : x_set;", model)
+        self.assertIn("constraint x = sum(i in 0..7)(bool2int(i in x_set)*pow(2,i));", model)
+
+    def test_bitwise_operators_on_sets(self):
+        model = translate(BV8 % "(= (bvand x y) #x05)", bv_encoding="sets")["out_1s.mzn"]
+        self.assertIn("var set of 0..7 : tmp_0 = x_set intersect y_set;", model)
+        self.assertIn("(tmp_0 = {0,2})", model)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from fractions import Fraction
+from pyomt.environment import reset_env
+from pyomt.typing import INT, REAL, BVType
+from pyomt.domains import DomainAnalyzer, IntervalWalker
+from tests.helpers import translate
+
+
+class TestDomainAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.mgr = reset_env().formula_manager
+        self.x = self.mgr.Symbol("x", INT)
+        self.y = self.mgr.Symbol("y", INT)
+
+    def test_bounds_propagate(self):
+        m = self.mgr
+        res = DomainAnalyzer().analyze([m.LE(self.x, m.Int(5)), m.LT(m.Int(-2), self.x), m.Equals(self.y, m.Plus(self.x, m.Int(1)))])
+        self.assertEqual(res, {"x": (-1, 5), "y": (0, 6)})
+
+    def test_negated_bound(self):
+        m = self.mgr
+        self.assertEqual(DomainAnalyzer().analyze([m.Not(m.LE(self.x, m.Int(5)))]), {"x": (6, None)})
+
+    def test_strict_real_bound(self):
+        m = self.mgr
+        r = m.Symbol("r", REAL)
+        self.assertEqual(DomainAnalyzer().analyze([m.LT(r, m.Real(2))]), {"r": (None, Fraction(2))})
+
+    def test_bv_bound(self):
+        m = self.mgr
+        b = m.Symbol("b", BVType(8))
+        self.assertEqual(DomainAnalyzer().analyze([m.BVULT(b, m.BV(10, 8))]), {"b": (None, 9)})
+
+    def test_disjunction_is_skipped(self):
+        m = self.mgr
+        self.assertEqual(DomainAnalyzer().analyze([m.Or(m.LE(self.x, m.Int(5)), m.LE(self.y, m.Int(1)))]), {})
+
+    def test_interval_of_bv_term(self):
+        m = self.mgr
+        b = m.Symbol("b", BVType(8))
+        walker = IntervalWalker({"b": (0, 9)})
+        self.assertEqual(walker.walk(m.BVConcat(m.BV(1, 4), m.BVExtract(b, 0, 3))), (16, 31))
+        self.assertEqual(walker.walk(m.BVURem(b, m.BV(4, 8))), (0, 3))
+
+    def test_translation(self):
+        model = translate("""(declare-fun x () Int)
+(declare-fun b () (_ BitVec 8))
+(assert (< x 2))
+(assert (> x (- 5)))
+(assert (bvult b #x10))
+(check-sat)
+""")["out_1s.mzn"]
+        self.assertIn("var -4..1:x;", model)
+        self.assertIn("var 0..15 : b;", model)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from tests.helpers import translate, translate_serialized
+
+BOX = """(declare-fun x () Int)
+(declare-fun y () Int)
+(assert (< x y))
+(assert (< y 10))
+(minimize x :lower 2)
+(maximize y)
+(minimize (+ x y))
+(check-sat)
+"""
+
+
+class TestBox(unittest.TestCase):
+
+    def test_assertions_serialized_once(self):
+        (files, serialized) = translate_serialized(BOX)
+        self.assertEqual(serialized.count("(x < y)"), 1)
+        self.assertEqual(sorted(files), ["out_1_b1.mzn", "out_1_b2.mzn", "out_1_b3.mzn", "out_1_base.mzn"])
+        self.assertIn("constraint (((2 <= opt_var_0)));", files["out_1_b1.mzn"])
+        self.assertIn("solve maximize opt_var_1;", files["out_1_b2.mzn"])
+
+
+class TestBaseFile(unittest.TestCase):
+
+    def test_objective_files_include_the_base(self):
+        files = translate(BOX)
+        for k in (1, 2, 3):
+            self.assertTrue(files["out_1_b%d.mzn" % k].startswith('include "out_1_base.mzn";\n'))
+            self.assertNotIn("var int:x;", files["out_1_b%d.mzn" % k])
+        self.assertEqual(files["out_1_base.mzn"].count("var int:x;"), 1)
+        self.assertIn("constraint (((opt_var_2 = (x + y))));", files["out_1_base.mzn"])
+
+    def test_bounds_stay_in_their_file(self):
+        files = translate(BOX)
+        self.assertNotIn("2 <= opt_var_0", files["out_1_base.mzn"])
+        self.assertNotIn("2 <= opt_var_0", files["out_1_b2.mzn"])
+
+
+class TestBoxMinisearch(unittest.TestCase):
+
+    def test_single_model(self):
+        files = translate(BOX, box_minisearch=True)
+        self.assertEqual(list(files), ["out_1b.mzn"])
+        model = files["out_1b.mzn"]
+        self.assertTrue(model.startswith('include "minisearch.mzn";\n'))
+        self.assertIn('scope( post(((2 <= opt_var_0))) /\\ minimize_box(opt_var_0,opt_var_0,"opt_var_0") )', model)
+        self.assertIn('scope( minimize_box(-opt_var_1,opt_var_1,"opt_var_1") )', model)
+        self.assertEqual(model.count("function ann : minimize_box(var int : obj"), 1)
+
+
+STACK = """(declare-fun x () (_ BitVec 8))
+(declare-fun y () (_ BitVec 8))
+(assert (= (bvshl x y) #x04))
+(push 1)
+(assert (bvult x #x10))
+(check-sat)
+(pop 1)
+(push 1)
+(assert (bvult y #x03))
+(check-sat)
+(pop 1)
+"""
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def test_frame_assertions_serialized_once(self):
+        (files, serialized) = translate_serialized(STACK)
+        self.assertEqual(serialized.count("((x << y) = 4_8)"), 1)
+        self.assertEqual(sorted(files), ["out_1s.mzn", "out_2s.mzn"])
+
+    def test_cached_sections_declare_their_tables(self):
+        files = translate(STACK)
+        for name in ("out_1s.mzn", "out_2s.mzn"):
+            self.assertIn("(x * POW2_8[min(y,8)]) mod 256", files[name])
+            self.assertIn("array[0..8] of int : POW2_8", files[name])
+        self.assertIn("(x<16)", files["out_1s.mzn"])
+        self.assertNotIn("(x<16)", files["out_2s.mzn"])
+
+    def test_limbs_change_between_sections(self):
+        files = translate("""(declare-fun x () (_ BitVec 32))
+(declare-fun y () (_ BitVec 32))
+(assert (= (bvadd x y) #x00000001))
+(check-sat)
+(push 1)
+(assert (= (bvudiv x y) #x00000002))
+(check-sat)
+(pop 1)
+""")
+        self.assertIn("x_limbs", files["out_1s.mzn"])
+        self.assertIn("var 0..4294967295 : x;", files["out_2s.mzn"])
+        self.assertNotIn("_limbs", files["out_2s.mzn"])
+
+
+FRAMES = """(declare-fun x () Int)
+(declare-fun y () Int)
+(assert (< x y))
+(assert (< y 10))
+(push 1)
+(assert (< x 3))
+(check-sat)
+(pop 1)
+(check-sat)
+"""
+
+
+class TestActivation(unittest.TestCase):
+
+    def test_guarded_frames(self):
+        files = translate(FRAMES, activation=True)
+        self.assertEqual(sorted(files), ["out.mzn", "out_1.dzn", "out_2.dzn"])
+        model = files["out.mzn"]
+        self.assertIn("bool : frame_1;", model)
+        self.assertIn("constraint (let { var bool : tmp_0 = ( x < y); } in\n tmp_0);", model)
+        self.assertIn("constraint frame_1 -> (let { var bool : tmp_0 = ( x < 3); } in\n tmp_0);", model)
+        self.assertEqual(files["out_1.dzn"], "frame_1 = true;\n")
+        self.assertEqual(files["out_2.dzn"], "frame_1 = false;\n")
+
+    def test_big_and(self):
+        files = translate(FRAMES, activation=True, flag_bigand=True)
+        self.assertIn("let { var bool : tmp_2 = ( tmp_1 /\\ tmp_0); } in", files["out.mzn"])
+        self.assertEqual(files["out_2.dzn"], "frame_1 = false;\n")
+
+    def test_big_and_without_base_assertions(self):
+        files = translate("(declare-fun x () Int)\n" + FRAMES.split("\n", 4)[4], activation=True, flag_bigand=True)
+        self.assertIn("constraint frame_1 -> (", files["out.mzn"])
+        self.assertEqual(files["out_1.dzn"], "frame_1 = true;\n")
+
+    def test_fallback_writes_no_model(self):
+        files = translate(FRAMES.replace("(push 1)", "(push 1)\n(minimize x)"), activation=True)
+        self.assertNotIn("out.mzn", files)
+        self.assertEqual(sorted(files), ["out_1_b1.mzn", "out_1_base.mzn", "out_2s.mzn"])
+
+    def test_assertions_after_a_check_sat(self):
+        files = translate("(declare-fun x () Int)(assert (< x 10))(check-sat)(assert (> x 20))(check-sat)", activation=True)
+        self.assertIn("var int:x;", files["out.mzn"])
+        self.assertIn("constraint frame_1 -> (let { var bool : tmp_0 = ( 20 < x); } in\n tmp_0);", files["out.mzn"])
+        self.assertEqual(files["out_1.dzn"], "frame_1 = false;\n")
+        self.assertEqual(files["out_2.dzn"], "frame_1 = true;\n")
+
+    def test_domains_from_the_first_frame(self):
+        files = translate("""(declare-fun x () Int)
+(assert (< x 10))
+(assert (> x (- 5)))
+(push 1)
+(assert (> x 2))
+(check-sat)
+(assert (> x 5))
+(check-sat)
+(pop 1)
+(check-sat)
+""", activation=True)
+        self.assertIn("var -4..9:x;", files["out.mzn"])
+        self.assertIn("constraint frame_2 -> (let { var bool : tmp_0 = ( 5 < x); } in\n tmp_0);", files["out.mzn"])
+        self.assertEqual(files["out_1.dzn"], "frame_1 = true;\nframe_2 = false;\n")
+        self.assertEqual(files["out_2.dzn"], "frame_1 = true;\nframe_2 = true;\n")
+        self.assertEqual(files["out_3.dzn"], "frame_1 = false;\nframe_2 = false;\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
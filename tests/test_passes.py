@@ -0,0 +1,136 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from fractions import Fraction
+from pyomt.environment import reset_env
+from pyomt.typing import INT, REAL, BVType
+from pyomt.printers_mzn import ConstantFolder, LinearCanonicalizer, BVNormalizer
+from tests.helpers import translate
+
+
+class TestConstantFolder(unittest.TestCase):
+
+    def setUp(self):
+        self.mgr = reset_env().formula_manager
+        self.x = self.mgr.Symbol("x", INT)
+
+    def test_ground_subterm(self):
+        m = self.mgr
+        res = ConstantFolder().fold(m.LE(self.x, m.Plus(m.Int(2), m.Times(m.Int(3), m.Int(4)))))
+        self.assertEqual(res, m.LE(self.x, m.Int(14)))
+
+    def test_real_division(self):
+        m = self.mgr
+        r = m.Symbol("r", REAL)
+        res = ConstantFolder().fold(m.Equals(r, m.Div(m.Real(-3), m.Real(2))))
+        self.assertEqual(res.arg(1).constant_value(), Fraction(-3, 2))
+
+    def test_bv_wraps_around(self):
+        m = self.mgr
+        b = m.Symbol("b", BVType(8))
+        res = ConstantFolder().fold(m.BVULT(b, m.BVAdd(m.BV(250, 8), m.BV(10, 8))))
+        self.assertEqual(res, m.BVULT(b, m.BV(4, 8)))
+
+    def test_symbols_are_kept(self):
+        m = self.mgr
+        f = m.LE(m.Plus(self.x, m.Int(1)), m.Int(3))
+        self.assertEqual(ConstantFolder().fold(f), f)
+
+    def test_translation(self):
+        model = translate("(declare-fun x () Int)\n(assert (< x (+ 2 (* 3 4))))\n(check-sat)\n")["out_1s.mzn"]
+        self.assertIn("( x < 14)", model)
+
+
+class TestLinearCanonicalizer(unittest.TestCase):
+
+    def setUp(self):
+        self.mgr = reset_env().formula_manager
+        self.x = self.mgr.Symbol("x", INT)
+        self.y = self.mgr.Symbol("y", INT)
+
+    def test_like_terms_merged(self):
+        m = self.mgr
+        res = LinearCanonicalizer().canonicalize(m.LE(m.Plus(self.x, m.Times(m.Int(2), m.Plus(self.x, self.y)), m.Int(1)), m.Int(5)))
+        self.assertEqual(str(res), "(((3 * x) + (2 * y) + 1) <= 5)")
+
+    def test_cancellation(self):
+        m = self.mgr
+        res = LinearCanonicalizer().canonicalize(m.LE(m.Minus(m.Plus(self.x, self.y), m.Plus(self.y, self.x)), m.Int(5)))
+        self.assertEqual(res, m.LE(m.Int(0), m.Int(5)))
+
+    def test_nonlinear_product_is_an_atom(self):
+        m = self.mgr
+        xy = m.Times(self.x, self.y)
+        res = LinearCanonicalizer().canonicalize(m.LE(m.Plus(xy, xy), m.Int(5)))
+        self.assertEqual(str(res), "((2 * (x * y)) <= 5)")
+
+    def test_translation(self):
+        model = translate("""(declare-fun x () Int)
+(declare-fun y () Int)
+(assert (<= (+ x (* 2 (+ x y)) (- y)) 5))
+(check-sat)
+""")["out_1s.mzn"]
+        self.assertIn("(3 * x) + y", model)
+
+
+class TestBVNormalizer(unittest.TestCase):
+
+    def setUp(self):
+        self.mgr = reset_env().formula_manager
+        self.a = self.mgr.Symbol("a", BVType(4))
+        self.b = self.mgr.Symbol("b", BVType(4))
+
+    def test_double_negation(self):
+        m = self.mgr
+        self.assertEqual(BVNormalizer().normalize(m.BVNot(m.BVNot(self.a))), self.a)
+
+    def test_extract_of_concat(self):
+        m = self.mgr
+        ab = m.BVConcat(self.a, self.b)
+        self.assertEqual(BVNormalizer().normalize(m.BVExtract(ab, 0, 3)), self.b)
+        self.assertEqual(BVNormalizer().normalize(m.BVExtract(ab, 4, 7)), self.a)
+        res = BVNormalizer().normalize(m.BVExtract(ab, 2, 5))
+        self.assertEqual(res, m.BVConcat(m.BVExtract(self.a, 0, 1), m.BVExtract(self.b, 2, 3)))
+
+    def test_nested_extracts(self):
+        m = self.mgr
+        res = BVNormalizer().normalize(m.BVExtract(m.BVExtract(self.a, 1, 3), 1, 2))
+        self.assertEqual(res, m.BVExtract(self.a, 2, 3))
+
+    def test_extract_of_extensions(self):
+        m = self.mgr
+        self.assertEqual(BVNormalizer().normalize(m.BVExtract(m.BVZExt(self.a, 4), 0, 3)), self.a)
+        self.assertEqual(BVNormalizer().normalize(m.BVExtract(m.BVZExt(self.a, 4), 4, 7)), m.BV(0, 4))
+        res = BVNormalizer().normalize(m.BVExtract(m.BVSExt(self.a, 4), 3, 7))
+        self.assertEqual(res, m.BVSExt(m.BVExtract(self.a, 3, 3), 4))
+
+    def test_identities_and_nested_extensions(self):
+        m = self.mgr
+        self.assertEqual(BVNormalizer().normalize(m.BVExtract(self.a, 0, 3)), self.a)
+        self.assertEqual(BVNormalizer().normalize(m.BVZExt(self.a, 0)), self.a)
+        self.assertEqual(BVNormalizer().normalize(m.BVSExt(m.BVZExt(self.a, 2), 2)), m.BVZExt(self.a, 4))
+
+    def test_translation(self):
+        model = translate("""(declare-fun a () (_ BitVec 4))
+(declare-fun b () (_ BitVec 4))
+(assert (= ((_ extract 3 0) (concat a b)) (bvnot (bvnot a))))
+(check-sat)
+""")["out_1s.mzn"]
+        self.assertIn("( b = a)", model)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from six.moves import cStringIO
+from pyomt.environment import reset_env
+from pyomt.printers_fzn import FZNPrinter
+from pyomt.typing import INT
+from tests.helpers import translate
+
+
+class TestFZNPrinter(unittest.TestCase):
+
+    def setUp(self):
+        self.mgr = reset_env().formula_manager
+        self.x = self.mgr.Symbol("x", INT)
+        self.y = self.mgr.Symbol("y", INT)
+
+    def _fzn(self, printer):
+        buf = cStringIO()
+        printer.write(buf, "solve satisfy;\n")
+        return buf.getvalue()
+
+    def test_linear_relation(self):
+        printer = FZNPrinter()
+        printer.declare_symbol("x", INT)
+        printer.declare_symbol("y", INT)
+        printer.assert_formula(self.mgr.LE(self.mgr.Plus(self.x, self.mgr.Times(self.mgr.Int(2), self.y)), self.mgr.Int(4)))
+        self.assertIn("constraint int_lin_le([1,2],[x,y],4);", self._fzn(printer))
+
+    def test_ground_relation(self):
+        #the constant relation is a literal, no reified variable is introduced
+        printer = FZNPrinter()
+        printer.declare_symbol("y", INT)
+        printer.assert_formula(self.mgr.Or(self.mgr.LT(self.mgr.Int(3), self.y), self.mgr.LT(self.mgr.Int(3), self.mgr.Int(1))))
+        res = self._fzn(printer)
+        self.assertEqual(res.count("var bool: X_INTRODUCED_"), 1)
+        self.assertIn("constraint bool_clause([X_INTRODUCED_0_,false],[]);", res)
+
+    def test_quoted_symbol(self):
+        printer = FZNPrinter()
+        printer.declare_symbol("a b", INT)
+        printer.assert_formula(self.mgr.LE(self.mgr.Symbol("a b", INT), self.mgr.Int(1)))
+        res = self._fzn(printer)
+        self.assertIn("var int: 'a b' :: output_var;", res)
+        self.assertIn("constraint int_lin_le([1],['a b'],1);", res)
+
+    def test_translation(self):
+        files = translate("""(declare-fun |a b| () Int)
+(declare-fun y () Int)
+(assert (< |a b| 2))
+(assert (or (> y 3) (< 3 1)))
+(minimize y)
+(check-sat)
+""", fzn=True)
+        self.assertEqual(sorted(files), ["out_1_b1.fzn"])
+        self.assertIn("var int: 'a b' :: output_var;", files["out_1_b1.fzn"])
+        self.assertIn("solve minimize opt_var_0;", files["out_1_b1.fzn"])
+
+    def test_quoted_objective(self):
+        files = translate("""(declare-fun x () Int)
+(assert (< x 3))
+(minimize x :id |my obj|)
+(check-sat)
+""", fzn=True)
+        self.assertIn("var int: 'my obj' :: output_var;", files["out_1_b1.fzn"])
+        self.assertIn("solve minimize 'my obj';", files["out_1_b1.fzn"])
+
+
+if __name__ == "__main__":
+    unittest.main()
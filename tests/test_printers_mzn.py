@@ -0,0 +1,156 @@
+#
+#   Copyright 2019 Franceso Contaldo
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import unittest
+from tests.helpers import translate
+
+SHARED = """(declare-fun x () Int)
+(declare-fun y () Int)
+(assert (or (> (* x y) 3) (and (< x 2) (> (* x y) 1))))
+(check-sat)
+"""
+
+
+class TestFlatLet(unittest.TestCase):
+
+    def test_single_let_block(self):
+        model = translate(SHARED, printer_opt=2)["out_1s.mzn"]
+        self.assertEqual(model.count("let {"), 1)
+        #the product is shared by the two comparisons
+        self.assertEqual(model.count("( x * y)"), 1)
+        self.assertIn("var bool : tmp_5 = ( tmp_4 \\/ tmp_3);", model)
+
+    def test_nested_lets(self):
+        model = translate(SHARED, printer_opt=0)["out_1s.mzn"]
+        self.assertGreater(model.count("let {"), 1)
+
+
+LABELED = """(declare-fun x () Int)
+(declare-fun y () Int)
+(declare-fun p () Bool)
+(declare-fun q () Bool)
+(assert (or (and p (or (< x 2) (> y 1))) (and q (or (< x 2) (> y 1)))))
+(check-sat)
+"""
+
+
+class TestLabelThreshold(unittest.TestCase):
+
+    def test_two_fathers_rule(self):
+        model = translate(LABELED, printer_opt=1)["out_1s.mzn"]
+        self.assertIn("var bool : label_0 =  ((x < 2) \\/ (1 < y));", model)
+        self.assertIn("(p /\\ label_0) \\/ (q /\\ label_0)", model)
+
+    def test_low_threshold(self):
+        model = translate(LABELED, printer_opt=1, label_threshold=1)["out_1s.mzn"]
+        self.assertIn("label_0", model)
+
+    def test_high_threshold(self):
+        #(2 fathers - 1) * size of the subformula is below the threshold
+        model = translate(LABELED, printer_opt=1, label_threshold=1000)["out_1s.mzn"]
+        self.assertNotIn("label_", model)
+        self.assertEqual(model.count("((x < 2) \\/ (1 < y))"), 2)
+
+
+SOFT = LABELED.replace("(check-sat)", """(assert-soft (> x y) :weight 2 :id goal)
+(minimize goal)
+(check-sat)""")
+
+
+class TestHalfReif(unittest.TestCase):
+
+    def test_positive_label(self):
+        model = translate(SOFT, printer_opt=1, half_reif=True)["out_1_base.mzn"]
+        self.assertIn("constraint label_0 -> (((x < 2) \\/ (1 < y)));", model)
+
+    def test_minimized_soft_indicator(self):
+        #the indicator can only be true when the soft assertion holds
+        model = translate(SOFT, printer_opt=1, half_reif=True)["out_1_base.mzn"]
+        self.assertIn("constraint (goal_0 -> ((y < x)));", model)
+
+    def test_full_reification(self):
+        model = translate(SOFT, printer_opt=1)["out_1_base.mzn"]
+        self.assertIn("var bool : label_0 =", model)
+        self.assertIn("constraint (goal_0 = ((y < x)));", model)
+
+
+class TestCompact(unittest.TestCase):
+
+    def test_dag_printer(self):
+        model = translate(SHARED, compact=True)["out_1s.mzn"]
+        self.assertIn("let{var int:t0 =(x * y);}in ", model)
+        self.assertNotIn("tmp_", model)
+        self.assertNotIn("\n ", model)
+
+    def test_fathers_printer(self):
+        model = translate(SHARED, printer_opt=1, compact=True)["out_1s.mzn"]
+        self.assertIn("let{var int:l0 =(x * y);}in", model)
+
+
+class TestConjunctions(unittest.TestCase):
+
+    def test_split_conjuncts(self):
+        model = translate("""(declare-fun x () Int)
+(declare-fun y () Int)
+(assert (and (< x 2) (and (> y 1) (< x y))))
+(check-sat)
+""")["out_1s.mzn"]
+        self.assertEqual(model.count("constraint "), 3)
+        self.assertNotIn("/\\", model)
+
+
+class TestClauses(unittest.TestCase):
+
+    CLAUSES = """(declare-fun p () Bool)
+(declare-fun q () Bool)
+(declare-fun r () Bool)
+(assert (or p (not q) r))
+(assert (and p (or q (not r))))
+(check-sat)
+"""
+
+    def test_bool_clause(self):
+        model = translate(self.CLAUSES)["out_1s.mzn"]
+        self.assertIn("constraint bool_clause([p, r],[q]);", model)
+        #a unit clause stays a plain constraint
+        self.assertIn("constraint (p);", model)
+        self.assertIn("constraint bool_clause([q],[r]);", model)
+
+    def test_compact_clause(self):
+        model = translate(self.CLAUSES, compact=True)["out_1s.mzn"]
+        self.assertIn("constraint bool_clause([p,r],[q]);", model)
+
+
+class TestIteChains(unittest.TestCase):
+
+    ITE = """(declare-fun x () Int)
+(declare-fun y () Int)
+(declare-fun p () Bool)
+(assert (> (ite (= x 1) 5 (ite (= x 2) 7 (ite (= x 3) 9 0))) y))
+(assert (> (ite p 5 (ite (> x 2) 7 0)) y))
+(check-sat)
+"""
+
+    def test_lookup_table(self):
+        model = translate(self.ITE)["out_1s.mzn"]
+        self.assertIn("if (x in 1..3) then (array1d(1..3,[5, 7, 9])[x]) else (0) endif", model)
+
+    def test_elseif(self):
+        model = translate(self.ITE)["out_1s.mzn"]
+        self.assertIn("if (p) then (5) elseif (tmp_0) then (7) else (0) endif", model)
+
+
+if __name__ == "__main__":
+    unittest.main()